@@ -0,0 +1,172 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Benchmark for the parsing of all-vs-all BLAST results into orthoDB.
+
+Generates a synthetic tabular BLAST file (1M lines by default), together
+with the compliant fasta files of the proteomes, in a temporary directory
+and reports the time taken to populate the SimilarSequences table.
+
+Optionally, the resulting table can be compared against the one produced
+by another version of ``orthomclBlastParser.py``.
+
+Usage::
+
+    python benchmarks/bench_blast_parser.py [--hits N] [--taxa N]
+        [--processes N] [--compare PATH]
+"""
+
+import argparse
+import imp
+import os
+import random
+import shutil
+import sqlite3 as lite
+import sys
+import tempfile
+import time
+
+# Use the TriFusion package from this source tree
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+try:
+    from ortho import orthomclBlastParser as BlastParser
+    from ortho import orthomclInstallSchema as install_sqlite
+except ImportError:
+    from trifusion.ortho import orthomclBlastParser as BlastParser
+    from trifusion.ortho import orthomclInstallSchema as install_sqlite
+
+
+def write_proteomes(fasta_dir, ntaxa, ngenes, seed=1):
+    """Writes the compliant fasta files and returns the sequence lengths.
+    """
+
+    rng = random.Random(seed)
+    lengths = {}
+
+    for t in xrange(ntaxa):
+        taxon = "tx{}".format(t)
+        with open(os.path.join(fasta_dir, taxon + ".fasta"), "w") as fh:
+            for g in xrange(ngenes):
+                name = "{}|g{}".format(taxon, g)
+                lengths[name] = rng.randint(80, 800)
+                fh.write(">{}\n{}\n".format(
+                    name, "M" * lengths[name]))
+
+    return lengths
+
+
+def write_hits(path, lengths, nhits, seed=1):
+    """Writes a synthetic tabular BLAST file, sorted by query, with one to
+    three HSPs per query/subject pair.
+    """
+
+    rng = random.Random(seed)
+    names = sorted(lengths)
+    nlines = 0
+
+    with open(path, "w") as fh:
+        for query in names:
+            subjects = set(rng.sample(names, nhits // len(names) // 2 or 1))
+            for subject in sorted(subjects):
+                evalue = rng.choice(["0", "{:.1e}".format(
+                    10 ** rng.uniform(-180, 1))])
+                for _ in xrange(rng.randint(1, 3)):
+                    qlen, slen = lengths[query], lengths[subject]
+                    size = rng.randint(20, min(qlen, slen))
+                    qs = rng.randint(1, qlen - size + 1)
+                    ss = rng.randint(1, slen - size + 1)
+                    fh.write("\t".join([
+                        query, subject, "{:.1f}".format(rng.uniform(20, 100)),
+                        str(size), "0", "0", str(qs), str(qs + size - 1),
+                        str(ss), str(ss + size - 1), evalue, "100"]) + "\n")
+                    nlines += 1
+
+    return nlines
+
+
+def run_parser(parser_mod, blast_file, fasta_dir, db_dir, **kwargs):
+    """Creates a fresh orthoDB in `db_dir` and parses `blast_file` into it.
+    Returns the elapsed time.
+    """
+
+    con = lite.connect(os.path.join(db_dir, "orthoDB.db"))
+    with con:
+        install_sqlite.createSimilarSequencesTable(con.cursor())
+    con.close()
+
+    start = time.time()
+    parser_mod.orthomcl_blast_parser(blast_file, fasta_dir, db_dir, None,
+                                     **kwargs)
+
+    return time.time() - start
+
+
+def get_table(db_dir):
+
+    con = lite.connect(os.path.join(db_dir, "orthoDB.db"))
+    rows = con.execute("SELECT * FROM SimilarSequences ORDER BY "
+                       "query_id, subject_id").fetchall()
+    con.close()
+
+    return rows
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the BLAST "
+                                                 "parser")
+    parser.add_argument("--hits", type=int, default=1000000,
+                        help="Approximate number of BLAST lines "
+                             "(default: %(default)s)")
+    parser.add_argument("--taxa", type=int, default=10,
+                        help="Number of taxa (default: %(default)s)")
+    parser.add_argument("--genes", type=int, default=2000,
+                        help="Number of genes per taxon "
+                             "(default: %(default)s)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Number of parser processes "
+                             "(default: %(default)s)")
+    parser.add_argument("--compare", dest="compare",
+                        help="Path to another orthomclBlastParser.py whose "
+                             "output is compared against this tree's")
+    arg = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        fasta_dir = os.path.join(tmp_dir, "compliantFasta")
+        os.makedirs(fasta_dir)
+        lengths = write_proteomes(fasta_dir, arg.taxa, arg.genes)
+
+        blast_file = os.path.join(tmp_dir, "AllVsAll.out")
+        nlines = write_hits(blast_file, lengths, arg.hits)
+        size = os.path.getsize(blast_file) / 1024. ** 2
+
+        db_dir = os.path.join(tmp_dir, "current")
+        os.makedirs(db_dir)
+        elapsed = run_parser(BlastParser, blast_file, fasta_dir, db_dir,
+                             processes=arg.processes)
+        rows = get_table(db_dir)
+
+        print("{} lines, {:.1f} MB: parsed in {:.2f} s with {} process(es) "
+              "({} similar sequences)".format(nlines, size, elapsed,
+                                             arg.processes, len(rows)))
+
+        if arg.compare:
+            ref_dir = os.path.join(tmp_dir, "reference")
+            os.makedirs(ref_dir)
+            ref_mod = imp.load_source("reference_blast_parser", arg.compare)
+            ref_elapsed = run_parser(ref_mod, blast_file, fasta_dir, ref_dir)
+
+            print("Reference: parsed in {:.2f} s; tables are {}".format(
+                ref_elapsed,
+                "identical" if get_table(ref_dir) == rows else "DIFFERENT"))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
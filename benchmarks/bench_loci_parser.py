@@ -0,0 +1,91 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Benchmark for the parsing of pyRAD/ipyrad .loci files.
+
+Generates a synthetic .loci file (100k loci by default) in a temporary
+directory and reports the time taken to load it into an `AlignmentList`.
+
+Usage::
+
+    python benchmarks/bench_loci_parser.py [--loci N] [--taxa N]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Use the TriFusion package from this source tree
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+try:
+    from process.sequence import AlignmentList
+except ImportError:
+    from trifusion.process.sequence import AlignmentList
+
+
+def write_loci(path, nloci, ntaxa, locus_len, presence=0.7, seed=1):
+    """Writes a synthetic .loci file.
+
+    Each taxon is present in a locus with probability `presence` (with a
+    minimum of four taxa per locus).
+    """
+
+    rng = random.Random(seed)
+    taxa = ["taxon_{}".format(x) for x in xrange(ntaxa)]
+    width = max(len(x) for x in taxa) + 5
+
+    with open(path, "w") as fh:
+        for _ in xrange(nloci):
+            ref = [rng.choice("acgt") for _ in xrange(locus_len)]
+            present = [x for x in taxa if rng.random() < presence] or taxa
+            for tx in present[:max(4, len(present))]:
+                seq = list(ref)
+                seq[rng.randrange(locus_len)] = rng.choice("acgtn-")
+                fh.write(">{}{}\n".format(tx.ljust(width), "".join(seq)))
+            fh.write("//{}|\n".format(" " * (width + locus_len - 2)))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the .loci "
+                                                 "parser")
+    parser.add_argument("--loci", type=int, default=100000,
+                        help="Number of loci (default: %(default)s)")
+    parser.add_argument("--taxa", type=int, default=12,
+                        help="Number of taxa (default: %(default)s)")
+    parser.add_argument("--length", type=int, default=90,
+                        help="Length of each locus (default: %(default)s)")
+    arg = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        loci_file = os.path.join(tmp_dir, "synthetic.loci")
+        write_loci(loci_file, arg.loci, arg.taxa, arg.length)
+        size = os.path.getsize(loci_file) / 1024. ** 2
+
+        start = time.time()
+        aln_list = AlignmentList([loci_file],
+                                 sql_db=os.path.join(tmp_dir, "bench.db"))
+        elapsed = time.time() - start
+
+        aln = aln_list.alignments.values()[0]
+        print("{} loci, {} taxa, {:.1f} MB: parsed in {:.2f} s "
+              "(alignment length {}, {} partitions)".format(
+                arg.loci, arg.taxa, size, elapsed, aln.locus_length,
+                len(aln_list.partitions.partitions)))
+
+        aln_list.con.close()
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Benchmark for the comparison of group files.
+
+Writes synthetic group files to a temporary directory, imitating the
+clusterings of a set of proteomes at increasing MCL inflation values: the
+clusters of a base clustering are increasingly split, with some sequences
+moved between clusters. Reports the time taken by `OverlapEngine` to index
+the group files and to compare every pair of them. With `--check`, the
+comparisons are also computed with plain Python sets and compared.
+
+Usage::
+
+    python benchmarks/bench_overlap.py [--clusters N] [--files N] [--check]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# Use the TriFusion package from this source tree
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+try:
+    from ortho.group_overlap import OverlapEngine
+except ImportError:
+    from trifusion.ortho.group_overlap import OverlapEngine
+
+
+def make_group_files(dest, nclusters, nfiles, seed=1):
+    """Writes `nfiles` group files and returns their paths.
+    """
+
+    rng = random.Random(seed)
+
+    base = [["tx{}|c{}_{}".format(rng.randint(0, 19), c, i)
+             for i in range(rng.randint(2, 12))] for c in xrange(nclusters)]
+
+    files = []
+    for f in xrange(nfiles):
+        clusters = []
+        for seqs in base:
+            seqs = list(seqs)
+            rng.shuffle(seqs)
+            # Split clusters more often at higher inflation values
+            if len(seqs) > 3 and rng.random() < f * .05:
+                cut = rng.randint(1, len(seqs) - 1)
+                clusters.extend([seqs[:cut], seqs[cut:]])
+            else:
+                clusters.append(seqs)
+
+        # Move some sequences to another cluster
+        for _ in xrange(nclusters // 100 * f):
+            src, dst = rng.randint(0, len(clusters) - 1), \
+                rng.randint(0, len(clusters) - 1)
+            if len(clusters[src]) > 1 and src != dst:
+                clusters[dst].append(clusters[src].pop())
+
+        path = os.path.join(dest, "groups_{}.txt".format(f))
+        with open(path, "w") as fh:
+            for i, seqs in enumerate(clusters):
+                fh.write("OG{}: {}\n".format(i, " ".join(seqs)))
+        files.append(path)
+
+    return files
+
+
+def read_sets(groups_file):
+
+    with open(groups_file) as fh:
+        return [frozenset(line.split(":")[1].split()) for line in fh]
+
+
+def compare_sets(clusters1, clusters2):
+    """Reference implementation of `OverlapEngine.compare` with sets.
+    """
+
+    cluster_of = dict((x, j) for j, cl in enumerate(clusters2) for x in cl)
+    table = Counter((i, cluster_of[x]) for i, cl in enumerate(clusters1)
+                    for x in cl if x in cluster_of)
+
+    shared = len(set(clusters1) & set(clusters2))
+
+    def pairs(counter):
+        return sum(n * (n - 1) // 2 for n in counter.values())
+
+    rows, cols = Counter(), Counter()
+    for (i, j), n in table.items():
+        rows[i] += n
+        cols[j] += n
+    together = pairs(table)
+    union = pairs(rows) + pairs(cols) - together
+
+    return {"clusters": (len(clusters1), len(clusters2)),
+            "shared": shared,
+            "unique": (len(clusters1) - shared, len(clusters2) - shared),
+            "overlapping": (len(rows), len(cols)),
+            "jaccard": float(together) / union if union else
+            (1. if table else 0.)}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the "
+                                                 "comparison of group files")
+    parser.add_argument("--clusters", type=int, default=100000,
+                        help="Number of clusters of the base clustering "
+                             "(default: %(default)s)")
+    parser.add_argument("--files", type=int, default=6,
+                        help="Number of group files (default: %(default)s)")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare the results with a plain Python "
+                             "implementation")
+    arg = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        files = make_group_files(tmp_dir, arg.clusters, arg.files)
+
+        engine = OverlapEngine()
+        start = time.time()
+        for path in files:
+            engine.add_group_file(path, path)
+        index_time = time.time() - start
+
+        start = time.time()
+        results = engine.compare_all()
+        compare_time = time.time() - start
+
+        print("{} group files, {} sequences".format(len(files),
+                                                    engine.nseqs))
+        print("  {:<40}{:>8.2f} s".format("Indexing", index_time))
+        print("  {:<40}{:>8.2f} s".format(
+            "Comparing {} pairs".format(len(results)), compare_time))
+
+        for (x, y), res in results.items():
+            print("  {} / {}: {} shared clusters, Jaccard {:.3f}".format(
+                os.path.basename(x), os.path.basename(y), res["shared"],
+                res["jaccard"]))
+
+        if arg.check:
+            sets = dict((x, read_sets(x)) for x in files)
+            start = time.time()
+            reference = dict(((x, y), compare_sets(sets[x], sets[y]))
+                             for x, y in itertools.combinations(files, 2))
+            print("\nPython sets: {:.2f} s".format(time.time() - start))
+
+            mismatch = [x for x in results if
+                        abs(results[x].pop("jaccard") -
+                            reference[x].pop("jaccard")) > 1e-9 or
+                        results[x] != reference[x]]
+            print("Results are {}".format("DIFFERENT" if mismatch
+                                          else "identical"))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
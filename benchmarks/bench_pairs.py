@@ -0,0 +1,161 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Benchmark for the orthomclPairs step.
+
+Generates an orthoDB with a synthetic SimilarSequences table, made of gene
+families with one to three copies per taxon, in a temporary directory and
+reports the time taken by each step of `orthomclPairs.execute` in the
+requested sqlite execution mode, or of the array engine of
+`orthomclPairsArray`. With `--check`, the step is run in every execution
+mode and with the array engine, and the resulting pair files are compared.
+
+Usage::
+
+    python benchmarks/bench_pairs.py [--families N] [--taxa N]
+        [--mode MODE|array] [--check]
+"""
+
+import argparse
+import filecmp
+import os
+import random
+import shutil
+import sqlite3 as lite
+import sys
+import tempfile
+
+# Use the TriFusion package from this source tree
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+try:
+    from ortho import orthomclInstallSchema as install_sqlite
+    from ortho import orthomclPairs as make_pairs_sqlite
+    from ortho import orthomclPairsArray as make_pairs_array
+    from ortho import orthomclDumpPairsFiles as dump_pairs_sqlite
+except ImportError:
+    from trifusion.ortho import orthomclInstallSchema as install_sqlite
+    from trifusion.ortho import orthomclPairs as make_pairs_sqlite
+    from trifusion.ortho import orthomclPairsArray as make_pairs_array
+    from trifusion.ortho import orthomclDumpPairsFiles as dump_pairs_sqlite
+
+
+def iter_similar_sequences(nfamilies, ntaxa, seed=1):
+    """Generates SimilarSequences rows for all-vs-all hits within gene
+    families.
+    """
+
+    rng = random.Random(seed)
+
+    for fam in xrange(nfamilies):
+        genes = []
+        for tx in xrange(ntaxa):
+            for copy in xrange(rng.choice([0, 1, 1, 1, 2, 3])):
+                genes.append(("tx{}|f{}_{}".format(tx, fam, copy),
+                              "tx{}".format(tx)))
+
+        for query, query_tx in genes:
+            for subject, subject_tx in genes:
+                if query == subject:
+                    continue
+                mant = rng.choice([0, round(rng.uniform(1, 9.99), 2)])
+                exp = 0 if mant == 0 else -rng.randint(1, 180)
+                yield (query, subject, query_tx, subject_tx, mant, exp,
+                       round(rng.uniform(30, 100), 1),
+                       round(rng.uniform(30, 100), 1))
+
+
+def make_db(db_dir, nfamilies, ntaxa):
+
+    install_sqlite.execute(db_dir)
+
+    con = lite.connect(os.path.join(db_dir, "orthoDB.db"))
+    with con:
+        con.executemany("INSERT OR IGNORE INTO SimilarSequences "
+                        "VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                        iter_similar_sequences(nfamilies, ntaxa))
+        nrows = con.execute("SELECT count(*) FROM SimilarSequences"
+                            ).fetchone()[0]
+    con.close()
+
+    return nrows
+
+
+def run_pairs(tmp_dir, template, mode):
+    """Runs the pairs step in `mode` (or with the array engine) on a copy
+    of the template orthoDB and dumps the pair files. Returns the timings
+    and the output directory.
+    """
+
+    db_dir = os.path.join(tmp_dir, mode)
+    os.makedirs(os.path.join(db_dir, "backstage_files"))
+    shutil.copy(template, os.path.join(db_dir, "orthoDB.db"))
+
+    if mode == "array":
+        timings = make_pairs_array.execute(db_dir)
+    else:
+        timings = make_pairs_sqlite.execute(db_dir, mode=mode)
+    dump_pairs_sqlite.execute(db_dir, db_dir)
+
+    return timings, os.path.join(db_dir, "backstage_files")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the "
+                                                 "orthomclPairs step")
+    parser.add_argument("--families", type=int, default=20000,
+                        help="Number of gene families "
+                             "(default: %(default)s)")
+    parser.add_argument("--taxa", type=int, default=8,
+                        help="Number of taxa (default: %(default)s)")
+    parser.add_argument("--mode", default="default",
+                        choices=make_pairs_sqlite.EXECUTION_MODES +
+                        ["array"],
+                        help="sqlite execution mode, or 'array' for the "
+                             "array engine (default: %(default)s)")
+    parser.add_argument("--check", action="store_true",
+                        help="Run every execution mode and the array "
+                             "engine and compare the pair files")
+    arg = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        template_dir = os.path.join(tmp_dir, "template")
+        os.makedirs(template_dir)
+        nrows = make_db(template_dir, arg.families, arg.taxa)
+        template = os.path.join(template_dir, "orthoDB.db")
+
+        print("{} similar sequences".format(nrows))
+
+        modes = make_pairs_sqlite.EXECUTION_MODES + ["array"] if arg.check \
+            else [arg.mode]
+        outputs = []
+
+        for mode in modes:
+            timings, out_dir = run_pairs(tmp_dir, template, mode)
+            outputs.append(out_dir)
+
+            print("\nMode '{}': {:.2f} s".format(
+                mode, sum(x[1] for x in timings)))
+            for step, elapsed in timings:
+                print("  {:<40}{:>8.2f} s".format(step, elapsed))
+
+        if arg.check:
+            files = sorted(os.listdir(outputs[0]))
+            for out_dir, mode in zip(outputs[1:], modes[1:]):
+                match, mismatch, errors = filecmp.cmpfiles(
+                    outputs[0], out_dir, files, shallow=False)
+                print("\nPair files of '{}' and '{}' are {}".format(
+                    modes[0], mode,
+                    "identical" if not mismatch and not errors
+                    else "DIFFERENT"))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
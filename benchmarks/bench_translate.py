@@ -0,0 +1,178 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""Benchmark for the codon translation of protein2dna.
+
+Writes a synthetic cds file, with lower case, gapped, ambiguous and missing
+data codons, stop codons and incomplete last codons, to a temporary
+directory, and reports the time taken by `protein2dna.translate` and
+`protein2dna.create_db` against the previous codon by codon translation and
+line concatenation, which are kept here as reference. With `--check`, the
+translations of both implementations are compared.
+
+Usage::
+
+    python benchmarks/bench_translate.py [--records N] [--length N]
+        [--check]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Use the TriFusion package from this source tree
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+try:
+    from ortho import protein2dna
+except ImportError:
+    from trifusion.ortho import protein2dna
+
+
+def reference_translate(sequence):
+    """Previous implementation of `protein2dna.translate`.
+    """
+
+    sequence = sequence.lower().replace("-", "")
+    aa_sequence = ""
+
+    for i in range(0, len(sequence), 3):
+        codon = sequence[i:i + 3]
+
+        if len(codon) == 3:
+            if "n" in codon:
+                aa = ""
+            else:
+                try:
+                    aa = protein2dna.dna_map[codon.upper()]
+                except KeyError:
+                    aa = ""
+        else:
+            aa = ""
+
+        aa_sequence += aa
+
+    return aa_sequence
+
+
+def reference_create_db(f_list, dest):
+    """Previous implementation of `protein2dna.create_db`, without the
+    progress information. The last record of each file is not translated.
+    """
+
+    output_handle = open(os.path.join(dest, "transcripts.fas"), "w")
+    id_dic = {}
+
+    for f in f_list:
+        handle = open(f)
+        seq = ""
+        header = ""
+
+        for line in handle:
+            if line.startswith(">"):
+                if seq != "":
+                    aa_seq = reference_translate(seq)
+                    output_handle.write(">%s\n%s\n" % (header, aa_seq))
+                    id_dic[header] = seq
+
+                header = line.strip()[1:].replace(" ", ";;")
+                seq = ""
+            else:
+                seq += line.strip()
+
+        handle.close()
+
+    output_handle.close()
+
+    return id_dic
+
+
+def make_cds_file(path, nrecords, length, seed=1):
+    """Writes `nrecords` cds sequences of about `length` nucleotides, in
+    lines of 60 characters. Returns the sequences.
+    """
+
+    rng = random.Random(seed)
+    codons = sorted(protein2dna.dna_map)
+    odd_codons = ["NNN", "ANT", "RCT", "AC-", "---", "acg", "tgA"]
+
+    seqs = []
+    with open(path, "w") as fh:
+        for i in xrange(nrecords):
+            seq = "".join(rng.choice(odd_codons) if rng.random() < .02
+                          else rng.choice(codons)
+                          for _ in xrange(rng.randint(length // 6,
+                                                      length // 3)))
+            seq += rng.choice(["", "A", "TG"])
+            seqs.append(seq)
+            fh.write(">cds{} gene {}\n".format(i, i % 100))
+            fh.write("\n".join(seq[j:j + 60] for j in
+                               xrange(0, len(seq), 60)) + "\n")
+
+    return seqs
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the codon "
+                                                 "translation of protein2dna")
+    parser.add_argument("--records", type=int, default=20000,
+                        help="Number of cds records (default: %(default)s)")
+    parser.add_argument("--length", type=int, default=3000,
+                        help="Maximum cds length (default: %(default)s)")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare the translations with the previous "
+                             "implementation")
+    arg = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        cds_file = os.path.join(tmp_dir, "cds.fas")
+        seqs = make_cds_file(cds_file, arg.records, arg.length)
+
+        print("{} cds records, {} nucleotides".format(
+            len(seqs), sum(len(x) for x in seqs)))
+
+        for name, func in [("reference translate", reference_translate),
+                           ("translate", protein2dna.translate)]:
+            start = time.time()
+            translations = [func(x) for x in seqs]
+            print("  {:<40}{:>8.2f} s".format(name, time.time() - start))
+            if name == "reference translate":
+                reference = translations
+
+        for name, func in [("reference create_db", reference_create_db),
+                           ("create_db", protein2dna.create_db)]:
+            dest = os.path.join(tmp_dir, name.replace(" ", "_"))
+            os.makedirs(dest)
+            start = time.time()
+            func([cds_file], dest)
+            print("  {:<40}{:>8.2f} s".format(name, time.time() - start))
+
+        if arg.check:
+            print("\nTranslations are {}".format(
+                "identical" if translations == reference else "DIFFERENT"))
+
+            # The previous create_db left out the last record of the file
+            with open(os.path.join(tmp_dir, "reference_create_db",
+                                   "transcripts.fas")) as fh:
+                old = fh.read()
+            with open(os.path.join(tmp_dir, "create_db",
+                                   "transcripts.fas")) as fh:
+                new = fh.read()
+            print("Translated databases are {}".format(
+                "identical" if new.startswith(old) and
+                new[len(old):].count(">") == 1 else "DIFFERENT"))
+
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -230,7 +230,7 @@ def main():
             group_object.export_filtered_group(dest=output_dir)
             print_col("Filtering complete.\nTotal orthologs: %s;\nAfter gene "
                       "filter: %s;\nAfter species filter: %s;\nAfter both "
-                      "filters: %s" % (len(group_object.species_frequency),
+                      "filters: %s" % (len(group_object.species_counts),
                                        group_object.num_gene_compliant,
                                        group_object.num_species_compliant,
                                        group_object.all_compliant), GREEN, 3)
@@ -261,7 +261,7 @@ def main():
                 print_col("Generating plot for Multiple group comparison",
                           GREEN, 3)
                 multiple_groups_object.update_filters(gene_threshold,
-                                                      species_threshold)
+                                                      species_threshold, [])
                 multiple_groups_object.bar_orthologs(dest=output_dir)
 
         if arg.export:
@@ -280,7 +280,7 @@ def main():
                           "orthologs: %s;\nAfter gene filter: %s;\nAfter "
                           "species filter: %s;\nAfter both filters: %s" %
                           (gname,
-                           len(gobj.species_frequency),
+                           len(gobj.species_counts),
                            gobj.num_gene_compliant,
                            gobj.num_species_compliant,
                            gobj.all_compliant), GREEN, 3)
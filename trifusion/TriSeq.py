@@ -224,19 +224,27 @@ def main_parser(arg, alignment_list):
                   quiet=arg.quiet)
         alignments.filter_by_taxa(arg.exclude_filter, "Exclude", pbar=pbar)
 
-    # Filter by codon position
+    # Filter by codon position and missing data. Both filters are applied
+    # in a single pass over the data
+    codon_settings = None
     if arg.codon_filter:
         print_col("Filtering by codon positions", GREEN, quiet=arg.quiet)
         if alignments.sequence_code[0] == "DNA":
             codon_settings = [True if str(x) in arg.codon_filter else False
                               for x in range(1, 4)]
-            alignments.filter_codon_positions(codon_settings, pbar=pbar)
 
-    # Filter by missing data
+    gap_threshold, missing_threshold = None, None
     if arg.m_filter:
         print_col("Filtering by missing data", GREEN, quiet=arg.quiet)
-        alignments.filter_missing_data(arg.m_filter[0], arg.m_filter[1],
-                                       pbar=pbar, use_main_table=True)
+        gap_threshold, missing_threshold = arg.m_filter
+
+    if codon_settings or arg.m_filter:
+        alignments.filter_columns(codon_positions=codon_settings,
+                                  gap_threshold=gap_threshold,
+                                  missing_threshold=missing_threshold,
+                                  table_in=alignments.master_table,
+                                  table_out=alignments.master_table,
+                                  pbar=pbar)
 
     # Filtering by variable sites
     if arg.var_filter:
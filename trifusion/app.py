@@ -11614,10 +11614,20 @@ class TriFusionApp(App):
                 # terminate
                 shared_ns.stop = True
 
-                # If a subprocess has been issued, kill it
+                # If a subprocess has been issued, kill it. When several
+                # subprocesses run at the same time (e.g. mcl for multiple
+                # inflation values), subp is a list of their pids
                 try:
                     if shared_ns.subp:
-                        os.kill(shared_ns.subp, signal.SIGINT)
+                        pids = shared_ns.subp \
+                            if isinstance(shared_ns.subp, list) \
+                            else [shared_ns.subp]
+                        for pid in pids:
+                            try:
+                                os.kill(pid, signal.SIGINT)
+                            except OSError:
+                                # The subprocess has already finished
+                                pass
                         shared_ns.subp = None
                 except AttributeError:
                     pass
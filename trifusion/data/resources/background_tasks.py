@@ -384,7 +384,8 @@ def orto_execution(nm, temp_dir, proteome_files, protein_min_len,
     usearch_evalue: int or float
         Evalue for usearch execution.
     usearch_threads : int
-        Number of threads used by usearch execution.
+        Number of threads used by usearch execution, and of processes
+        used to parse its output.
     usearch_output : str
         Name of usearch's output file.
     mcl_file : str
@@ -410,89 +411,37 @@ def orto_execution(nm, temp_dir, proteome_files, protein_min_len,
         Name of the file used as database for usearch.
     """
 
-    try:
-        nm.finished_tasks = []
-
-        nm.task = "schema"
-        ortho_pipe.install_schema(temp_dir)
-        nm.finished_tasks = ["schema"]
-
-        if nm.stop:
-            raise KillByUser("")
-
-        nm.task = "adjust"
-        ortho_pipe.adjust_fasta(proteome_files, ortho_dir, nm)
-        nm.finished_tasks = ["schema", "adjust"]
-
-        if nm.stop:
-            raise KillByUser("")
-
-        nm.task = "filter"
-        ortho_pipe.filter_fasta(protein_min_len, protein_max_stop,
-                                usearch_db, ortho_dir, nm)
-        nm.finished_tasks = ["schema", "adjust", "filter"]
-
-        if nm.stop:
-            raise KillByUser("")
-
-        nm.task = "usearch"
-        ortho_pipe.allvsall_usearch(usearch_db, usearch_evalue, ortho_dir,
-                                    usearch_threads, usearch_output,
-                                    usearch_bin=usearch_file, nm=nm)
-        nm.finished_tasks = ["schema", "adjust", "filter", "usearch"]
-
-        if nm.stop:
-            raise KillByUser("")
-
-        nm.task = "parse"
-        ortho_pipe.blast_parser(usearch_output, ortho_dir,
-                                db_dir=temp_dir, nm=nm)
-        nm.finished_tasks = ["schema", "adjust", "filter", "usearch", "parse"]
-
-        if nm.stop:
-            raise KillByUser("")
+    # Progress tasks of the dialog for each stage of the pipeline
+    stage_tasks = {"dump_pairs": "pairs", "mcl_groups": "dump"}
 
-        nm.task = "pairs"
-        ortho_pipe.pairs(temp_dir, nm=nm)
-        ortho_pipe.dump_pairs(temp_dir, ortho_dir, nm=nm)
-        nm.finished_tasks = ["schema", "adjust", "filter", "usearch", "parse",
-                             "pairs"]
+    def update_tasks(stage, status):
 
-        if nm.stop:
-            raise KillByUser("")
+        task = stage_tasks.get(stage, stage)
 
-        nm.task = "mcl"
-        ortho_pipe.mcl(mcl_inflation, ortho_dir, mcl_file=mcl_file, nm=nm)
-        nm.finished_tasks = ["schema", "adjust", "filter", "usearch", "parse",
-                             "pairs", "mcl"]
+        if status == "start":
+            nm.task = task
+        elif task not in nm.finished_tasks:
+            nm.finished_tasks = nm.finished_tasks + [task]
 
         if nm.stop:
             raise KillByUser("")
 
-        nm.task = "dump"
-        ortho_pipe.mcl_groups(mcl_inflation, ortholog_prefix, "1000",
-                              group_prefix, ortho_dir, nm=nm)
-        nm.finished_tasks = ["schema", "adjust", "filter", "usearch", "parse",
-                             "pairs", "mcl", "dump"]
-
-        if nm.stop:
-            raise KillByUser("")
+    try:
+        nm.finished_tasks = []
 
-        nm.task = "filter_groups"
-        stats, groups_obj = ortho_pipe.export_filtered_groups(
-            mcl_inflation,
-            group_prefix,
-            orto_max_gene,
-            orto_min_sp,
-            sqldb + "_out",
-            join(ortho_dir, "backstage_files", usearch_db),
-            temp_dir,
-            ortho_dir, nm=nm)
-        nm.finished_tasks = ["schema", "adjust", "filter", "usearch", "parse",
-                             "pairs", "mcl", "dump", "filter_groups"]
+        # Stages completed by a previous search in ortho_dir with the same
+        # parameters are skipped. The filtered groups are always exported,
+        # since their statistics and groups object are required by the app
+        stages = ortho_pipe.orthology_stages(
+            proteome_files, ortho_dir, temp_dir, protein_min_len,
+            protein_max_stop, usearch_db, usearch_evalue, usearch_threads,
+            usearch_output, usearch_file, mcl_file, mcl_inflation,
+            ortholog_prefix, "1000", group_prefix, orto_max_gene,
+            orto_min_sp, sqldb + "_out", temp_dir, nm=nm,
+            always_export=True)
 
-        if nm.stop:
-            raise KillByUser("")
+        stats, groups_obj = stages.run(
+            callback=update_tasks)["filter_groups"]
 
         # stats is a dictionary containing the inflation value as
         #  key and a list with the orthologs as value
@@ -732,21 +681,24 @@ def process_execution(aln_list, file_set_name, file_list, active_file_list,
             taxa_list = taxa_groups[taxa_filter_settings[1]]
             aln.filter_by_taxa(taxa_list, taxa_filter_settings[0], ns=ns)
 
-        # Filter codon positions
+        # Filter codon positions and missing data in a single pass
+        codon_positions = None
         if secondary_options["codon_filter"]:
             ns.main_msg = "Filter (by codon)"
-            aln.filter_codon_positions(codon_filter_settings,
-                                       table_in=table_in,
-                                       table_out=table_out, ns=ns)
+            codon_positions = codon_filter_settings
 
-        # Filter missing data
-        if secondary_options["gap_filter"]:
+        gap_threshold, missing_threshold = None, None
+        if secondary_options["gap_filter"] and missing_filter_settings[0][0]:
             ns.main_msg = "Filter (by missing data)"
-            if missing_filter_settings[0][0]:
-                aln.filter_missing_data(missing_filter_settings[0][1],
-                                        missing_filter_settings[0][2],
-                                        table_in=table_in,
-                                        table_out=table_out, ns=ns)
+            gap_threshold, missing_threshold = missing_filter_settings[0][1:3]
+
+        if codon_positions is not None or gap_threshold is not None:
+            aln.filter_columns(codon_positions=codon_positions,
+                               gap_threshold=gap_threshold,
+                               missing_threshold=missing_threshold,
+                               code_terminals=table_in == table_out,
+                               table_in=table_in,
+                               table_out=table_out, ns=ns)
 
         # Filter variation
         if secondary_options["variation_filter"]:
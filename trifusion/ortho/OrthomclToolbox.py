@@ -22,19 +22,163 @@ try:
     from process.sequence import Alignment
     from base.plotter import bar_plot, multi_bar_plot
     from process.error_handling import KillByUser
+    from ortho.group_overlap import OverlapEngine
 except ImportError:
     from trifusion.process.sequence import Alignment
     from trifusion.base.plotter import bar_plot, multi_bar_plot
     from trifusion.process.error_handling import KillByUser
+    from trifusion.ortho.group_overlap import OverlapEngine
 
 from collections import OrderedDict, Counter
+import json
 import pickle
 import os
 import sqlite3
 from os.path import join
 import random
 import string
-import copy
+import math
+import numpy as np
+
+
+# Maximum number of sequence ids in a single query, below the default
+# sqlite limit of 999 host parameters
+QUERY_BATCH = 900
+
+# Number of sequences retrieved at a time from the protein database
+RETRIEVE_BATCH = 10000
+
+# Number of lines of the protein database between progress updates
+PROGRESS_LINES = 10000
+
+
+def iter_fasta_offsets(fasta_handle, shared_namespace=None):
+    """
+    Generator of the sequence id, offset and length in bytes of the
+    sequence lines of each record of a fasta file
+    :param fasta_handle: file object of the fasta file, opened in binary
+    mode
+    :param shared_namespace: Namespace object to communicate with
+    TriFusion's main process
+    """
+
+    seq_id = None
+    offset = pos = 0
+
+    for p, line in enumerate(fasta_handle):
+
+        # Kill switch
+        if shared_namespace and not p % PROGRESS_LINES:
+            if shared_namespace.stop:
+                raise KillByUser("")
+            shared_namespace.progress = shared_namespace.counter = pos
+
+        if line.startswith(">"):
+            if seq_id is not None:
+                yield seq_id, offset, pos - offset
+            seq_id = line.strip()[1:]
+            pos += len(line)
+            offset = pos
+        else:
+            pos += len(line)
+
+    if seq_id is not None:
+        yield seq_id, offset, pos - offset
+
+
+def create_sequence_index(sqldb, protein_db, shared_namespace=None):
+    """
+    Creates a table of sqldb with the offset and length of the sequence of
+    each record of protein_db, similar to a samtools .fai index, which is
+    used by GroupLight.retrieve_sequences. The index is only built again
+    when protein_db has changed, so that it is reused by all the groups
+    exported from the same protein database.
+    :param sqldb: string. Path to sqlite database file
+    :param protein_db: string. Path to protein database file
+    :param shared_namespace: Namespace object to communicate with
+    TriFusion's main process
+    :return: string. Name of the table
+    """
+
+    table_name = "".join([x for x in protein_db if x.isalnum()]).encode(
+        "utf8") + "_index"
+
+    st = os.stat(protein_db)
+    signature = "{} {}".format(st.st_size, st.st_mtime)
+
+    con = sqlite3.connect(sqldb)
+    c = con.cursor()
+
+    c.execute("CREATE TABLE IF NOT EXISTS fasta_indexes "
+              "(table_name text PRIMARY KEY, signature text)")
+
+    vals = c.execute("SELECT signature FROM fasta_indexes WHERE "
+                     "table_name = ?", (table_name,)).fetchone()
+
+    if vals and vals[0] == signature:
+        con.close()
+        return table_name
+
+    if shared_namespace:
+        shared_namespace.act = shared_namespace.msg = "Creating database"
+        # Stores sequences that could not be retrieved
+        shared_namespace.missed = shared_namespace.counter = 0
+        shared_namespace.progress = 0
+        shared_namespace.max_pb = shared_namespace.total = st.st_size
+
+    c.execute("DROP TABLE IF EXISTS [{}]".format(table_name))
+    c.execute("CREATE TABLE [{}] (seq_id text PRIMARY KEY, offset integer, "
+              "length integer)".format(table_name))
+
+    # Populate index. If the user stops it, the index is not registered in
+    # fasta_indexes and is built again on the next use
+    with open(protein_db, "rb") as ph:
+        try:
+            c.executemany("INSERT OR IGNORE INTO [{}] VALUES (?, ?, ?)".
+                          format(table_name),
+                          iter_fasta_offsets(ph, shared_namespace))
+        except KillByUser:
+            con.close()
+            raise
+
+    c.execute("INSERT OR REPLACE INTO fasta_indexes VALUES (?, ?)",
+              (table_name, signature))
+
+    con.commit()
+    con.close()
+
+    return table_name
+
+
+def read_sequences(cursor, table_name, fasta_handle, seq_ids):
+    """
+    Retrieves the sequences of a list of ids from a fasta file using its
+    index table. The sequences are read in the order of their offsets in
+    the file.
+    :param cursor: sqlite cursor of the database with the index table
+    :param table_name: string. Name of the index table
+    :param fasta_handle: file object of the fasta file, opened in binary
+    mode
+    :param seq_ids: list of sequence ids
+    :return: dictionary with the sequence of each id found in the index
+    """
+
+    locations = []
+    for i in range(0, len(seq_ids), QUERY_BATCH):
+        batch = seq_ids[i:i + QUERY_BATCH]
+        cursor.execute("SELECT seq_id, offset, length FROM [{}] WHERE "
+                       "seq_id IN ({})".format(table_name,
+                                               ",".join("?" * len(batch))),
+                       batch)
+        locations.extend(cursor.fetchall())
+
+    seqs = {}
+    for seq_id, offset, length in sorted(locations, key=lambda x: x[1]):
+        fasta_handle.seek(offset)
+        seqs[seq_id] = fasta_handle.read(length).translate(
+            None, string.whitespace)
+
+    return seqs
 
 
 class Cluster(object):
@@ -142,7 +286,22 @@ class GroupLight(object):
         self.species_list = []
         # Attribute that will contain taxa to be excluded from analyses
         self.excluded_taxa = []
-        self.species_frequency = []
+
+        # Matrix with the number of sequences of each taxon (columns) in each
+        # ortholog cluster (rows). The taxa of the columns are stored in
+        # species_columns, which is not changed by the exclusion of taxa.
+        # When the matrix is saved to a file with save_counts, it is only
+        # loaded from that file when needed
+        self._species_counts = None
+        self._counts_file = None
+        self.species_columns = []
+        # Per cluster statistics and cumulative histogram of the clusters for
+        # the current excluded taxa. See _filter_summary. When the summary is
+        # saved to files with save_summary, for the excluded taxa in
+        # _summary_taxa, its arrays are only loaded from them when needed
+        self._summary = None
+        self._summary_files = None
+        self._summary_taxa = None
 
         # Attributes that will store the number (int) of cluster after gene and
         # species filter
@@ -171,6 +330,91 @@ class GroupLight(object):
         if type(self.species_threshold) is float:
             self._get_sp_proportion()
 
+    def __getstate__(self):
+        """
+        When the species_counts matrix is saved to a file, it is not pickled
+        with the object
+        """
+
+        state = self.__dict__.copy()
+        if self._counts_file:
+            state["_species_counts"] = None
+
+        return state
+
+    @property
+    def species_counts(self):
+
+        if self._species_counts is None and self._counts_file:
+            self._species_counts = np.load(self._counts_file)
+
+        return self._species_counts
+
+    @species_counts.setter
+    def species_counts(self, counts):
+
+        self._species_counts = counts
+
+    def save_counts(self, counts_file):
+        """
+        Saves the species_counts matrix to a numpy file, from which it is
+        loaded when needed after the object is unpickled or restored with
+        from_state
+        :param counts_file: string. Path to the .npy file
+        """
+
+        np.save(counts_file, self.species_counts)
+        self._counts_file = counts_file
+
+    def save_summary(self, path_prefix):
+        """
+        Saves the per cluster statistics and the cumulative histogram of the
+        current excluded taxa to numpy files, from which they are loaded when
+        needed after the object is restored with from_state. Nothing is
+        written if they were already saved for the current excluded taxa
+        :param path_prefix: string. Prefix of the paths of the .npy files
+        """
+
+        files = [path_prefix + x for x in
+                 ["_ntaxa.npy", "_copies.npy", "_hist.npy"]]
+        excluded = sorted(self.excluded_taxa)
+
+        if self._summary_files == files and self._summary_taxa == excluded:
+            return
+
+        for f, values in zip(files, self._filter_summary()):
+            np.save(f, values)
+
+        self._summary_files = files
+        self._summary_taxa = excluded
+
+    def get_state(self):
+        """
+        Returns the attributes of the object, without the species_counts
+        matrix and the filter summary, which must be saved with save_counts
+        and save_summary. The values are json serializable
+        """
+
+        state = self.__dict__.copy()
+        del state["_species_counts"], state["_summary"]
+
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores an object from the attributes returned by get_state, without
+        parsing the group file
+        :param state: dict. Attributes of the object
+        """
+
+        group = cls.__new__(cls)
+        group.__dict__.update(state)
+        group._species_counts = None
+        group._summary = None
+
+        return group
+
     def groups(self):
         """
         Generator for group file. This replaces the self.groups attribute of
@@ -185,21 +429,6 @@ class GroupLight(object):
             if line.strip() != "":
                 yield line.strip()
 
-    def iter_species_frequency(self):
-        """
-        In order to prevent permanent changes to the species_frequency
-        attribute due to the filtering of taxa, this iterable should be used
-        instead of the said variable. This creates a temporary deepcopy of
-        species_frequency which will be iterated over and eventually modified.
-        """
-
-        # Since the items of species_frequency are mutable, this ensures
-        # that even those objects are correctly cloned
-        sp_freq = copy.deepcopy(self.species_frequency)
-
-        for cl in sp_freq:
-            yield cl
-
     def _remove_tx(self, line):
         """
         Given a group line, remove all references to the excluded taxa
@@ -213,82 +442,148 @@ class GroupLight(object):
 
         return new_line + tx_str
 
-    def _apply_filter(self, cl):
+    def _filter_summary(self, clusters=True):
         """
-        Sets or updates the basic group statistics, such as the number of
-        orthologs compliant with the gene copy and minimum taxa filters.
+        Summarizes the ortholog clusters for the current excluded taxa. The
+        summary is computed once for each set of excluded taxa, after which
+        the statistics for any pair of filters are read from the cumulative
+        histogram, whatever the number of clusters.
 
-        :param cl: dictionary. Contains the number of occurrences for each
-         taxon present in the ortholog cluster
-         (e.g. {"taxonA": 2, "taxonB": 1).
+        :param clusters: boolean. If False, only the histogram is needed, and
+        the per cluster statistics of a saved summary are not loaded
+        :return: tuple with the number of taxa and the maximum number of gene
+        copies of each cluster (None if not loaded), and the cumulative
+        histogram. The cell [c, t] of the latter is the number of clusters
+        with at most c gene copies and at least t taxa
         """
 
-        # First, remove excluded taxa from the cl object since this will
-        # impact all other filters
-        for tx in self.excluded_taxa:
-            cl.pop(tx, None)
+        excluded = sorted(self.excluded_taxa)
 
-        if cl:
+        if not self._summary or self._summary[0] != excluded:
+            if self._summary_files and self._summary_taxa == excluded:
+                self._summary = [excluded, None, None, None]
+            else:
+                self._summary = [excluded] + self._compute_summary()
 
-            self.all_clusters += 1
+        # Arrays of a saved summary that are not loaded yet
+        for i in [1, 2, 3] if clusters else [3]:
+            if self._summary[i] is None:
+                self._summary[i] = np.load(self._summary_files[i - 1])
 
-            extra_copies = max(cl.values())
-            if extra_copies > self.max_extra_copy:
-                self.max_extra_copy = extra_copies
+        return tuple(self._summary[1:])
 
-            if extra_copies <= self.gene_threshold and self.gene_threshold and\
-                len(cl) >= self.species_threshold and  \
-                    self.species_threshold:
-                self.num_gene_compliant += 1
-                self.num_species_compliant += 1
-                self.all_compliant += 1
+    def _compute_summary(self):
+        """
+        Computes the summary of _filter_summary from the species_counts
+        matrix
+        :return: list with the number of taxa and the maximum number of gene
+        copies of each cluster, and the cumulative histogram
+        """
 
-            elif (extra_copies <= self.gene_threshold and
-                      self.gene_threshold) or self.gene_threshold == 0:
-                self.num_gene_compliant += 1
+        counts = self.species_counts
+        if self.excluded_taxa:
+            counts = counts[:, [x not in self.excluded_taxa for x in
+                                self.species_columns]]
 
-            elif len(cl) >= self.species_threshold and \
-                    self.species_threshold:
-                self.num_species_compliant += 1
+        if counts.shape[1]:
+            n_taxa = (counts > 0).sum(axis=1)
+            copies = counts.max(axis=1).astype(int)
+        else:
+            n_taxa = copies = np.zeros(counts.shape[0], dtype=int)
+
+        # The last column, for more taxa than any cluster has, is empty
+        shape = (copies.max() + 1 if len(copies) else 1,
+                 n_taxa.max() + 2 if len(n_taxa) else 2)
+        hist = np.bincount(copies * shape[1] + n_taxa,
+                           minlength=shape[0] * shape[1]).reshape(shape)
+        hist = hist.cumsum(axis=0)[:, ::-1].cumsum(axis=1)[:, ::-1]
 
-    def _get_compliance(self, cl):
+        return [n_taxa, copies, hist]
+
+    def _cluster_stats(self):
         """
-        Determines whether an ortholog cluster is compliant with the specified
-        ortholog filters.
-        :param ccl: dictionary. Contains the number of occurrences for each
-         taxon present in the ortholog cluster
-         (e.g. {"taxonA": 2, "taxonB": 1).
+        Returns the number of taxa and the maximum number of gene copies of
+        each ortholog cluster, without the excluded taxa.
 
-        :return: tuple. The first element refers to the gene copy filter
-        while the second refers to the minimum taxa filter. Values of 1
-        indicate that the ortholg cluster is compliant.
+        :return: tuple of two numpy arrays, with one value per cluster
         """
 
-        for tx in self.excluded_taxa:
-            cl.pop(tx, None)
+        return self._filter_summary()[:2]
 
-        if cl:
+    def _filter_masks(self, n_taxa, copies):
+        """
+        Returns which ortholog clusters are compliant with the gene copy
+        filter and which are compliant with the minimum taxa filter. A filter
+        that is not set is never complied with.
 
-            cp = max(cl.values())
+        :param n_taxa: numpy array with the number of taxa of each cluster
+        :param copies: numpy array with the maximum number of gene copies
+        of each cluster
+        :return: tuple of two boolean numpy arrays
+        """
 
-            if not self.gene_threshold and not self.species_threshold:
-                return 1, 1
+        if self.gene_threshold:
+            gene_ok = copies <= self.gene_threshold
+        else:
+            gene_ok = np.zeros(len(copies), dtype=bool)
 
-            if cp <= self.gene_threshold and self.gene_threshold and\
-                len(cl) >= self.species_threshold and  \
-                    self.species_threshold:
-                return 1, 1
+        if self.species_threshold:
+            sp_ok = n_taxa >= self.species_threshold
+        else:
+            sp_ok = np.zeros(len(n_taxa), dtype=bool)
 
-            elif (cp <= self.gene_threshold and self.gene_threshold) or \
-                    not self.gene_threshold:
-                return 1, 0
+        return gene_ok, sp_ok
 
-            elif (len(cl) >= self.species_threshold and
-                    self.species_threshold) or not self.species_threshold:
-                return 0, 1
+    def _update_stats(self):
+        """
+        Sets or updates the basic group statistics, such as the number of
+        orthologs compliant with the gene copy and minimum taxa filters.
+        Clusters left without sequences after the exclusion of taxa are
+        not counted.
+        """
+
+        hist = self._filter_summary(clusters=False)[2]
+        last_row = hist.shape[0] - 1
+
+        # Row and column of the histogram for the filters. A filter that is
+        # not set is never complied with, and falls in the row of the
+        # clusters without sequences or in the empty last column
+        row = min(max(int(math.floor(self.gene_threshold)), 0), last_row) \
+            if self.gene_threshold else 0
+        col = min(max(int(math.ceil(self.species_threshold)), 1),
+                  hist.shape[1] - 1) if self.species_threshold else \
+            hist.shape[1] - 1
+
+        self.all_clusters = int(hist[last_row, 1])
+        self.all_compliant = int(hist[row, col])
+
+        # A gene copy filter of 0 disables the filter, and in that case the
+        # species compliant clusters are not counted
+        if self.gene_threshold == 0:
+            self.num_gene_compliant = self.all_clusters
+            self.num_species_compliant = 0
+        else:
+            self.num_gene_compliant = int(hist[row, 1])
+            self.num_species_compliant = int(hist[last_row, col])
 
-            else:
-                return 0, 0
+    def _get_compliance(self):
+        """
+        Determines which ortholog clusters are compliant with the specified
+        ortholog filters. If no filter is set, all clusters with sequences
+        are compliant.
+
+        :return: boolean numpy array. True for the clusters compliant with
+        both the gene copy and minimum taxa filters
+        """
+
+        n_taxa, copies = self._cluster_stats()
+
+        if not self.gene_threshold and not self.species_threshold:
+            return n_taxa > 0
+
+        gene_ok, sp_ok = self._filter_masks(n_taxa, copies)
+
+        return (n_taxa > 0) & gene_ok & sp_ok
 
     def _reset_counter(self):
 
@@ -299,6 +594,14 @@ class GroupLight(object):
 
     def _parse_groups(self, ns=None):
 
+        # Column of each taxon in the species_counts matrix
+        columns = {}
+        # Column and number of sequences of each taxon, cluster after cluster
+        cols = []
+        vals = []
+        # Number of taxa of each cluster
+        row_lens = []
+
         for cl in self.groups():
 
             if ns:
@@ -308,27 +611,37 @@ class GroupLight(object):
             # Retrieve the field containing the ortholog sequences
             sequence_field = cl.split(":")[1]
 
-            # Update species frequency list
             sp_freq = Counter((x.split("|")[0] for x in
                               sequence_field.split()))
 
-            self.species_frequency.append(sp_freq)
+            for tx, n in sp_freq.iteritems():
+                if tx not in columns:
+                    columns[tx] = len(self.species_columns)
+                    self.species_columns.append(tx)
+                cols.append(columns[tx])
+                vals.append(n)
 
-            # Update number of sequences
-            self.total_seqs += len(sequence_field)
+            row_lens.append(len(sp_freq))
 
-            # Update max number of extra copies
-            extra_copies = max(sp_freq.values())
-            if extra_copies > self.max_extra_copy:
-                self.max_extra_copy = max(sp_freq.values())
+        dtype = np.uint16 if not vals or max(vals) <= np.iinfo(np.uint16).max \
+            else np.uint32
+        self.species_counts = np.zeros((len(row_lens),
+                                        len(self.species_columns)),
+                                       dtype=dtype)
+        self.species_counts[np.repeat(np.arange(len(row_lens)), row_lens),
+                            cols] = vals
 
-            self.species_list.extend([x for x in sp_freq if x not in
-                                      self.species_list])
+        self.species_list = list(self.species_columns)
 
-            # Apply filters, if any
-            # gene filter
-            if self.species_threshold and self.gene_threshold:
-                self._apply_filter(sp_freq)
+        # Update number of sequences
+        self.total_seqs = sum(vals)
+
+        # Update max number of extra copies
+        self.max_extra_copy = max(vals) if vals else 0
+
+        # Apply filters, if any
+        if self.species_threshold and self.gene_threshold:
+            self._update_stats()
 
     def exclude_taxa(self, taxa_list, update_stats=False):
         """
@@ -353,18 +666,14 @@ class GroupLight(object):
         self.excluded_taxa = taxa_list
 
         if update_stats:
-            self._reset_counter()
-            for cl in self.iter_species_frequency():
-                self._apply_filter(cl)
+            self._update_stats()
 
     def basic_group_statistics(self, update_stats=True):
 
         if update_stats:
-            self._reset_counter()
-            for cl in self.iter_species_frequency():
-                self._apply_filter(cl)
+            self._update_stats()
 
-        return len(self.species_frequency), self.total_seqs, \
+        return len(self.species_counts), self.total_seqs, \
             self.num_gene_compliant, self.num_species_compliant, \
             self.all_compliant
 
@@ -405,9 +714,7 @@ class GroupLight(object):
             self._get_sp_proportion()
 
         if update_stats:
-            self._reset_counter()
-            for cl in self.iter_species_frequency():
-                self._apply_filter(cl)
+            self._update_stats()
 
     def retrieve_sequences(self, sqldb, protein_db, dest="./",
                              shared_namespace=None, outfile=None):
@@ -428,58 +735,20 @@ class GroupLight(object):
         if not os.path.exists(join(dest, "header_correspondance")):
             os.makedirs(join(dest, "header_correspondance"))
 
-        if shared_namespace:
-            shared_namespace.act = shared_namespace.msg = "Creating database"
-            # Stores sequences that could not be retrieved
-            shared_namespace.missed = shared_namespace.counter = 0
-            shared_namespace.progress = 0
-            # Get number of lines of protein database
-            p = 0
-            with open(protein_db) as fh:
-                for p, _ in enumerate(fh):
-                    pass
-            shared_namespace.max_pb = shared_namespace.total = p + 1
+        table_name = create_sequence_index(sqldb, protein_db,
+                                           shared_namespace)
 
         # Connect to database
         con = sqlite3.connect(sqldb)
+        con.text_factory = str
         c = con.cursor()
 
-        table_name = "".join([x for x in protein_db if x.isalnum()]).encode(
-            "utf8")
-
-        # Create table if it does not exist
-        if not c.execute("SELECT name FROM sqlite_master WHERE type='table' "
-                         "AND name='{}'".format(table_name)).fetchall():
-
-            c.execute("CREATE TABLE [{}] (seq_id text PRIMARY KEY, seq text)".
-                      format(table_name))
-
-            # Populate database
-            with open(protein_db) as ph:
-                seq = ""
-                for line in ph:
-                    # Kill switch
-                    if shared_namespace:
-                        if shared_namespace.stop:
-                            con.close()
-                            raise KillByUser("")
-                        shared_namespace.progress += 1
-                        shared_namespace.counter += 1
-
-                    if line.startswith(">"):
-                        if seq != "":
-                            c.execute("INSERT INTO [{}] VALUES (?, ?)".
-                                      format(table_name), (seq_id, seq))
-                        seq_id = line.strip()[1:]
-                        seq = ""
-                    else:
-                        seq += line.strip()
-
-            con.commit()
+        protein_handle = open(protein_db, "rb")
 
         if shared_namespace:
             shared_namespace.act = shared_namespace.msg = "Fetching sequences"
             shared_namespace.good = shared_namespace.counter = 0
+            shared_namespace.missed = 0
             shared_namespace.progress = 0
             shared_namespace.max_pb = shared_namespace.total = \
                 self.all_compliant
@@ -488,17 +757,56 @@ class GroupLight(object):
         if outfile:
             output_handle = open(join(dest, outfile), "w")
 
-        # Fetching sequences
-        for line, cl in zip(self.groups(), self.iter_species_frequency()):
+        def write_clusters(clusters):
+            """
+            Retrieves the sequences of a batch of clusters with a single
+            pass over the index and protein database, and writes them
+            """
+
+            seqs = read_sequences(c, table_name, protein_handle,
+                                  [x for _, ids in clusters for x in ids])
+
+            for cl_name, seq_ids in clusters:
+                # Handles cases where the sequence could not be retrieved
+                # If outfile is set, output_handle will be a single file
+                # for all groups. If not, it will represent an individual
+                # group file
+                if not outfile:
+                    oname = join(dest, cl_name)
+                    mname = join(dest, "header_correspondance", cl_name)
+                    with open(oname + ".fas", "w") as fh, \
+                            open(mname + "_headerMap.csv", "w") as map_handle:
+                        for i in seq_ids:
+                            if i in seqs:
+                                tx_name = i.split("|")[0]
+                                fh.write(">{}\n{}\n".format(tx_name,
+                                                             seqs[i]))
+                                map_handle.write("{}; {}\n".format(i,
+                                                                   tx_name))
+                else:
+                    output_handle.writelines(
+                        ">{}\n{}\n".format(i, seqs[i]) for i in seq_ids
+                        if i in seqs)
+
+                if shared_namespace:
+                    shared_namespace.missed += len([x for x in seq_ids
+                                                    if x not in seqs])
+
+        # Fetching sequences. The compliant clusters are gathered in batches
+        # of about RETRIEVE_BATCH sequences
+        batch = []
+        batch_size = 0
+        for line, compliant in zip(self.groups(), self._get_compliance()):
 
             # Kill switch
             if shared_namespace:
                 if shared_namespace.stop:
                     con.close()
+                    protein_handle.close()
                     raise KillByUser("")
 
             # Filter sequences
-            if self._get_compliance(cl) == (1, 1):
+            if compliant:
 
                 if shared_namespace:
                     shared_namespace.good += 1
@@ -510,43 +818,22 @@ class GroupLight(object):
                     line = self._remove_tx(line)
                 fields = line.split(":")
 
-                # Open file
-                if not outfile:
-                    cl_name = fields[0]
-                    oname = join(dest, cl_name)
-                    mname = join(dest, "header_correspondance", cl_name)
-                    output_handle = open(oname + ".fas", "w")
-                    map_handle = open(mname + "_headerMap.csv", "w")
-
-                seqs = fields[-1].split()
-                for i in seqs:
-                    # Query database
-                    c.execute("SELECT * FROM [{}] WHERE seq_id = ?".
-                              format(table_name), (i,))
-                    vals = c.fetchone()
-                    # Handles cases where the sequence could not be retrieved
-                    # If outfile is set, output_handle will be a single file
-                    # for all groups. If not, it will represent an individual
-                    # group file
-                    try:
-                        if not outfile:
-                            tx_name = vals[0].split("|")[0]
-                            output_handle.write(">{}\n{}\n".format(tx_name,
-                                                                   vals[1]))
-                            map_handle.write("{}; {}\n".format(vals[0],
-                                                               tx_name))
-                        else:
-                            output_handle.write(">{}\n{}\n".format(vals[0],
-                                                                   vals[1]))
-                    except TypeError:
-                        pass
+                seq_ids = fields[-1].split()
+                batch.append((fields[0], seq_ids))
+                batch_size += len(seq_ids)
 
-                if not outfile:
-                    output_handle.close()
+                if batch_size >= RETRIEVE_BATCH:
+                    write_clusters(batch)
+                    batch = []
+                    batch_size = 0
+
+        if batch:
+            write_clusters(batch)
 
         if outfile:
             output_handle.close()
 
+        protein_handle.close()
         con.close()
 
     def export_filtered_group(self, output_file_name="filtered_groups",
@@ -559,8 +846,8 @@ class GroupLight(object):
 
         output_handle = open(os.path.join(dest, output_file_name), "w")
 
-        for p, (line, cl) in enumerate(zip(self.groups(),
-                                           self.iter_species_frequency())):
+        for p, (line, compliant) in enumerate(zip(self.groups(),
+                                                  self._get_compliance())):
 
             if shared_namespace:
                 if shared_namespace.stop:
@@ -569,7 +856,7 @@ class GroupLight(object):
             if shared_namespace:
                 shared_namespace.progress = p
 
-            if self._get_compliance(cl) == (1, 1):
+            if compliant:
                 if shared_namespace:
                     shared_namespace.good += 1
                 if self.excluded_taxa:
@@ -580,26 +867,44 @@ class GroupLight(object):
 
         output_handle.close()
 
+    def _taxa_totals(self, values, filt):
+        """
+        Sums the values of each included taxon across the ortholog clusters,
+        which are only the clusters compliant with the filters if filt is
+        True. The taxa with a total of 0 are discarded.
+
+        :param values: numpy array with the same shape as species_counts
+        :param filt: Boolean, whether or not to use the filtered groups.
+        :return: list of (taxon, total) tuples, sorted by decreasing total
+        """
+
+        if filt:
+            values = values[self._get_compliance()]
+
+        totals = values.sum(axis=0)
+
+        data = [(tx, int(totals[i])) for i, tx in
+                enumerate(self.species_columns)
+                if totals[i] and tx not in self.excluded_taxa]
+
+        return sorted(data, key=lambda x: x[1], reverse=True)
+
     def bar_species_distribution(self, filt=False):
 
         if filt:
-            data = Counter((len(cl) for cl in self.iter_species_frequency() if
-                           self._get_compliance(cl) == (1, 1)))
+            n_taxa = self._cluster_stats()[0][self._get_compliance()]
         else:
-            data = Counter((len(cl) for cl in self.species_frequency))
+            n_taxa = (self.species_counts > 0).sum(axis=1)
 
-        x_labels = [x for x in list(data)]
-        data = list(data.values())
+        x_labels, data = np.unique(n_taxa, return_counts=True)
 
         # When data is empty, return an exception
-        if not data:
+        if not len(data):
             return {"data": None}
 
-        # Sort lists
-        x_labels = [list(x) for x in zip(*sorted(zip(x_labels, data)))][0]
-
         # Convert label to strings
         x_labels = [str(x) for x in x_labels]
+        data = data.tolist()
 
         title = "Taxa frequency distribution"
         ax_names = ["Number of taxa", "Ortholog frequency"]
@@ -619,24 +924,22 @@ class GroupLight(object):
         """
 
         if filt:
-            data = Counter((max(cl.values()) for cl in
-                            self.iter_species_frequency() if
-                            self._get_compliance(cl) == (1, 1)))
+            copies = self._cluster_stats()[1][self._get_compliance()]
+        elif self.species_counts.shape[1]:
+            copies = self.species_counts.max(axis=1)
+            copies = copies[copies > 0]
         else:
-            data = Counter((max(cl.values()) for cl in self.species_frequency
-                           if cl))
+            copies = []
 
-        x_labels = [x for x in list(data)]
-        data = list(data.values())
+        x_labels, data = np.unique(copies, return_counts=True)
 
         # When data is empty, return an exception
-        if not data:
+        if not len(data):
             return {"data": None}
 
-        x_labels, data = (list(x) for x in zip(*sorted(zip(x_labels, data))))
-
         # Convert label to strings
         x_labels = [str(x) for x in x_labels]
+        data = data.tolist()
 
         title = "Gene copy distribution"
         ax_names = ["Number of gene copies", "Ortholog frequency"]
@@ -654,20 +957,9 @@ class GroupLight(object):
         :return:
         """
 
-        data = Counter(dict((x, 0) for x in self.species_list))
-
-        self._reset_counter()
-
-        for cl in self.iter_species_frequency():
-
-            self._apply_filter(cl)
-            if filt:
-                data += Counter(dict((x, 1) for x, y in cl.items() if y > 0 and
-                           self._get_compliance(cl) == (1, 1)))
-            else:
-                data += Counter(dict((x, 1) for x, y in cl.items() if y > 0))
+        self._update_stats()
 
-        data = data.most_common()
+        data = self._taxa_totals(self.species_counts > 0, filt)
 
         # When data is empty, return an exception
         if not data:
@@ -688,20 +980,11 @@ class GroupLight(object):
 
     def bar_genecopy_per_species(self, filt=False):
 
-        data = Counter(dict((x, 0) for x in self.species_list))
-
-        self._reset_counter()
-
-        for cl in self.iter_species_frequency():
-
-            self._apply_filter(cl)
-            if filt:
-                data += Counter(dict((x, y) for x, y in cl.items() if y > 1 and
-                           self._get_compliance(cl) == (1, 1)))
-            else:
-                data += Counter(dict((x, y) for x, y in cl.items() if y > 1))
+        self._update_stats()
 
-        data = data.most_common()
+        # Only the taxa with more than one copy in a cluster are counted
+        data = self._taxa_totals(np.where(self.species_counts > 1,
+                                          self.species_counts, 0), filt)
 
         # When data is empty, return an exception
         if not data:
@@ -1443,45 +1726,33 @@ class MultiGroups(object):
 
         return b_plt, lgd, table_list
 
-    def group_overlap(self):
+    def group_overlap(self, group_names=None):
         """
-        This will find the overlap of orthologs between two group files.
-        THIS METHOD IS TEMPORARY AND EXPERIMENTAL
+        Compares the ortholog clusters of every pair of group files. See
+        OverlapEngine.compare for the statistics of each comparison
+        :param group_names: list. Names of the group objects to compare. If
+        None, all group objects are compared
+        :return: OrderedDict with the comparison of each pair of group names
         """
 
-        def parse_groups(group_obj):
-            """
-            Returns a list with the sorted ortholog clusters
-            """
-
-            storage = []
-
-            for cluster in group_obj.groups:
-                storage.append(set(cluster.iter_sequences))
-
-            return storage
-
-        if len(self.multiple_groups) != 2:
-            raise SystemExit("This method can only be used with two group "
-                             "files")
+        engine = OverlapEngine()
 
-        group1 = self.multiple_groups[0]
-        group2 = self.multiple_groups[1]
+        for gname in group_names if group_names else \
+                sorted(self.multiple_groups):
+            engine.add_clusters(gname, ((cl.name, cl.sequences) for cl in
+                                        self.multiple_groups[gname].groups))
 
-        group1_list = parse_groups(group1)
-        group2_list = parse_groups(group2)
-
-        counter = 0
-        for i in group1_list:
-            if i in group2_list:
-                counter += 1
+        return engine.compare_all()
 
 
 class MultiGroupsLight(object):
     """
     Creates an object composed of multiple Group objects like MultiGroups.
     However, instead of storing the groups in memory, these are shelved in
-    the disk
+    the disk. The statistics and filters of each group are stored as json in
+    a sqlite table of db_path, and its species_counts matrix and filter
+    summary in numpy files, which are only loaded when a group operation
+    needs them
     """
 
     # The report calls available
@@ -1500,6 +1771,7 @@ class MultiGroupsLight(object):
         """
 
         self.db_path = db_path
+        self.store_file = os.path.join(db_path, "groups_store.db")
 
         # If a MultiGroups is initialized with duplicate Group objects, their
         # names will be stored in a list. If all Group objects are unique, the
@@ -1567,7 +1839,62 @@ class MultiGroupsLight(object):
 
     def __iter__(self):
         for k, val in self.groups.items():
-            yield k, pickle.load(open(val, "rb"))
+            yield k, self._load_group(val)
+
+    def _connect(self):
+        """
+        Returns a connection to the group store. A connection is opened for
+        each operation, so that the object can still be pickled
+        """
+
+        con = sqlite3.connect(self.store_file)
+        con.execute("CREATE TABLE IF NOT EXISTS groups (gpath TEXT PRIMARY "
+                    "KEY, state TEXT)")
+
+        return con
+
+    def _load_group(self, gpath):
+        """
+        Loads a group object from the store. Its species_counts matrix and
+        filter summary are loaded from their numpy files when needed
+        :param gpath: string. Path prefix of the stored group
+        """
+
+        con = self._connect()
+        state = con.execute("SELECT state FROM groups WHERE gpath=?",
+                            (gpath,)).fetchone()[0]
+        con.close()
+
+        return GroupLight.from_state(json.loads(state))
+
+    def _dump_group(self, group_obj, gpath):
+        """
+        Stores the statistics and filters of a group object. Its
+        species_counts matrix is saved only once, when the group is added,
+        and its filter summary only when the excluded taxa change
+        :param group_obj: GroupLight object
+        :param gpath: string. Path prefix of the stored group
+        """
+
+        group_obj.save_summary(gpath)
+
+        con = self._connect()
+        with con:
+            con.execute("INSERT OR REPLACE INTO groups VALUES (?, ?)",
+                        (gpath, json.dumps(group_obj.get_state())))
+        con.close()
+
+    def _remove_group_files(self, gpath):
+
+        for f in [gpath + x for x in [".npy", "_ntaxa.npy", "_copies.npy",
+                                      "_hist.npy"]]:
+            if os.path.exists(f):
+                os.remove(f)
+
+        con = self._connect()
+        with con:
+            con.execute("DELETE FROM groups WHERE gpath=?", (gpath,))
+        con.close()
 
     def clear_groups(self):
         """
@@ -1575,7 +1902,7 @@ class MultiGroupsLight(object):
         """
 
         for f in self.groups.values():
-            os.remove(f)
+            self._remove_group_files(f)
 
         self.duplicate_groups = []
         self.groups = {}
@@ -1596,7 +1923,8 @@ class MultiGroupsLight(object):
             gpath = os.path.join(self.db_path,
                     "".join(random.choice(string.ascii_uppercase) for _ in
                             range(15)))
-            pickle.dump(group_obj, open(gpath, "wb"))
+            group_obj.save_counts(gpath + ".npy")
+            self._dump_group(group_obj, gpath)
             self.groups[group_obj.name] = gpath
             self.filters[group_obj.name] = (1, len(group_obj.species_list), [])
             self.max_extra_copy[group_obj.name] = group_obj.max_extra_copy
@@ -1612,7 +1940,7 @@ class MultiGroupsLight(object):
         """
 
         if group_id in self.groups:
-            os.remove(self.groups[group_id])
+            self._remove_group_files(self.groups[group_id])
             del self.groups[group_id]
 
     def get_group(self, group_id):
@@ -1623,7 +1951,7 @@ class MultiGroupsLight(object):
         """
 
         try:
-            return pickle.load(open(self.groups[unicode(group_id)], "rb"))
+            return self._load_group(self.groups[unicode(group_id)])
         except KeyError:
             return
 
@@ -1659,7 +1987,7 @@ class MultiGroupsLight(object):
 
         for group_name in glist:
             # Get group object
-            group_obj = pickle.load(open(self.groups[group_name], "rb"))
+            group_obj = self._load_group(self.groups[group_name])
 
             # Define excluded taxa
             group_obj.exclude_taxa(excluded_taxa, True)
@@ -1680,7 +2008,7 @@ class MultiGroupsLight(object):
             # Update group stats
 
             self.get_multigroup_statistics(group_obj)
-            pickle.dump(group_obj, open(self.groups[group_name], "wb"))
+            self._dump_group(group_obj, self.groups[group_name])
             # Update filter map
 
             self.filters[group_name] = (gn_filter, group_obj.species_threshold)
@@ -1698,6 +2026,23 @@ class MultiGroupsLight(object):
                                         "species": group_obj.species_list,
                                         "max_copies": group_obj.max_extra_copy}
 
+    def group_overlap(self, group_names=None):
+        """
+        Compares the ortholog clusters of every pair of group files, which
+        are read from the group files themselves. See OverlapEngine.compare
+        for the statistics of each comparison
+        :param group_names: list. Names of the group objects to compare. If
+        None, all group objects are compared
+        :return: OrderedDict with the comparison of each pair of group names
+        """
+
+        engine = OverlapEngine()
+
+        for gname in group_names if group_names else sorted(self.groups):
+            engine.add_group_file(gname, gname)
+
+        return engine.compare_all()
+
     def bar_orthologs(self, group_names=None, output_file_name="Final_orthologs",
                              dest="./", stats="all"):
         """
@@ -0,0 +1,263 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+
+"""
+Comparison of the ortholog clusters of several group files.
+
+Every sequence header is coded as an integer, and each group file is stored
+as the concatenation of the sorted id arrays of its clusters. Two group
+files are compared through the contingency table of their clusters (the
+number of sequences shared by each pair of clusters), which is obtained by
+looking up the cluster of each sequence of the first file in the cluster
+labels of the second one and counting the resulting pairs with a sort.
+The number of identical, unique and overlapping clusters, and the Jaccard
+similarity between the two clusterings, are then reductions over that
+table, without any loop over clusters or sequences.
+"""
+
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def pair_count(x):
+    """
+    Returns the number of pairs of elements in sets of x elements
+    """
+
+    x = np.asarray(x, dtype=np.int64)
+    return x * (x - 1) // 2
+
+
+class Clustering(object):
+    """
+    The ortholog clusters of a group file, with the sequence ids of each
+    cluster stored as a sorted slice of a single array
+    """
+
+    def __init__(self, name, cluster_names, members, offsets):
+
+        self.name = name
+        self.cluster_names = cluster_names
+        # Sequence ids of the clusters, sorted within each cluster. Those of
+        # cluster i are members[offsets[i]:offsets[i + 1]]
+        self.members = members
+        self.offsets = offsets
+        self.sizes = np.diff(offsets)
+
+    def __len__(self):
+        return len(self.cluster_names)
+
+    def cluster(self, i):
+        """
+        Returns the sorted sequence ids of a cluster
+        :param i: int. Index of the cluster
+        """
+
+        return self.members[self.offsets[i]:self.offsets[i + 1]]
+
+    def labels(self, nseqs):
+        """
+        Returns the index of the cluster of each sequence id, or -1 for the
+        sequences that are not in this clustering
+        :param nseqs: int. Total number of sequence ids
+        """
+
+        labels = np.full(nseqs, -1, dtype=np.int64)
+        labels[self.members] = np.repeat(np.arange(len(self)), self.sizes)
+
+        return labels
+
+
+class OverlapEngine(object):
+    """
+    Indexes the clusters of several group files to compare them. A sequence
+    is expected to belong to a single cluster of a group file.
+    """
+
+    def __init__(self):
+
+        # Sequence headers, whose positions are their integer ids
+        self.seq_index = pd.Index([], dtype=object)
+        self.clusterings = OrderedDict()
+
+        # Cluster labels of the sequences of each clustering, computed when
+        # it is first compared. They are reset when a clustering is added
+        self._labels = {}
+
+    def add_clusters(self, name, clusters):
+        """
+        Adds a clustering
+        :param name: string. Name of the clustering (e.g. the group file)
+        :param clusters: iterable of (cluster name, list of sequence headers)
+        """
+
+        cluster_names = []
+        headers = []
+        sizes = []
+
+        for cl_name, seqs in clusters:
+            cluster_names.append(cl_name)
+            headers.extend(seqs)
+            sizes.append(len(seqs))
+
+        # Headers already indexed keep their ids, and the new ones are
+        # appended to the index
+        headers = np.array(headers, dtype=object)
+        members = self.seq_index.get_indexer(headers).astype(np.int64)
+        new = members < 0
+        if new.any():
+            codes, uniques = pd.factorize(headers[new])
+            members[new] = codes + len(self.seq_index)
+            self.seq_index = self.seq_index.append(pd.Index(uniques,
+                                                            dtype=object))
+
+        rows = np.repeat(np.arange(len(sizes)), sizes)
+        members = members[np.lexsort((members, rows))]
+        offsets = np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+        self.clusterings[name] = Clustering(name, cluster_names, members,
+                                            offsets)
+        self._labels = {}
+
+    def add_group_file(self, name, groups_file):
+        """
+        Adds the clusters of a group file, with lines such as
+        "cluster_name: taxonA|seq1 taxonB|seq2"
+        :param name: string. Name of the clustering
+        :param groups_file: string. Path to the group file
+        """
+
+        def parse(fh):
+            for line in fh:
+                if line.strip():
+                    cl_name, seqs = line.split(":", 1)
+                    yield cl_name.strip(), seqs.split()
+
+        with open(groups_file) as fh:
+            self.add_clusters(name, parse(fh))
+
+    @property
+    def nseqs(self):
+        return len(self.seq_index)
+
+    def _get_labels(self, name):
+
+        if name not in self._labels:
+            self._labels[name] = self.clusterings[name].labels(self.nseqs)
+
+        return self._labels[name]
+
+    def contingency(self, name1, name2):
+        """
+        Returns the pairs of clusters of two clusterings that share
+        sequences, and the number of shared sequences
+        :param name1: string. Name of the first clustering
+        :param name2: string. Name of the second clustering
+        :return: tuple of three numpy arrays, with the cluster indexes in the
+        first and second clustering, and the number of shared sequences
+        """
+
+        c1 = self.clusterings[name1]
+        c2 = self.clusterings[name2]
+
+        if not len(c1) or not len(c2):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        rows = np.repeat(np.arange(len(c1)), c1.sizes)
+        cols = self._get_labels(name2)[c1.members]
+        shared = cols >= 0
+
+        keys, counts = np.unique(rows[shared] * len(c2) + cols[shared],
+                                 return_counts=True)
+
+        return keys // len(c2), keys % len(c2), counts
+
+    def compare(self, name1, name2):
+        """
+        Compares the clusters of two clusterings
+        :param name1: string. Name of the first clustering
+        :param name2: string. Name of the second clustering
+        :return: dictionary with:
+            ..: "clusters": number of clusters of each clustering
+            ..: "shared": number of clusters with the same sequences in both
+            ..: "unique": number of clusters of each clustering that are not
+            in the other
+            ..: "overlapping": number of clusters of each clustering that
+            share sequences with clusters of the other
+            ..: "jaccard": pair counting Jaccard similarity of the two
+            clusterings, over the sequences present in both. It is the
+            proportion of the pairs of sequences clustered together in
+            either clustering that are clustered together in both
+        """
+
+        c1 = self.clusterings[name1]
+        c2 = self.clusterings[name2]
+
+        rows, cols, counts = self.contingency(name1, name2)
+
+        shared = int(np.count_nonzero((counts == c1.sizes[rows]) &
+                                      (counts == c2.sizes[cols])))
+
+        together = pair_count(counts).sum()
+        together1 = pair_count(np.bincount(rows, weights=counts).astype(
+            np.int64)).sum()
+        together2 = pair_count(np.bincount(cols, weights=counts).astype(
+            np.int64)).sum()
+        union = together1 + together2 - together
+
+        if union:
+            jaccard = float(together) / union
+        else:
+            # There are no pairs of shared sequences clustered together, so
+            # the clusterings only agree if they share sequences at all
+            jaccard = 1. if len(counts) else 0.
+
+        return {"clusters": (len(c1), len(c2)),
+                "shared": shared,
+                "unique": (len(c1) - shared, len(c2) - shared),
+                "overlapping": (len(np.unique(rows)), len(np.unique(cols))),
+                "jaccard": jaccard}
+
+    def compare_all(self, names=None):
+        """
+        Compares every pair of clusterings
+        :param names: list. Names of the clusterings to compare. If None, all
+        clusterings are compared
+        :return: OrderedDict with the result of compare for each pair of
+        names
+        """
+
+        names = names if names else list(self.clusterings)
+
+        return OrderedDict(((x, y), self.compare(x, y)) for x, y in
+                           itertools.combinations(names, 2))
+
+    def overlap_matrix(self, names=None, stat="jaccard"):
+        """
+        Returns a square matrix with a statistic of the comparison of every
+        pair of clusterings
+        :param names: list. Names of the clusterings to compare. If None, all
+        clusterings are compared
+        :param stat: string. Either "jaccard" or "shared"
+        :return: numpy array, in the order of names
+        """
+
+        names = names if names else list(self.clusterings)
+
+        matrix = np.zeros((len(names), len(names)))
+        for i, name in enumerate(names):
+            matrix[i, i] = 1. if stat == "jaccard" else \
+                len(self.clusterings[name])
+
+        for (x, y), res in self.compare_all(names).items():
+            i, j = names.index(x), names.index(y)
+            matrix[i, j] = matrix[j, i] = res[stat]
+
+        return matrix
+
+
+__author__ = "Diogo N. Silva"
@@ -2,7 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import os
+import itertools
+import multiprocessing
 import sqlite3 as lite
+import cPickle as pickle
+from array import array
 from decimal import Decimal
 
 try:
@@ -15,29 +19,169 @@ VAR_LENGTH = 0
 VAR_TAXON = 1
 cur = None
 
+# Number of SimilarSequences rows inserted at once
+BATCH_SIZE = 50000
+# Number of blast lines parsed between progress updates and kill switch
+# checks
+PROGRESS_LINES = 10000
+# Approximate size in bytes of the blast file shards parsed by each worker
+# in the multi-process mode
+SHARD_SIZE = 32 * 1024 ** 2
+
+# Genes of the compliant fasta files, set in each worker process by
+# init_shard_worker
+shard_genes = None
+
+
+class GeneIndex(object):
+    """
+    Compact index of the length and taxon of the genes in the compliant
+    fasta files. Headers map to a row of the lengths and taxon_ids arrays,
+    and each taxon name is stored only once in taxa. Indexing with a
+    header returns a (length, taxon) tuple, which can be accessed with
+    VAR_LENGTH and VAR_TAXON
+    """
+
+    def __init__(self):
+
+        self.taxa = []
+        self.headers = []
+        self.index = {}
+        self.lengths = array("l")
+        self.taxon_ids = array("H")
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __contains__(self, header):
+        return header in self.index
+
+    def __getitem__(self, header):
+
+        i = self.index[header]
+        return self.lengths[i], self.taxa[self.taxon_ids[i]]
+
+    def add_taxon(self, taxon):
+        """
+        Adds a taxon name and returns its id
+        """
+
+        self.taxa.append(intern(taxon))
+        return len(self.taxa) - 1
+
+    def add(self, header, taxon_id, length):
+        """
+        Adds a gene. When the header already exists, its values are
+        replaced
+        """
+
+        try:
+            i = self.index[header]
+            self.lengths[i] = length
+            self.taxon_ids[i] = taxon_id
+        except KeyError:
+            self.index[header] = len(self.headers)
+            self.headers.append(header)
+            self.lengths.append(length)
+            self.taxon_ids.append(taxon_id)
+
+    def __getstate__(self):
+
+        # The header lookup is rebuilt on load, which is faster than
+        # pickling the dictionary
+        return {"taxa": self.taxa,
+                "headers": "\n".join(self.headers),
+                "lengths": self.lengths.tostring(),
+                "taxon_ids": self.taxon_ids.tostring()}
+
+    def __setstate__(self, state):
+
+        self.taxa = [intern(x) for x in state["taxa"]]
+        self.headers = state["headers"].split("\n") \
+            if state["headers"] else []
+        self.index = dict(itertools.izip(self.headers, itertools.count()))
+        self.lengths = array("l")
+        self.lengths.fromstring(state["lengths"])
+        self.taxon_ids = array("H")
+        self.taxon_ids.fromstring(state["taxon_ids"])
+
+
+def get_fasta_files(files_dir):
+
+    # Filter hidden files and not fasta files (from extension)
+    return [x for x in os.listdir(files_dir)
+            if not x.startswith(".") or
+            x.endswith(".fasta") or
+            x.endswith(".fas") or
+            x.endswith(".fa")]
+
+
+def get_files_signature(files_dir, files_list):
+    """
+    Returns the name, size and modification time of the fasta files,
+    which are used to check whether a persisted GeneIndex is up to date
+    """
+
+    signature = []
+    for fasta in sorted(files_list):
+        st = os.stat(os.path.join(files_dir, fasta))
+        signature.append((fasta, st.st_size, st.st_mtime))
+
+    return signature
+
+
+def load_gene_index(index_file, signature):
+    """
+    Returns the GeneIndex persisted in index_file, or None if it does not
+    exist, cannot be read, or was created from different fasta files
+    """
+
+    try:
+        with open(index_file, "rb") as fh:
+            if pickle.load(fh) != signature:
+                return None
+            return pickle.load(fh)
+    except (IOError, EOFError, pickle.UnpicklingError, AttributeError,
+            ValueError, KeyError):
+        return None
+
+
+def save_gene_index(index_file, signature, genes):
+
+    with open(index_file, "wb") as fh:
+        pickle.dump(signature, fh, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(genes, fh, pickle.HIGHEST_PROTOCOL)
+
+
 """
 Read all fasta files from a folder, placing the genes present on those fasta
-into a single variable
+into a single GeneIndex
 """
 
 
-def get_genes(files_dir):
+def get_genes(files_dir, index_file=None):
+    """
+    When index_file is provided, the GeneIndex persisted in that file is
+    reused if the fasta files did not change since it was created.
+    Otherwise, the index is built and saved to index_file
+    """
 
-    genes = {}
+    files_list = get_fasta_files(files_dir)
 
-    # Filter hidden files and not fasta files (from extension)
-    files_list = [x for x in os.listdir(files_dir)
-                  if not x.startswith(".") or
-                  x.endswith(".fasta") or
-                  x.endswith(".fas") or
-                  x.endswith(".fa")]
+    if index_file:
+        signature = get_files_signature(files_dir, files_list)
+        genes = load_gene_index(index_file, signature)
+        if genes is not None:
+            return genes
+
+    genes = GeneIndex()
 
     # for all fast files in fasta directory
     for fasta in files_list:
 
         # get taxon from file name
         # splitted = fasta.split(".")
-        taxon = os.path.splitext(fasta)[0]
+        taxon_id = genes.add_taxon(os.path.splitext(fasta)[0])
 
         # open file
         fasta_file = open(os.path.join(files_dir, fasta), "r")
@@ -51,49 +195,44 @@ def get_genes(files_dir):
             if not line: # or line.endswith("*"):
                 continue
 
-            new_gene = True if line.startswith(">") else False
-
-            if new_gene:
+            if line.startswith(">"):
                 # save previous gene info
                 if gene:
-                    genes[gene][VAR_LENGTH] = length
+                    genes.add(gene, taxon_id, length)
 
                 # save new gene info
                 gene = line[1:]
-                genes[gene] = [None, taxon]
 
                 # reset vars
                 length = 0
             else:
                 length += len(line)
 
-        genes[gene][VAR_LENGTH] = length
+        if gene:
+            genes.add(gene, taxon_id, length)
 
         fasta_file.close()
 
+    if index_file:
+        save_gene_index(index_file, signature, genes)
+
     return genes
 
 
 def get_taxon_and_length(subject, genes):
 
-    subject["queryTaxon"] = genes[subject["queryId"]][VAR_TAXON]
-    subject["subjectTaxon"] = genes[subject["subjectId"]][VAR_TAXON]
-    subject["queryLength"] = genes[subject["queryId"]][VAR_LENGTH]
-    subject["subjectLength"] = genes[subject["subjectId"]][VAR_LENGTH]
-
-    try:
-        subject["subjectTaxon"]
-    except KeyError:
-        print ("couldn't find taxon for gene " + subject["subjectId"])
-    try:
-        subject["queryTaxon"]
-    except KeyError:
-        print ("couldn't find taxon for gene " + subject["queryId"])
+    subject["queryLength"], subject["queryTaxon"] = \
+        genes[subject["queryId"]]
+    subject["subjectLength"], subject["subjectTaxon"] = \
+        genes[subject["subjectId"]]
 
     return subject["queryLength"] < subject["subjectLength"]
 
 
-def print_previous_subject(subject, db):
+def subject_row(subject):
+    """
+    Returns the SimilarSequences row of a subject
+    """
 
     non_overlap = non_overlapping_match(subject)
 
@@ -107,16 +246,24 @@ def print_previous_subject(subject, db):
     percent_match = '{0:.3g}'.format((float(non_overlap) /
                                       float(shorter_length) * 1000 + .5) / 10)
 
-    db.execute("INSERT OR IGNORE INTO SimilarSequences VALUES(?, ?, ?, ?, ?, ? ,?, ?)",
-                [subject["queryId"],
-                subject["subjectId"],
-                subject["queryTaxon"],
-                subject["subjectTaxon"],
-                float(subject["evalueMant"]),
-                int(subject["evalueExp"]),
-                float(percent_ident),
-                float(percent_match)])
-    
+    return (subject["queryId"],
+            subject["subjectId"],
+            subject["queryTaxon"],
+            subject["subjectTaxon"],
+            float(subject["evalueMant"]),
+            int(subject["evalueExp"]),
+            float(percent_ident),
+            float(percent_match))
+
+
+def insert_rows(db, rows):
+    """
+    Inserts a batch of rows into the SimilarSequences table
+    """
+
+    db.executemany("INSERT OR IGNORE INTO SimilarSequences "
+                   "VALUES(?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
 
 def format_evalue(evalue):
     if evalue == '0':
@@ -128,6 +275,39 @@ def format_evalue(evalue):
     return [round(float(x), 2) for x in evalue.split("E")]
 
 
+def parse_evalue(evalue):
+    """
+    Numeric alternative to format_evalue. E-values whose mantissa has up
+    to three significant digits (which includes those written by USEARCH)
+    are split into mantissa and exponent directly from the string, since
+    no rounding is required. Other e-values fall back to format_evalue,
+    so that the result is always the same.
+    """
+
+    if evalue == '0':
+        return 0, 0
+
+    mant, sep, exp = evalue.lower().partition("e")
+    int_part, _, frac_part = mant.partition(".")
+    digits = int_part + frac_part
+
+    # Significant digits of the mantissa
+    leading = digits.lstrip("0")
+    sig = leading.rstrip("0")
+
+    if not sig or len(sig) > 3 or not digits.isdigit():
+        return format_evalue(evalue)
+
+    try:
+        exp = int(exp) if sep else 0
+    except ValueError:
+        return format_evalue(evalue)
+
+    exp += len(int_part) - 1 - (len(digits) - len(leading))
+
+    return [float(sig[0] + "." + sig[1:]), float(exp)]
+
+
 def non_overlapping_match(subject):
 
     # flatten lists
@@ -172,7 +352,155 @@ def get_start_end(h):
     return start, end
 
 
-def orthomcl_blast_parser(blast_file, fasta_dir, db_dir, nm):
+def iter_subject_rows(lines, genes):
+    """
+    Generates the SimilarSequences rows from the lines of a blast file.
+    All HSPs of a query/subject pair must be contiguous in `lines`
+    """
+
+    prev_subjectid = ''
+    prev_queryid = ''
+    # hash to hold subject info
+    subject = {}
+
+    for line in lines:
+
+        splitted = line.split()
+
+        query_id = splitted[0]
+        subject_id = splitted[1]
+
+        if query_id != prev_queryid or subject_id != prev_subjectid:
+
+            # store previous subject
+            if subject:
+                yield subject_row(subject)
+
+            # initialize new one from first HSP
+            prev_subjectid = subject_id
+            prev_queryid = query_id
+
+            # from first hsp
+            tup = parse_evalue(splitted[10])
+
+            subject = {"queryId": query_id}
+            subject["subjectId"] = subject_id
+            subject["queryShorter"] = get_taxon_and_length(subject, genes)
+
+            subject["evalueMant"] = tup[0]
+            subject["evalueExp"] = tup[1]
+            subject["totalIdentities"] = 0
+            subject["totalLength"] = 0
+            subject["hspspans"] = []
+
+        # get additional info from subsequent HSPs
+        length = int(splitted[3])
+        if subject["queryShorter"]:
+            hspspan = (int(splitted[6]), int(splitted[7]))
+        else:
+            hspspan = (int(splitted[8]), int(splitted[9]))
+        subject["hspspans"].append(hspspan)
+        subject["totalIdentities"] += float(splitted[2]) * length
+        subject["totalLength"] += length
+
+    if subject:
+        yield subject_row(subject)
+
+
+def shard_blast_file(blast_file, nshards):
+    """
+    Splits a blast file into at most `nshards` (start, end) byte ranges.
+    Since the hits are grouped by query, each range starts at the first
+    hit of a query, so that the HSPs of a query/subject pair are never
+    split between shards
+    """
+
+    size = os.path.getsize(blast_file)
+    bounds = [0]
+
+    with open(blast_file, "rb") as fh:
+        for i in xrange(1, nshards):
+
+            pos = size * i // nshards
+            if pos <= bounds[-1]:
+                continue
+
+            # Move to the start of the next complete line
+            fh.seek(pos)
+            fh.readline()
+
+            # Move to the first line of the next query
+            query_id = fh.readline().split(None, 1)[:1]
+            while query_id:
+                line_start = fh.tell()
+                line = fh.readline()
+                if line.split(None, 1)[:1] != query_id:
+                    break
+
+            if query_id and line and line_start > bounds[-1]:
+                bounds.append(line_start)
+
+    bounds.append(size)
+
+    return [(x, y) for x, y in zip(bounds, bounds[1:]) if y > x]
+
+
+def init_shard_worker(genes):
+    """
+    Sets the genes of the compliant fasta files in a worker process
+    """
+
+    global shard_genes
+    shard_genes = genes
+
+
+def parse_blast_shard(args):
+    """
+    Parses a byte range of a blast file in a worker process. Returns the
+    SimilarSequences rows and the number of bytes parsed, so that the
+    rows are inserted by the main process, which remains the only writer
+    """
+
+    blast_file, start, end = args
+
+    with open(blast_file, "rb") as fh:
+        fh.seek(start)
+        lines = fh.read(end - start).splitlines()
+
+    return list(iter_subject_rows(lines, shard_genes)), end - start
+
+
+def track_progress(blast_fh, nm):
+    """
+    Yields the lines of the blast file while updating the progress and
+    checking the kill switch every PROGRESS_LINES lines
+    """
+
+    read_bytes = 0
+    for i, line in enumerate(blast_fh):
+
+        read_bytes += len(line)
+
+        if not i % PROGRESS_LINES:
+            if nm.stop:
+                raise KillByUser("")
+            nm.counter = read_bytes
+
+        yield line
+
+    nm.counter = read_bytes
+
+
+def orthomcl_blast_parser(blast_file, fasta_dir, db_dir, nm, processes=1,
+                          index_file=None):
+    """
+    Parses the all-vs-all blast file into the SimilarSequences table of
+    orthoDB. When `processes` is larger than one, the blast file is split
+    into query aligned shards that are parsed by a pool of workers, while
+    the rows are inserted in the original order of the file by this
+    process. index_file is the path where the GeneIndex of the fasta files
+    is persisted, so that it can be reused by later runs
+    """
 
     # create connection to DB
     con = lite.connect(os.path.join(db_dir, "orthoDB.db"))
@@ -180,77 +508,68 @@ def orthomcl_blast_parser(blast_file, fasta_dir, db_dir, nm):
         #global cur
         cur = con.cursor()
 
-        prev_subjectid = ''
-        prev_queryid = ''
-        # hash to hold subject info
-        subject = {}
+        # SimilarSequences rows waiting to be inserted
+        rows = []
 
-        # Set progress information
+        # Set progress information. Progress is measured in bytes of the
+        # blast file, so that it does not have to be read beforehand
         if nm:
             if nm.stop:
                 raise KillByUser("")
-            total = 0
-            for total, _ in enumerate(open(blast_file)):
-                pass
-            nm.total = total
+            nm.total = os.path.getsize(blast_file)
             nm.msg = None
             nm.counter = 0
 
         # parse fasta files
-        genes = get_genes(fasta_dir)
-        blast_fh = open(blast_file, "r")
-
-        for line in blast_fh:
-
-            if nm:
-                if nm.stop:
-                    raise KillByUser("")
-                nm.counter += 1
-
-            splitted = line.split()
-
-            query_id = splitted[0]
-            subject_id = splitted[1]
-            percent_identity = splitted[2]
-            length = int(splitted[3])
-            query_start = splitted[6]
-            query_end = splitted[7]
-            subject_start = splitted[8]
-            subject_end = splitted[9]
-            evalue = splitted[10]
-
-            if query_id != prev_queryid or subject_id != prev_subjectid:
-
-                # print previous subject
-                if subject:
-                    print_previous_subject(subject, cur)
-
-                # initialize new one from first HSP
-                prev_subjectid = subject_id
-                prev_queryid = query_id
-
-                # from first hsp
-                tup = format_evalue(evalue)
-
-                subject = {"queryId": query_id}
-                subject["subjectId"] = subject_id
-                subject["queryShorter"] = get_taxon_and_length(subject, genes)
-
-                subject["evalueMant"] = tup[0]
-                subject["evalueExp"] = tup[1]
-                subject["totalIdentities"] = 0
-                subject["totalLength"] = 0
-                subject["hspspans"] = []
-
-            # get additional info from subsequent HSPs
-            hspspan = (subject_start, subject_end)
-            if subject and subject["queryShorter"]:
-                hspspan = (query_start, query_end)
-            subject["hspspans"].append(hspspan)
-            subject["totalIdentities"] += float(percent_identity) * length
-            subject["totalLength"] += length
-
-        print_previous_subject(subject, cur)
+        genes = get_genes(fasta_dir, index_file)
+
+        if processes > 1:
+
+            nshards = max(processes,
+                          os.path.getsize(blast_file) // SHARD_SIZE)
+            shards = shard_blast_file(blast_file, nshards)
+
+            pool = multiprocessing.Pool(min(processes, len(shards) or 1),
+                                        initializer=init_shard_worker,
+                                        initargs=(genes,))
+
+            try:
+                read_bytes = 0
+                # imap returns the shards in the order of the file
+                for shard_rows, shard_bytes in pool.imap(
+                        parse_blast_shard,
+                        [(blast_file, x, y) for x, y in shards]):
+
+                    insert_rows(cur, shard_rows)
+
+                    if nm:
+                        if nm.stop:
+                            raise KillByUser("")
+                        read_bytes += shard_bytes
+                        nm.counter = read_bytes
+
+                pool.close()
+
+            finally:
+                pool.terminate()
+                pool.join()
+
+        else:
+
+            blast_fh = open(blast_file, "r")
+
+            for row in iter_subject_rows(
+                    track_progress(blast_fh, nm) if nm else blast_fh, genes):
+
+                rows.append(row)
+
+                if len(rows) == BATCH_SIZE:
+                    insert_rows(cur, rows)
+                    rows = []
+
+            insert_rows(cur, rows)
+
+            blast_fh.close()
 
     con.close()
 
@@ -2,33 +2,161 @@
 # -*- coding: utf-8 -*-
 
 import os
-import re
+import shutil
+import string
+import multiprocessing
 
 try:
     from process.error_handling import KillByUser
 except ImportError:
     from trifusion.process.error_handling import KillByUser
 
+# Characters of a sequence that are not amino acids (e.g. stop codons), and
+# line breaks, which are not part of the sequence
+NON_LETTERS = "".join(c for c in map(chr, range(256))
+                      if c not in string.ascii_letters)
+LINE_BREAKS = "\r\n"
 
-def orthomcl_filter_fasta(input_dir, min_length, max_stop_percent, db, dest,
-                             nm=None):
+# Size of the chunks read from the fasta files, and buffer size of the
+# good and poor protein files
+BUFFER_SIZE = 1024 * 1024
 
-    def handle_seq(seq, length, stop_cnt):
-        is_bad = 0
-        stop_percent = ((length - stop_cnt) / length) * 100
+# Number of records written at a time
+WRITE_BATCH = 10000
 
-        if length < min_length or stop_percent > max_stop_percent:
-            bad.write(seq + "\n")
-            is_bad = 1
-        else:
-            good.write(seq + "\n")
+# Proteomes with a higher percentage of poor proteins are reported
+REPORT_REJECT_PERCENT = 10
+
+
+def iter_records(input_file):
+    """
+    Yields the records of a fasta file, without the leading '>', reading
+    it in chunks of BUFFER_SIZE bytes
+    """
+
+    rest = ""
+    first = True
+
+    while True:
+        chunk = input_file.read(BUFFER_SIZE)
+        if not chunk:
+            break
+
+        records = (rest + chunk).split("\n>")
+        rest = records.pop()
+
+        for record in records:
+            if first:
+                first = False
+                # Lines before the first header are ignored
+                if not record.startswith(">"):
+                    continue
+                record = record[1:]
+            yield record
+
+    if rest:
+        if first:
+            if not rest.startswith(">"):
+                return
+            rest = rest[1:]
+        yield rest
+
+
+def handle_seq(record, min_length, max_stop_percent):
+    """
+    Returns a fasta record with its residues in a single line, and whether
+    the sequence is too short or has too many stop codons
+    """
+
+    header, _, seq = record.partition("\n")
 
-        return is_bad
+    seq = seq.translate(None, LINE_BREAKS)
+    residues = seq.translate(None, NON_LETTERS)
+
+    length = len(seq)
+    stop_cnt = length - len(residues)
+
+    is_bad = length < min_length or not length or \
+        stop_cnt * 100. / length > max_stop_percent
+
+    return ">{}\n{}\n".format(header.rstrip(LINE_BREAKS), residues), is_bad
+
+
+def filter_file(filename, good, bad, min_length, max_stop_percent):
+    """
+    Writes the sequences of a fasta file to the good or bad file handles,
+    and returns the number of sequences and of rejected sequences
+    """
+
+    seq_count = 0
+    reject_seq_count = 0
+
+    with open(filename) as input_file:
+
+        good_records = []
+        bad_records = []
+
+        for record in iter_records(input_file):
+
+            record, is_bad = handle_seq(record, min_length, max_stop_percent)
+
+            if is_bad:
+                bad_records.append(record)
+            else:
+                good_records.append(record)
 
-    good = open(os.path.join(dest, "backstage_files", db), "w")
-    bad = open(os.path.join(dest, "backstage_files", "poorProteins.txt"), "w")
+            seq_count += 1
 
-    filenames = [os.path.join(input_dir, x) for x in os.listdir(input_dir)]
+            if len(good_records) + len(bad_records) == WRITE_BATCH:
+                good.writelines(good_records)
+                bad.writelines(bad_records)
+                reject_seq_count += len(bad_records)
+                good_records = []
+                bad_records = []
+
+        good.writelines(good_records)
+        bad.writelines(bad_records)
+        reject_seq_count += len(bad_records)
+
+    return seq_count, reject_seq_count
+
+
+def filter_file_worker(args):
+    """
+    Filters a fasta file in a worker process into temporary good and bad
+    files, which are appended to the final files by the main process
+    """
+
+    filename, good_file, bad_file, min_length, max_stop_percent = args
+
+    with open(good_file, "w", BUFFER_SIZE) as good, \
+            open(bad_file, "w", BUFFER_SIZE) as bad:
+        counts = filter_file(filename, good, bad, min_length,
+                             max_stop_percent)
+
+    return counts
+
+
+def orthomcl_filter_fasta(input_dir, min_length, max_stop_percent, db, dest,
+                             nm=None, processes=1):
+    """
+    Writes the proteins of the fasta files in input_dir that pass the
+    minimum length and maximum stop codon percentage to the db file, and
+    the remaining to poorProteins.txt. The fasta files are filtered in a
+    pool of `processes` worker processes.
+
+    :returns: list, [file name, percentage] of the files with more than
+    REPORT_REJECT_PERCENT percent of poor proteins, sorted by decreasing
+    percentage
+    """
+
+    bs_dir = os.path.join(dest, "backstage_files")
+
+    good = open(os.path.join(bs_dir, db), "w", BUFFER_SIZE)
+    bad = open(os.path.join(bs_dir, "poorProteins.txt"), "w", BUFFER_SIZE)
+
+    filenames = [os.path.join(input_dir, x) for x in os.listdir(input_dir)
+                 if not x.startswith(".")]
 
     reject_rates = []
 
@@ -39,64 +167,74 @@ def orthomcl_filter_fasta(input_dir, min_length, max_stop_percent, db, dest,
         nm.total = len(filenames)
         nm.counter = 0
 
-    for filename in filenames:
-
-        if nm:
-            if nm.stop:
-                raise KillByUser("")
-            nm.counter += 1
-            nm.msg = "Filtering file {}".format(os.path.basename(filename))
-
-        if filename.startswith('.'):
-            continue
-
-        input_file = open(filename, 'r')
-        seq_count = 0
-        reject_seq_count = 0
-        current_seq = ""
-        current_len = 0
-        current_stop_cnt = 0
-
-        # process lines of one file
-        for line in input_file:
-
-            if nm:
-                if nm.stop:
-                    raise KillByUser("")
-
-            if line.startswith('>'):
-                if current_seq:
-                    seq_count += 1
-                    reject_seq_count += handle_seq(current_seq,
-                                                   current_len,
-                                                   current_stop_cnt)
-                    current_seq = ""
-                    current_len = 0
-                    current_stop_cnt = 0
-            else:
-                line_len = len(line)
-                current_len += line_len
-                line = re.sub('[^A-Za-z]', '', line)
-                current_stop_cnt += line_len - len(line)
-
-            current_seq += line
-
-        reject_seq_count += handle_seq(current_seq,
-                                       current_len,
-                                       current_stop_cnt)
-        seq_count += 1
+    def add_counts(filename, seq_count, reject_seq_count):
 
         # add file stats to reject count if it qualifies
         if reject_seq_count:
-            pct = reject_seq_count / seq_count * 100
-            if pct > 10:
-                reject_rates.append([input_file, pct])
+            pct = reject_seq_count * 100. / seq_count
+            if pct > REPORT_REJECT_PERCENT:
+                reject_rates.append([os.path.basename(filename), pct])
+
+    try:
+        if processes > 1 and len(filenames) > 1:
+
+            tmp_files = [(os.path.join(bs_dir, "{}.good".format(i)),
+                          os.path.join(bs_dir, "{}.bad".format(i)))
+                         for i in range(len(filenames))]
+
+            pool = multiprocessing.Pool(min(processes, len(filenames)))
+
+            try:
+                # imap returns the results in the order of the files, whose
+                # sequences are then appended in that order
+                for filename, (good_file, bad_file), counts in zip(
+                        filenames, tmp_files, pool.imap(
+                            filter_file_worker,
+                            [(x, y, z, min_length, max_stop_percent)
+                             for x, (y, z) in zip(filenames, tmp_files)])):
+
+                    if nm:
+                        if nm.stop:
+                            raise KillByUser("")
+                        nm.counter += 1
+                        nm.msg = "Filtering file {}".format(
+                            os.path.basename(filename))
+
+                    for tmp_file, fh in [(good_file, good), (bad_file, bad)]:
+                        with open(tmp_file) as tmp_fh:
+                            shutil.copyfileobj(tmp_fh, fh, BUFFER_SIZE)
+                        os.remove(tmp_file)
+
+                    add_counts(filename, *counts)
+
+                pool.close()
+
+            finally:
+                pool.terminate()
+                pool.join()
+                for tmp_file in [x for y in tmp_files for x in y]:
+                    if os.path.exists(tmp_file):
+                        os.remove(tmp_file)
 
-        input_file.close()
+        else:
 
-    good.close()
-    bad.close()
+            for filename in filenames:
 
+                if nm:
+                    if nm.stop:
+                        raise KillByUser("")
+                    nm.counter += 1
+                    nm.msg = "Filtering file {}".format(
+                        os.path.basename(filename))
 
-__author__ = "Fernando Alves"
+                add_counts(filename, *filter_file(
+                    filename, good, bad, min_length, max_stop_percent))
+
+    finally:
+        good.close()
+        bad.close()
+
+    return sorted(reject_rates, key=lambda x: x[1], reverse=True)
 
+
+__author__ = "Fernando Alves"
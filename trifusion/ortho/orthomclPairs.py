@@ -3,7 +3,9 @@
 
 import sqlite3 as lite
 import os
+import re
 import math
+import time
 
 try:
     from process.error_handling import KillByUser
@@ -67,6 +69,84 @@ except ImportError:
 def log(value):
     return math.log10(value)
 
+# Execution modes of the pairs step. "default" runs on orthoDB with the
+# default sqlite settings, "tuned" applies TUNED_PRAGMAS to orthoDB and
+# "memory" runs on an in-memory copy of orthoDB that is written back to
+# disk at the end
+EXECUTION_MODES = ["default", "tuned", "memory"]
+
+TUNED_PRAGMAS = ["PRAGMA cache_size = -262144",
+                 "PRAGMA temp_store = MEMORY",
+                 "PRAGMA journal_mode = WAL",
+                 "PRAGMA synchronous = NORMAL",
+                 "PRAGMA mmap_size = 1073741824"]
+
+step_re = re.compile(r"\s*(create\s+(?:unique\s+)?(?:table|index)|"
+                     r"insert\s+into|update)\s+(\w+)", re.I)
+
+
+class StepTimer(object):
+    """
+    Cursor wrapper that records the execution time of each statement,
+    labelled with the statement type and the table or index it creates
+    """
+
+    def __init__(self, cur):
+
+        self.cur = cur
+        self.timings = []
+
+    def execute(self, sql, *args):
+
+        start = time.time()
+        res = self.cur.execute(sql, *args)
+        self.add(step_name(sql), time.time() - start)
+
+        return res
+
+    def add(self, step, elapsed):
+        self.timings.append((step, elapsed))
+
+    def fetchone(self):
+        return self.cur.fetchone()
+
+
+def step_name(sql):
+
+    m = step_re.match(sql)
+    if m:
+        return "{} {}".format(" ".join(m.group(1).lower().split()),
+                              m.group(2))
+    else:
+        return " ".join(sql.split()[:2])
+
+
+def copy_database(con, src, dest):
+    """
+    Copies the tables, views and indexes of the src database into dest.
+    Both are database names in con (main or attached). The indexes are
+    created after the data is copied
+    """
+
+    schema = con.execute("select type, name, sql from %s.sqlite_master "
+                         "where sql is not null and name not like 'sqlite_%%' "
+                         "order by rowid" % src).fetchall()
+
+    for obj_type, name, sql in schema:
+        if obj_type == "table":
+            con.execute(re.sub(r"^(\s*CREATE\s+TABLE\s+)", r"\1%s." % dest,
+                               sql, flags=re.I))
+            con.execute('insert into %s."%s" select * from %s."%s"' %
+                        (dest, name, src, name))
+
+    for obj_type, name, sql in schema:
+        if obj_type in ("view", "index"):
+            con.execute(re.sub(r"^(\s*CREATE\s+(?:UNIQUE\s+)?"
+                               r"(?:VIEW|INDEX)\s+)",
+                               r"\1%s." % dest, sql, flags=re.I))
+
+    con.commit()
+
 def orthologTaxonSub (cur, co):
 
     #assuming in perl a var is true if not ""
@@ -430,32 +510,90 @@ def coorthologs (cur):
     normalizeOrthologsSub(cur, "Co", "CoOrtholog")
 
 
-def execute(db_dir, nm=None):
-    con = lite.connect(os.path.join(db_dir, "orthoDB.db"))
+def execute(db_dir, nm=None, mode="default"):
+    """
+    Runs the pairs step on orthoDB using one of the EXECUTION_MODES.
+    Returns a list of (step, seconds) tuples with the timings of each
+    statement
+    """
+
+    if mode not in EXECUTION_MODES:
+        raise ValueError("Unknown pairs execution mode: {}".format(mode))
 
-    with con:
+    db_path = os.path.join(db_dir, "orthoDB.db")
 
-        if nm:
-            if nm.stop:
-                raise KillByUser("")
-            nm.total = 4
-            nm.counter = 0
-            nm.msg = None
+    if mode == "memory":
+        con = lite.connect(":memory:")
+    else:
+        con = lite.connect(db_path)
 
-        con.create_function("log", 1, log)
+    try:
+        cur = StepTimer(con.cursor())
 
-        cur = con.cursor()
+        if mode != "default":
+            for pragma in TUNED_PRAGMAS:
+                con.execute(pragma)
 
-        for func in [commonTempTables, orthologs, inparalogs, coorthologs]:
+        if mode == "memory":
+            start = time.time()
+            con.execute("attach database ? as disk", (db_path,))
+            copy_database(con, "disk", "main")
+            con.execute("detach database disk")
+            cur.add("load orthoDB", time.time() - start)
+
+        with con:
 
             if nm:
                 if nm.stop:
                     raise KillByUser("")
-                nm.counter += 1
-
-            func(cur)
-
-    con.close()
+                nm.total = 4
+                nm.counter = 0
+                nm.msg = None
+
+            con.create_function("log", 1, log)
+
+            for func in [commonTempTables, orthologs, inparalogs,
+                         coorthologs]:
+
+                if nm:
+                    if nm.stop:
+                        raise KillByUser("")
+                    nm.counter += 1
+
+                func(cur)
+
+        if mode == "memory":
+            # The database is written to a new file that replaces orthoDB
+            start = time.time()
+            tmp_path = db_path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            con.execute("attach database ? as out", (tmp_path,))
+            con.execute("PRAGMA out.journal_mode = OFF")
+            con.execute("PRAGMA out.synchronous = OFF")
+            copy_database(con, "main", "out")
+            con.execute("detach database out")
+
+            try:
+                os.rename(tmp_path, db_path)
+            except OSError:
+                # Windows does not allow replacing an existing file
+                os.remove(db_path)
+                os.rename(tmp_path, db_path)
+
+            cur.add("write orthoDB", time.time() - start)
+
+    finally:
+        try:
+            if mode == "tuned":
+                # Checkpoints the WAL, so that orthoDB is self contained
+                # even when the step is interrupted
+                con.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            con.close()
+
+    return cur.timings
 
 if __name__ == '__main__':
     execute(".")
@@ -0,0 +1,420 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+
+"""
+Array implementation of the orthoMCL pairs algorithm of orthomclPairs.
+
+SimilarSequences is loaded into integer coded columns, where the codes of
+sequences and taxa follow the sort order of their names (so that code
+comparisons are equivalent to the text comparisons of the SQL queries),
+and best hits, reciprocal best hits, in-paralogs, co-orthologs and the
+per-taxon score normalization are computed with sorting, searchsorted and
+bincount operations. The results are inserted into the Ortholog,
+InParalog and CoOrtholog tables of orthoDB, so that the pair files and
+mclInput are dumped by orthomclDumpPairsFiles as usual. Unlike the SQL
+engine, no intermediate tables are created and SimilarSequences is not
+modified.
+"""
+
+import sqlite3 as lite
+import os
+import gc
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from process.error_handling import KillByUser
+except ImportError:
+    from trifusion.process.error_handling import KillByUser
+
+
+class SimilarityArrays(object):
+    """
+    Integer coded columns of the SimilarSequences table
+    """
+
+    def __init__(self, con):
+
+        # The garbage collector is disabled while the rows are fetched,
+        # since the millions of tuples created would trigger a large
+        # number of collections
+        gc.disable()
+        try:
+            df = pd.read_sql_query(
+                "select query_id, subject_id, query_taxon_id, "
+                "subject_taxon_id, evalue_mant, evalue_exp, percent_match "
+                "from SimilarSequences", con)
+        finally:
+            gc.enable()
+        df.columns = ["query_id", "subject_id", "query_taxon_id",
+                      "subject_taxon_id", "evalue_mant", "evalue_exp",
+                      "percent_match"]
+
+        nrows = len(df)
+
+        codes, self.seq_names = pd.factorize(
+            np.concatenate([df.query_id.values, df.subject_id.values]),
+            sort=True)
+        self.query = codes[:nrows].astype(np.int64)
+        self.subject = codes[nrows:].astype(np.int64)
+
+        codes, self.taxon_names = pd.factorize(
+            np.concatenate([df.query_taxon_id.values,
+                            df.subject_taxon_id.values]),
+            sort=True)
+        self.query_taxon = codes[:nrows].astype(np.int64)
+        self.subject_taxon = codes[nrows:].astype(np.int64)
+
+        self.mant = df.evalue_mant.values.astype(np.float64)
+        self.exp = df.evalue_exp.values.astype(np.int64)
+        self.match = df.percent_match.values.astype(np.float64)
+
+        self.nseqs = len(self.seq_names)
+        self.ntaxa = len(self.taxon_names)
+
+        # Same as the update of SimilarSequences in commonTempTables. The
+        # e-values of 0 get an exponent lower than any other
+        if nrows:
+            nonzero = self.mant != 0
+            if nonzero.any():
+                self.exp[(self.exp == 0) & ~nonzero] = \
+                    self.exp[nonzero].min() - 1
+
+        # Hits that pass the e-value and percent match cutoffs used by all
+        # pair types, and the sorted (query, subject) keys of those hits
+        self.passing = np.flatnonzero((self.exp <= -5) & (self.match >= 50))
+        keys = self.pair_keys(self.query[self.passing],
+                              self.subject[self.passing])
+        order = np.argsort(keys, kind="mergesort")
+        self.passing = self.passing[order]
+        self.passing_keys = keys[order]
+
+    def pair_keys(self, seq_a, seq_b):
+        return seq_a * self.nseqs + seq_b
+
+    def find_pairs(self, seq_a, seq_b):
+        """
+        Returns the SimilarSequences rows of the (seq_a, seq_b) hits that
+        pass the cutoffs, and a mask of the pairs for which they exist
+        """
+
+        pos, found = lookup(self.passing_keys, self.pair_keys(seq_a, seq_b))
+
+        return self.passing[pos[found]], found
+
+
+def lookup(sorted_keys, keys):
+    """
+    Returns the positions of keys in sorted_keys and a mask of the keys
+    that were found
+    """
+
+    if not len(sorted_keys):
+        return (np.zeros(len(keys), dtype=np.int64),
+                np.zeros(len(keys), dtype=bool))
+
+    pos = np.searchsorted(sorted_keys, keys)
+    pos[pos == len(sorted_keys)] = 0
+
+    return pos, sorted_keys[pos] == keys
+
+
+def best_per_group(keys, exp, mant):
+    """
+    Returns the sorted unique keys and the best (lowest exponent, then
+    lowest mantissa) e-value of each key
+    """
+
+    if not len(keys):
+        return keys, exp, mant
+
+    order = np.argsort(keys, kind="mergesort")
+    keys, exp, mant = keys[order], exp[order], mant[order]
+
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(first)
+    groups = np.cumsum(first) - 1
+
+    best_exp = np.minimum.reduceat(exp, starts)
+    best_mant = np.minimum.reduceat(
+        np.where(exp == best_exp[groups], mant, np.inf), starts)
+
+    return keys[starts], best_exp, best_mant
+
+
+def reciprocal_hits(sim, rows):
+    """
+    Returns the pairs of rows of reciprocal hits, (a, b) and (b, a), among
+    the SimilarSequences rows, with the query of the first row lower than
+    its subject
+    """
+
+    query = sim.query[rows]
+    subject = sim.subject[rows]
+
+    keys = sim.pair_keys(query, subject)
+    order = np.argsort(keys, kind="mergesort")
+
+    first = np.flatnonzero(query < subject)
+    pos, found = lookup(keys[order],
+                        sim.pair_keys(subject[first], query[first]))
+
+    return rows[first[found]], rows[order[pos[found]]]
+
+
+def pair_scores(sim, row_ab, row_ba, threshold):
+    """
+    Unnormalized score of pairs of reciprocal hits. When any of the
+    mantissas is lower than threshold, the score is the integer division
+    of the exponents, as in SQL
+    """
+
+    mant_ab, mant_ba = sim.mant[row_ab], sim.mant[row_ba]
+    exp_ab, exp_ba = sim.exp[row_ab], sim.exp[row_ba]
+
+    scores = np.empty(len(row_ab))
+
+    low = (mant_ab < threshold) | (mant_ba < threshold)
+    # Exponents are at most -5, so the floor division of the positive sum
+    # is the same as the truncated division of sqlite
+    scores[low] = -(exp_ab[low] + exp_ba[low]) // 2
+
+    high = ~low
+    scores[high] = (np.log10(mant_ab[high] * mant_ba[high]) +
+                    exp_ab[high] + exp_ba[high]) / -2
+
+    return scores
+
+
+def group_average(groups, values, ngroups):
+
+    counts = np.bincount(groups, minlength=ngroups)
+    # Without any value, bincount returns integers, and the 0 / 0 averages
+    # of Python 2 division would be 0 instead of nan
+    sums = np.bincount(groups, weights=values,
+                       minlength=ngroups).astype(np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def normalize_taxon_pairs(sim, taxon_a, taxon_b, scores):
+    """
+    Normalizes scores by the average score of the pair of taxa
+    """
+
+    groups = np.minimum(taxon_a, taxon_b) * sim.ntaxa + \
+        np.maximum(taxon_a, taxon_b)
+    _, groups = np.unique(groups, return_inverse=True)
+
+    avg = group_average(groups, scores, groups.max() + 1 if len(groups)
+                        else 0)
+
+    return scores / avg[groups]
+
+
+def best_query_taxon_scores(sim):
+    """
+    Best inter taxon e-value of each query and subject taxon
+    """
+
+    inter = np.flatnonzero(sim.query_taxon != sim.subject_taxon)
+
+    return best_per_group(
+        sim.query[inter] * sim.ntaxa + sim.subject_taxon[inter],
+        sim.exp[inter], sim.mant[inter])
+
+
+def orthologs(sim, best_scores):
+
+    bqts_keys, bqts_exp, bqts_mant = best_scores
+
+    rows = sim.passing[sim.query_taxon[sim.passing] !=
+                       sim.subject_taxon[sim.passing]]
+
+    pos, _ = lookup(bqts_keys,
+                    sim.query[rows] * sim.ntaxa + sim.subject_taxon[rows])
+    mant = sim.mant[rows]
+
+    best_hits = rows[(mant < 0.01) |
+                     ((sim.exp[rows] == bqts_exp[pos]) &
+                      (mant == bqts_mant[pos]))]
+
+    row_ab, row_ba = reciprocal_hits(sim, best_hits)
+    scores = pair_scores(sim, row_ab, row_ba, 0.01)
+
+    taxon_a = sim.query_taxon[row_ab]
+    taxon_b = sim.subject_taxon[row_ab]
+
+    return (sim.query[row_ab], sim.subject[row_ab], taxon_a, taxon_b,
+            scores, normalize_taxon_pairs(sim, taxon_a, taxon_b, scores))
+
+
+def inparalogs(sim, best_scores, ortholog_seqs):
+
+    bqts_keys, bqts_exp, bqts_mant = best_scores
+
+    # Best inter taxon e-value of each query
+    bits_query, bits_exp, bits_mant = best_per_group(
+        bqts_keys // sim.ntaxa, bqts_exp, bqts_mant)
+
+    rows = sim.passing[sim.query_taxon[sim.passing] ==
+                       sim.subject_taxon[sim.passing]]
+
+    pos, has_bits = lookup(bits_query, sim.query[rows])
+    exp, mant = sim.exp[rows], sim.mant[rows]
+
+    # The best inter taxon e-values are only looked up for the queries that
+    # have one, since there may be none at all (e.g., a single taxon)
+    better = ~has_bits
+    cand = has_bits & (sim.query[rows] != sim.subject[rows])
+    pos, exp, mant = pos[cand], exp[cand], mant[cand]
+    better[cand] = ((mant < 0.001) | (exp < bits_exp[pos]) |
+                    ((exp == bits_exp[pos]) & (mant <= bits_mant[pos])))
+    better_hits = rows[better]
+
+    row_ab, row_ba = reciprocal_hits(sim, better_hits)
+    scores = pair_scores(sim, row_ab, row_ba, 0.01)
+
+    taxon = sim.query_taxon[row_ab]
+    seq_a, seq_b = sim.query[row_ab], sim.subject[row_ab]
+
+    # Average score per taxon, restricted to the in-paralogs with an
+    # ortholog when the taxon has any
+    all_avg = group_average(taxon, scores, sim.ntaxa)
+    with_orth = np.in1d(seq_a, ortholog_seqs) | np.in1d(seq_b, ortholog_seqs)
+    orth_avg = group_average(taxon[with_orth], scores[with_orth], sim.ntaxa)
+    avg = np.where(np.isnan(orth_avg), all_avg, orth_avg)
+
+    return seq_a, seq_b, taxon, scores, scores / avg[taxon]
+
+
+def two_way(seq_a, seq_b):
+
+    df = pd.DataFrame({"a": np.concatenate([seq_a, seq_b]),
+                       "b": np.concatenate([seq_b, seq_a])})
+
+    return df.drop_duplicates()
+
+
+def coorthologs(sim, ortholog_pairs, inparalog_pairs):
+
+    ip2way = two_way(*inparalog_pairs)
+    o2way = two_way(*ortholog_pairs)
+
+    # In-paralogs of a sequence and its orthologs
+    ip_o = ip2way.merge(o2way, left_on="b", right_on="a",
+                        suffixes=("_ip", "_o"))
+    # In-paralogs of a sequence and in-paralogs of its orthologs
+    ip_o_ip = ip_o.merge(ip2way, left_on="b_o", right_on="a")
+
+    seq_x = np.concatenate([ip_o.a_ip.values, ip_o_ip.a_ip.values])
+    seq_y = np.concatenate([ip_o.b_o.values, ip_o_ip.b.values])
+
+    # Candidates are kept in the order of their first occurrence among the
+    # sorted (seq_x, seq_y) pairs, which is the order in which sqlite builds
+    # them, so that the scores are averaged in the same order
+    order = np.argsort(sim.pair_keys(seq_x, seq_y), kind="mergesort")
+    candidates = sim.pair_keys(np.minimum(seq_x, seq_y)[order],
+                               np.maximum(seq_x, seq_y)[order])
+    candidates = candidates[np.sort(np.unique(candidates,
+                                              return_index=True)[1])]
+
+    # Remove the candidates that are orthologs
+    orth_keys = np.sort(sim.pair_keys(*ortholog_pairs))
+    candidates = candidates[~lookup(orth_keys, candidates)[1]]
+
+    seq_a = candidates // sim.nseqs
+    seq_b = candidates % sim.nseqs
+
+    row_ab, found_ab = sim.find_pairs(seq_a, seq_b)
+    seq_a, seq_b = seq_a[found_ab], seq_b[found_ab]
+    row_ba, found_ba = sim.find_pairs(seq_b, seq_a)
+    row_ab = row_ab[found_ba]
+
+    scores = pair_scores(sim, row_ab, row_ba, 0.00001)
+
+    taxon_a = sim.query_taxon[row_ab]
+    taxon_b = sim.subject_taxon[row_ab]
+
+    return (sim.query[row_ab], sim.subject[row_ab], taxon_a, taxon_b,
+            scores, normalize_taxon_pairs(sim, taxon_a, taxon_b, scores))
+
+
+def insert_pairs(cur, sim, table, columns, pairs):
+
+    seq_a, seq_b = pairs[:2]
+    taxa = pairs[2:-2]
+    scores, norm_scores = pairs[-2:]
+
+    values = [sim.seq_names[seq_a], sim.seq_names[seq_b]] + \
+        [sim.taxon_names[x] for x in taxa] + \
+        [scores.astype(float), norm_scores.astype(float)]
+
+    cur.executemany(
+        "insert into {} ({}) values ({})".format(
+            table, ", ".join(columns), ", ".join(["?"] * len(columns))),
+        zip(*[x.tolist() for x in values]))
+
+
+def execute(db_dir, nm=None):
+    """
+    Runs the pairs step on orthoDB. Returns a list of (step, seconds)
+    tuples with the timings of each step
+    """
+
+    con = lite.connect(os.path.join(db_dir, "orthoDB.db"))
+    timings = []
+
+    def check_point(step, start):
+        timings.append((step, time.time() - start))
+        if nm:
+            if nm.stop:
+                raise KillByUser("")
+            nm.counter += 1
+        return time.time()
+
+    with con:
+
+        if nm:
+            if nm.stop:
+                raise KillByUser("")
+            nm.total = 5
+            nm.counter = 0
+            nm.msg = None
+
+        cur = con.cursor()
+
+        start = time.time()
+        sim = SimilarityArrays(con)
+        best_scores = best_query_taxon_scores(sim)
+        start = check_point("load SimilarSequences", start)
+
+        orth = orthologs(sim, best_scores)
+        start = check_point("orthologs", start)
+
+        inpar = inparalogs(sim, best_scores,
+                           np.unique(np.concatenate(orth[:2])))
+        start = check_point("inparalogs", start)
+
+        coorth = coorthologs(sim, orth[:2], inpar[:2])
+        start = check_point("coorthologs", start)
+
+        columns = ["sequence_id_a", "sequence_id_b", "taxon_id_a",
+                   "taxon_id_b", "unnormalized_score", "normalized_score"]
+        insert_pairs(cur, sim, "Ortholog", columns, orth)
+        insert_pairs(cur, sim, "CoOrtholog", columns, coorth)
+        insert_pairs(cur, sim, "InParalog",
+                     ["sequence_id_a", "sequence_id_b", "taxon_id",
+                      "unnormalized_score", "normalized_score"], inpar)
+        check_point("write pairs", start)
+
+    con.close()
+
+    return timings
+
+
+__author__ = "Fernando Alves and Diogo N. Silva"
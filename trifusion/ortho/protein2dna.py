@@ -36,6 +36,8 @@ from os.path import join
 import subprocess
 import os
 
+import numpy as np
+
 dna_map = {
     'ATA': 'I', 'ATC': 'I', 'ATT': 'I', 'ATG': 'M',
     'ACA': 'T', 'ACC': 'T', 'ACG': 'T', 'ACT': 'T',
@@ -55,35 +57,71 @@ dna_map = {
     'TGC': 'C', 'TGT': 'C', 'TGA': '', 'TGG': 'W'}
 
 
+# Code of each nucleotide (A, C, G, T) in the codon table, and 4 for any
+# other character
+NUCLEOTIDE_CODES = np.full(256, 4, dtype=np.int64)
+for _i, _nt in enumerate("ACGT"):
+    NUCLEOTIDE_CODES[ord(_nt)] = NUCLEOTIDE_CODES[ord(_nt.lower())] = _i
+
+# Amino acid of each codon, indexed by 16 * first + 4 * second + third
+# nucleotide codes. The last entry is for the codons with missing data or
+# ambiguous nucleotides. Stop codons and the last entry are 0, and are
+# left out of the translation
+CODON_TABLE = np.zeros(65, dtype=np.uint8)
+for _codon, _aa in dna_map.items():
+    if _aa:
+        CODON_TABLE[sum(NUCLEOTIDE_CODES[ord(x)] << (4 - 2 * i)
+                        for i, x in enumerate(_codon))] = ord(_aa)
+
+# Number of cds records between checks of the kill switch
+KILL_CHECK_RECORDS = 1000
+
+
 def translate(sequence):
     """
-    Translates a DNA string into an amino acid sequence
+    Translates a DNA string into an amino acid sequence. Stop codons, codons
+    with missing data or ambiguous nucleotides and an incomplete last codon
+    are left out of the translation
     :param sequence: string. DNA sequence
     :return: String. Protein sequence
     """
 
-    sequence = sequence.lower().replace("-", "")
-    aa_sequence = ""
+    sequence = sequence.replace("-", "")
 
-    for i in range(0, len(sequence), 3):
-        codon = sequence[i:i + 3]
+    # Nucleotide codes of the complete codons, one codon per row
+    codes = NUCLEOTIDE_CODES[np.frombuffer(
+        sequence[:len(sequence) - len(sequence) % 3],
+        dtype=np.uint8)].reshape(-1, 3)
 
-        # Check if codon is multiple of 3. If not, place an X (missing data)
-        if len(codon) == 3:
-            # Check if there is missing data on the codon. If so, place an X
-            if "n" in codon:
-                aa = ""
-            else:
-                try:
-                    aa = dna_map[codon.upper()]
-                except KeyError:
-                    aa = ""
-        else:
-            aa = ""
+    idx = codes[:, 0] * 16 + codes[:, 1] * 4 + codes[:, 2]
+    idx[(codes == 4).any(axis=1)] = 64
+
+    aa = CODON_TABLE[idx]
+
+    return aa[aa != 0].tobytes()
 
-        aa_sequence += aa
 
-    return aa_sequence
+def iter_fasta(file_handle):
+    """
+    Generator of the header and sequence of each record of a fasta file,
+    with the lines of each sequence joined
+    :param file_handle: file object of the fasta file
+    """
+
+    header = None
+    seq = []
+
+    for line in file_handle:
+        if line.startswith(">"):
+            if header is not None:
+                yield header, "".join(seq)
+            header = line.strip()[1:]
+            seq = []
+        else:
+            seq.append(line.strip())
+
+    if header is not None:
+        yield header, "".join(seq)
 
 
 def create_db(f_list, dest="./", ns=None):
@@ -108,31 +146,26 @@ def create_db(f_list, dest="./", ns=None):
         ns.max_pb = len(f_list)
 
     for f in f_list:
-        handle = open(f)
-        seq = ""
-        header = ""
 
         if ns:
             if ns.stop:
                 raise KillByUser("")
             ns.progress += 1
 
-        for line in handle:
+        with open(f) as handle:
 
-            if ns:
-                if ns.stop:
-                    raise KillByUser("")
+            for p, (header, seq) in enumerate(iter_fasta(handle)):
 
-            if line.startswith(">"):
-                if seq != "":
-                    aa_seq = translate(seq)
-                    output_handle.write(">%s\n%s\n" % (header, aa_seq))
-                    id_dic[header] = seq
+                if ns and not p % KILL_CHECK_RECORDS:
+                    if ns.stop:
+                        raise KillByUser("")
 
-                header = line.strip()[1:].replace(" ", ";;")
-                seq = ""
-            else:
-                seq += line.strip()
+                # Records without sequence are skipped
+                if seq:
+                    header = header.replace(" ", ";;")
+                    output_handle.write(">%s\n%s\n" % (header,
+                                                        translate(seq)))
+                    id_dic[header] = seq
 
     output_handle.close()
 
@@ -251,14 +284,14 @@ def convert_protein_file(pairs, group_obj, id_db, output_dir, shared_ns):
     # Create handle for file storing bad sequence headers.
     bad_file = open(join(output_dir, "missed_sequences.log"), "w")
 
-    for line, cl in zip(group_obj.groups(),
-                        group_obj.iter_species_frequency()):
+    for line, compliant in zip(group_obj.groups(),
+                               group_obj._get_compliance()):
 
         if shared_ns:
             if shared_ns.stop:
                 raise KillByUser("")
 
-        if group_obj._get_compliance(cl) == (1, 1):
+        if compliant:
 
             line = group_obj._remove_tx(line)
 
@@ -0,0 +1,225 @@
+#!/usr/bin/python2
+# -*- coding: utf-8 -*-
+
+"""
+Checkpointing of the stages of the orthology search pipeline.
+
+Each stage is declared with the function that executes it, the stages it
+depends on, the parameters and external input files that determine its
+results, and the paths of its outputs. The key of a stage is a hash of its
+parameters, output paths, input file signatures and the keys of the
+stages it depends on, and it is recorded in a json manifest when the stage
+completes. In a later run, a stage whose key matches the manifest and whose
+outputs still exist is skipped, and the stages it depends on are only
+executed when it must run. Changing the parameters of a stage thus re-runs
+that stage and the stages downstream of it, but none upstream.
+"""
+
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+
+MANIFEST_FILE = "stage_manifest.json"
+
+
+def path_signature(path):
+    """
+    Returns the name, size and modification time of a file, or of the
+    files in a directory. Missing paths have no signature
+    """
+
+    if os.path.isdir(path):
+        return [path_signature(os.path.join(path, x))
+                for x in sorted(os.listdir(path))]
+    elif os.path.exists(path):
+        st = os.stat(path)
+        return [os.path.basename(path), st.st_size, st.st_mtime]
+
+
+class StageManifest(object):
+    """
+    Runs the stages of a pipeline, skipping those that were completed in
+    a previous run with the same parameters and inputs
+    """
+
+    def __init__(self, manifest_file, resume=True):
+
+        self.manifest_file = manifest_file
+
+        self.stages = OrderedDict()
+        """
+        Maps the name of each stage to a dictionary with its function,
+        arguments, dependencies, parameters, inputs and outputs
+        """
+
+        self.records = {}
+        """
+        Maps the name of each completed stage to its key, outputs and
+        completion time, as stored in the manifest file
+        """
+
+        self._keys = {}
+
+        if resume and os.path.exists(manifest_file):
+            try:
+                with open(manifest_file) as fh:
+                    self.records = json.load(fh)
+            except ValueError:
+                self.records = {}
+
+    def add_stage(self, name, func, args=(), kwargs=None, deps=(),
+                  params=None, inputs=(), outputs=(), always=False):
+        """
+        Declares a stage of the pipeline
+
+        :param name: string, name of the stage
+        :param func: function that executes the stage
+        :param args: list, positional arguments of func
+        :param kwargs: dict, keyword arguments of func
+        :param deps: list, names of the stages whose outputs are used
+        :param params: json serializable parameters that determine the
+        results of the stage
+        :param inputs: list, paths of files or directories used by the
+        stage that are not produced by other stages
+        :param outputs: list, paths produced or modified by the stage
+        :param always: boolean, if True the stage is executed even when
+        it was completed before
+        """
+
+        self.stages[name] = {"func": func,
+                             "args": args,
+                             "kwargs": kwargs or {},
+                             "deps": list(deps),
+                             "params": params,
+                             "inputs": list(inputs),
+                             "outputs": list(outputs),
+                             "always": always}
+
+    def stage_key(self, name):
+
+        if name not in self._keys:
+            stage = self.stages[name]
+            data = [name, stage["params"], stage["outputs"],
+                    [self.stage_key(x) for x in stage["deps"]],
+                    [path_signature(x) for x in stage["inputs"]]]
+            self._keys[name] = hashlib.sha1(
+                json.dumps(data, sort_keys=True)).hexdigest()
+
+        return self._keys[name]
+
+    def is_complete(self, name):
+
+        record = self.records.get(name)
+
+        return record is not None and \
+            record["key"] == self.stage_key(name) and \
+            all(os.path.exists(x) for x in self.stages[name]["outputs"])
+
+    def downstream(self, name):
+        """
+        Returns the names of the stages that depend, directly or not, on
+        the stage `name`
+        """
+
+        found = set()
+        for other, stage in self.stages.items():
+            if name in stage["deps"]:
+                found.add(other)
+                found.update(self.downstream(other))
+
+        return found
+
+    def invalidate(self, name):
+        """
+        Removes from the manifest the stages whose outputs are no longer
+        valid once the stage `name` starts: the stage itself, the stages
+        downstream of it and the stages that produced the outputs it
+        modifies (e.g. a database that is updated in place)
+        """
+
+        outputs = set(self.stages[name]["outputs"])
+        stale = self.downstream(name)
+        stale.add(name)
+
+        for other, stage in self.stages.items():
+            if other in stale or outputs.intersection(stage["outputs"]):
+                self.records.pop(other, None)
+
+        self.save()
+
+    def complete(self, name):
+
+        self.records[name] = {"key": self.stage_key(name),
+                              "outputs": self.stages[name]["outputs"],
+                              "completed": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+        self.save()
+
+    def save(self):
+
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, "w") as fh:
+            json.dump(self.records, fh, indent=2, sort_keys=True)
+
+        # os.rename does not replace existing files in Windows
+        if os.path.exists(self.manifest_file):
+            os.remove(self.manifest_file)
+        os.rename(tmp_file, self.manifest_file)
+
+    def run(self, targets=None, callback=None):
+        """
+        Executes the target stages, and the stages they depend on, that
+        were not completed before.
+
+        :param targets: list, names of the stages to complete. By default,
+        the stages on which no other stage depends
+        :param callback: function called with the name of a stage and
+        "start" before it is executed, "done" after it is executed or
+        "skip" when it was completed before
+        :returns: dict with the return values of the executed stages
+        """
+
+        if targets is None:
+            deps = set(x for stage in self.stages.values()
+                       for x in stage["deps"])
+            targets = [x for x in self.stages if x not in deps]
+
+        results = {}
+        visited = set()
+
+        def ensure(name):
+
+            if name in visited:
+                return
+
+            stage = self.stages[name]
+
+            if not stage["always"] and self.is_complete(name):
+                if callback:
+                    callback(name, "skip")
+            else:
+                for dep in stage["deps"]:
+                    ensure(dep)
+
+                if callback:
+                    callback(name, "start")
+
+                self.invalidate(name)
+                results[name] = stage["func"](*stage["args"],
+                                              **stage["kwargs"])
+                self.complete(name)
+
+                if callback:
+                    callback(name, "done")
+
+            visited.add(name)
+
+        for name in targets:
+            ensure(name)
+
+        return results
+
+
+__author__ = "Diogo N. Silva"
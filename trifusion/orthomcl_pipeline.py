@@ -33,6 +33,7 @@ with warnings.catch_warnings():
     import shutil
     import traceback
     import argparse
+    import multiprocessing
     from os.path import abspath, join, basename
 
     try:
@@ -40,10 +41,12 @@ with warnings.catch_warnings():
         from ortho import OrthomclToolbox as OT
         import ortho.orthomclInstallSchema as install_sqlite
         import ortho.orthomclPairs as make_pairs_sqlite
+        import ortho.orthomclPairsArray as make_pairs_array
         import ortho.orthomclDumpPairsFiles as dump_pairs_sqlite
         import ortho.orthomclFilterFasta as FilterFasta
         import ortho.orthomclBlastParser as BlastParser
         import ortho.orthomclMclToGroups as MclGroups
+        from ortho.stage_manifest import StageManifest, MANIFEST_FILE
         from ortho.error_handling import *
         from process.error_handling import KillByUser
         from __init__ import __version__
@@ -52,10 +55,12 @@ with warnings.catch_warnings():
         from trifusion.ortho import OrthomclToolbox as OT
         import trifusion.ortho.orthomclInstallSchema as install_sqlite
         import trifusion.ortho.orthomclPairs as make_pairs_sqlite
+        import trifusion.ortho.orthomclPairsArray as make_pairs_array
         import trifusion.ortho.orthomclDumpPairsFiles as dump_pairs_sqlite
         import trifusion.ortho.orthomclFilterFasta as FilterFasta
         import trifusion.ortho.orthomclBlastParser as BlastParser
         import trifusion.ortho.orthomclMclToGroups as MclGroups
+        from trifusion.ortho.stage_manifest import StageManifest, MANIFEST_FILE
         from trifusion.ortho.error_handling import *
         from trifusion.process.error_handling import KillByUser
         from trifusion import __version__
@@ -80,7 +85,12 @@ def check_unique_field(proteome_file, verbose=False, nm=None):
 
     # Some files may have utf8 encoding problems so I used codecs here
     file_handle = codecs.open(proteome_file, "r", "cp1252")
-    header_list = []
+
+    # Values found so far for each header field. The set of a field is
+    # discarded (set to None) as soon as it has a duplicate value, or is
+    # missing from a header. Every header has at least one field
+    field_values = [set()]
+    nheaders = 0
 
     header = ""
     for line in file_handle:
@@ -91,24 +101,32 @@ def check_unique_field(proteome_file, verbose=False, nm=None):
 
         if line.startswith(">"):
             header = line[1:].strip()
-            # Store header in list format
-            header_list.append(header.split("|"))
+            fields = header.split("|")
 
-    # Get the size of the header fields
-    header_field_size = len(header.split("|"))
+            # Fields that are missing from this header cannot be unique
+            for i in range(len(fields), len(field_values)):
+                field_values[i] = None
+            for _ in range(len(field_values), len(fields)):
+                field_values.append(None if nheaders else set())
 
-    for i in range(header_field_size):
+            for i, val in enumerate(fields):
+                values = field_values[i]
+                if values is not None:
+                    if val in values:
+                        field_values[i] = None
+                    else:
+                        values.add(val)
 
-        if nm:
-            if nm.stop:
-                raise KillByUser("")
+            nheaders += 1
 
-        temp_list = []
-        for header in header_list:
-            temp_list.append(header[i])
+    file_handle.close()
 
-        if len(temp_list) == len(set(temp_list)) and len(set(temp_list)) ==\
-                len(header_list):
+    # Get the size of the header fields
+    header_field_size = len(header.split("|"))
+
+    for i in range(min(header_field_size, len(field_values))):
+
+        if field_values[i] is not None:
 
             # The orthoMCL program uses an index starting from 1, so the +1 is
             #  a necessary adjustment
@@ -123,29 +141,30 @@ def check_unique_field(proteome_file, verbose=False, nm=None):
 
 
 def prep_fasta(proteome_file, code, unique_id, dest, verbose=False, nm=None):
+    """
+    Writes the proteome file with compliant headers (code|unique field) to
+    the backstage_files directory, skipping sequences with duplicate
+    headers, and the mapping between the compliant and original headers
+    to a separate file, one "compliant; original" line per sequence
+
+    :returns: string, path of the header mapping file
+    """
 
     if verbose:
         print_col("\t Preparing file for USEARCH", GREEN, 1)
 
-    # Storing header list to check for duplicates
-    header_list = []
-
-    # Get json with header mappings, if exists
-    json_f = join(dest, "backstage_files", "header_mapping.json")
-    if os.path.exists(json_f):
-        with open(json_f) as fh:
-            header_mapping = json.load(fh)
-    else:
-        header_mapping = {}
+    # Storing headers to check for duplicates
+    headers = set()
 
     # Will prevent writing
     lock = True
 
     # File handles
     file_in = open(proteome_file)
-    pfile = basename(proteome_file.split(".")[0] + "_mod.fas")
+    pfile = basename(proteome_file).split(".")[0] + "_mod.fas"
     file_out_path = join(dest, "backstage_files", pfile)
     file_out = open(file_out_path, "w")
+    map_out = open(file_out_path + ".map", "w")
 
     for line in file_in:
 
@@ -154,12 +173,13 @@ def prep_fasta(proteome_file, code, unique_id, dest, verbose=False, nm=None):
                 raise KillByUser("")
 
         if line.startswith(">"):
-            if line not in header_list:
-                fields = line.split("|")
+            if line not in headers:
+                fields = line[1:].rstrip("\r\n").split("|")
                 unique_str = fields[unique_id].replace(" ", "_")
-                header_mapping["%s|%s" % (code, unique_str)] = line.strip()
-                header_list.append(line)
+                headers.add(line)
                 file_out.write(">%s|%s\n" % (code, unique_str))
+                map_out.write("%s|%s; %s\n" % (code, unique_str,
+                                               line.strip()))
                 lock = True
             else:
                 lock = False
@@ -169,12 +189,50 @@ def prep_fasta(proteome_file, code, unique_id, dest, verbose=False, nm=None):
     # Close file handles:
     file_in.close()
     file_out.close()
+    map_out.close()
+
+    return file_out_path + ".map"
+
+
+def adjust_proteome(proteome, dest, nm=None):
+    """
+    Adjusts a proteome file and moves it to the compliantFasta directory
+
+    :returns: string, path of the header mapping file of the proteome, or
+    None if it could not be parsed
+    """
+
+    # Get code for proteome
+    code_name = proteome.split(os.path.sep)[-1].split(".")[0]
+    code_name = "_".join(code_name.split())
+
+    # Check the unique ID field
+    try:
+        unique_id = check_unique_field(proteome, True, nm)
+    except KillByUser:
+        raise
+    except Exception as e:
+        print_col("The file {} could not be parsed".format(proteome),
+                  YELLOW, 1)
+        #TODO: Log errors on file
+        return
+
+    # Adjust fasta
+    map_file = prep_fasta(proteome, code_name, unique_id, dest, nm=nm)
+
+    protome_file_name = proteome.split(os.path.sep)[-1].split(".")[0] + \
+                        ".fasta"
+    protome_file_name = "_".join(protome_file_name.split())
+
+    pfile = basename(proteome).split(".")[0] + "_mod.fas"
+    shutil.move(join(dest, "backstage_files", pfile),
+                join(dest, "backstage_files", "compliantFasta",
+                     protome_file_name))
 
-    with open(json_f, "w") as fh:
-        json.dump(header_mapping, fh)
+    return map_file
 
 
-def adjust_fasta(file_list, dest, nm=None):
+def adjust_fasta(file_list, dest, nm=None, processes=1):
 
     print_col("Adjusting proteome files", GREEN, 1)
 
@@ -186,63 +244,70 @@ def adjust_fasta(file_list, dest, nm=None):
         for f in os.listdir(cf_dir):
             os.remove(join(cf_dir, f))
 
-    # Setup progress information
-    if nm:
-        if nm.stop:
-            KillByUser("")
-        # Get total number of files for total progress
-        nm.total = len(file_list)
-        nm.counter = 0
-
-    for proteome in file_list:
-        # Get code for proteome
-        code_name = proteome.split(os.path.sep)[-1].split(".")[0]
-        code_name = "_".join(code_name.split())
+    if int(processes) > 1 and len(file_list) > 1:
+        if nm:
+            nm.msg = None
+        map_files = map_jobs(adjust_proteome,
+                             [(x, dest) for x in file_list], int(processes),
+                             nm)
 
+    else:
+        # Setup progress information
         if nm:
             if nm.stop:
                 raise KillByUser("")
-            nm.counter += 1
-            nm.msg = "Adjusting file {}".format(basename(proteome))
+            # Get total number of files for total progress
+            nm.total = len(file_list)
+            nm.counter = 0
 
-        # Check the unique ID field
-        try:
-            unique_id = check_unique_field(proteome, True, nm)
-        except Exception as e:
-            print_col("The file {} could not be parsed".format(proteome),
-                      YELLOW, 1)
-            #TODO: Log errors on file
-            continue
+        map_files = []
+        for proteome in file_list:
 
-        # Adjust fasta
-        # stg = prep_fasta(proteome, code_name, unique_id)
-        prep_fasta(proteome, code_name, unique_id, dest, nm)
+            if nm:
+                if nm.stop:
+                    raise KillByUser("")
+                nm.counter += 1
+                nm.msg = "Adjusting file {}".format(basename(proteome))
 
-        protome_file_name = proteome.split(os.path.sep)[-1].split(".")[0] + \
-                            ".fasta"
-        protome_file_name = "_".join(protome_file_name.split())
-
-        pfile = basename(proteome.split(".")[0] + "_mod.fas")
-        shutil.move(join(dest, "backstage_files", pfile),
-                    join(cf_dir, protome_file_name))
+            map_files.append(adjust_proteome(proteome, dest, nm))
 
+    # The header mappings of the proteomes are appended to the mapping
+    # file, from which its json version is then written
     json_f = join(dest, "backstage_files", "header_mapping.json")
     header_f = join(dest, "backstage_files", "header_mapping.csv")
-    if os.path.exists(json_f):
-        with open(json_f) as fh, open(header_f, "w") as ofh:
-            header_map = json.load(fh)
 
-            for k, v in header_map.items():
-                ofh.write("{}; {}\n".format(k, v))
+    with open(header_f, "w") as ofh:
+        for map_file in map_files:
+            if map_file:
+                with open(map_file) as fh:
+                    shutil.copyfileobj(fh, ofh)
+                os.remove(map_file)
+
+    with open(header_f) as fh, open(json_f, "w") as ofh:
+        ofh.write("{")
+        for i, line in enumerate(fh):
+            k, v = line.rstrip("\n").split("; ", 1)
+            ofh.write("{}{}: {}".format(", " if i else "", json.dumps(k),
+                                        json.dumps(v)))
+        ofh.write("}")
 
 
-def filter_fasta(min_len, max_stop, db, dest, nm=None):
+def filter_fasta(min_len, max_stop, db, dest, nm=None, processes=1):
 
     print_col("Filtering proteome files", GREEN, 1)
 
     cp_dir = join(dest, "backstage_files", "compliantFasta")
 
-    FilterFasta.orthomcl_filter_fasta(cp_dir, min_len, max_stop, db, dest, nm)
+    reject_rates = FilterFasta.orthomcl_filter_fasta(
+        cp_dir, min_len, max_stop, db, dest, nm, processes=int(processes))
+
+    if reject_rates:
+        print_col("Proteomes with > {}% poor proteins:".format(
+            FilterFasta.REPORT_REJECT_PERCENT), YELLOW, 1)
+        for filename, pct in reject_rates:
+            print_col("\t {}\t{}%".format(filename, int(pct)), YELLOW, 1)
+
+    return reject_rates
 
 
 def allvsall_usearch(goodproteins, evalue, dest, cpus, usearch_outfile,
@@ -275,7 +340,7 @@ def allvsall_usearch(goodproteins, evalue, dest, cpus, usearch_outfile,
         _ = subprocess.Popen(usearch_cmd).wait()
 
 
-def blast_parser(usearch_ouput, dest, db_dir, nm):
+def blast_parser(usearch_ouput, dest, db_dir, nm, processes=1):
 
     print_col("Parsing BLAST output", GREEN, 1)
 
@@ -283,14 +348,31 @@ def blast_parser(usearch_ouput, dest, db_dir, nm):
         join(dest, "backstage_files", usearch_ouput),
         join(dest, "backstage_files", "compliantFasta"),
         db_dir,
-        nm)
+        nm,
+        processes=int(processes),
+        index_file=join(dest, "backstage_files", "gene_index"))
 
 
-def pairs(db_dir, nm=None):
+def pairs(db_dir, nm=None, mode="default", report_timings=False,
+          engine="sql"):
+    """
+    Finds the ortholog, in-paralog and co-ortholog pairs with the SQL
+    engine of orthomclPairs (using the sqlite execution mode), or with the
+    array engine of orthomclPairsArray
+    """
 
     print_col("Finding pairs for orthoMCL", GREEN, 1)
 
-    make_pairs_sqlite.execute(db_dir, nm=nm)
+    if engine == "array":
+        timings = make_pairs_array.execute(db_dir, nm=nm)
+    else:
+        timings = make_pairs_sqlite.execute(db_dir, nm=nm, mode=mode)
+
+    if report_timings:
+        for step, elapsed in timings:
+            print_col("{:<40}{:>10.2f}s".format(step, elapsed), GREEN, 1)
+        print_col("{:<40}{:>10.2f}s".format(
+            "Total", sum(x[1] for x in timings)), GREEN, 1)
 
 
 def dump_pairs(db_dir, dest, nm=None):
@@ -301,35 +383,130 @@ def dump_pairs(db_dir, dest, nm=None):
     dump_pairs_sqlite.execute(db_dir, dest, nm=nm)
 
 
-def mcl(inflation_list, dest, mcl_file="mcl", nm=None):
+def run_commands(cmds, processes=1, nm=None):
+    """
+    Runs external commands with up to `processes` of them at the same
+    time. The pids of the running commands are stored in nm.subp so that
+    they can be killed from the app, and no more commands are started once
+    the kill switch is set.
+
+    :param cmds: list, commands as lists of arguments
+    :param processes: int, maximum number of simultaneous commands
+    :param nm: Namespace object
+    """
 
-    print_col("Running mcl algorithm", GREEN, 1)
-    mcl_input = join(dest, "backstage_files", "mclInput")
-    mcl_output = join(dest, "backstage_files", "mclOutput_")
+    pending = list(cmds)
+    running = []
 
-    for val in inflation_list:
+    try:
+        while pending or running:
+
+            if nm:
+                if nm.stop:
+                    raise KillByUser("")
 
-        mcl_cmd = [mcl_file,
-                   mcl_input,
-                   "--abc",
-                   "-I",
-                   val,
-                   "-o",
-                   mcl_output + val.replace(".", "")]
+            while pending and len(running) < processes:
+                running.append(subprocess.Popen(pending.pop(0)))
 
+            if nm:
+                # The subprocess.Popen handlers cannot be passed directly in
+                # Windows due to pickling issues. So I pass the pids of the
+                # processes instead.
+                nm.subp = [x.pid for x in running]
+
+            finished = [x for x in running if x.poll() is not None]
+            if finished:
+                running = [x for x in running if x not in finished]
+            else:
+                time.sleep(.1)
+
+    finally:
+        for subp in running:
+            if subp.poll() is None:
+                subp.kill()
+                subp.wait()
         if nm:
-            # The subprocess.Popen handler cannot be passed directly in Windows
-            # due to pickling issues. So I pass the pid of the process instead.
-            subp = subprocess.Popen(mcl_cmd)
-            nm.subp = subp.pid
-            subp.wait()
             nm.subp = None
-        else:
-            _ = subprocess.Popen(mcl_cmd).wait()
+
+
+def run_job(job):
+    """
+    Executes a job of map_jobs in a worker process
+    """
+
+    idx, func, args = job
+
+    return idx, func(*args)
+
+
+def map_jobs(func, args_list, processes, nm=None):
+    """
+    Applies `func` to each tuple of arguments in args_list (e.g. one for
+    each inflation value) in a pool of up to `processes` processes. While
+    the results are awaited, the kill switch is checked and nm.counter is
+    updated with the number of finished jobs.
+
+    :returns: list, return values of func in the order of args_list
+    """
+
+    if nm:
+        nm.total = len(args_list)
+        nm.counter = 0
+
+    results = [None] * len(args_list)
+    pool = multiprocessing.Pool(min(processes, len(args_list)))
+
+    try:
+        jobs = pool.imap_unordered(
+            run_job, [(i, func, x) for i, x in enumerate(args_list)])
+
+        for _ in args_list:
+            while True:
+                if nm:
+                    if nm.stop:
+                        raise KillByUser("")
+                try:
+                    idx, res = jobs.next(.1)
+                    break
+                except multiprocessing.TimeoutError:
+                    pass
+
+            results[idx] = res
+            if nm:
+                nm.counter += 1
+
+        pool.close()
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return results
+
+
+def mcl(inflation_list, dest, mcl_file="mcl", nm=None, processes=1):
+    """
+    Runs mcl for each inflation value, with up to `processes` of them at
+    the same time
+    """
+
+    print_col("Running mcl algorithm", GREEN, 1)
+    mcl_input = join(dest, "backstage_files", "mclInput")
+    mcl_output = join(dest, "backstage_files", "mclOutput_")
+
+    mcl_cmds = [[mcl_file,
+                 mcl_input,
+                 "--abc",
+                 "-I",
+                 val,
+                 "-o",
+                 mcl_output + val.replace(".", "")] for val in inflation_list]
+
+    run_commands(mcl_cmds, int(processes), nm)
 
 
 def mcl_groups(inflation_list, mcl_prefix, start_id, group_file, dest,
-                nm=None):
+               nm=None, processes=1):
 
     print_col("Dumping groups", GREEN, 1)
 
@@ -340,29 +517,53 @@ def mcl_groups(inflation_list, mcl_prefix, start_id, group_file, dest,
 
     mcl_output = join(dest, "backstage_files", "mclOutput_")
 
+    jobs = [(mcl_prefix,
+             start_id,
+             mcl_output + val.replace(".", ""),
+             os.path.join(results_dir, group_file + "_" + str(val) + ".txt"))
+            for val in inflation_list]
+
+    if int(processes) > 1 and len(jobs) > 1:
+        map_jobs(MclGroups.mcl_to_groups, jobs, int(processes), nm)
+        return
+
     if nm:
         if nm.stop:
             raise KillByUser("")
         nm.total = len(inflation_list)
         nm.counter = 0
 
-    for val in inflation_list:
+    for job in jobs:
 
         if nm:
             if nm.stop:
                 raise KillByUser("")
             nm.counter += 1
 
-        MclGroups.mcl_to_groups(
-            mcl_prefix,
-            start_id,
-            mcl_output + val.replace(".", ""),
-            os.path.join(results_dir, group_file + "_" + str(val) + ".txt"),
-            nm=nm)
+        MclGroups.mcl_to_groups(*job, nm=nm)
+
+
+def export_inflation_groups(group_file, gene_t, sp_t, sqldb, db, dest,
+                            nm=None):
+    """
+    Parses the group file of an inflation value and exports the protein
+    sequences of its filtered groups to `dest`
+
+    :returns: tuple, the GroupLight object and its basic statistics
+    """
+
+    # Create Group object
+    group_obj = OT.GroupLight(group_file, gene_t, sp_t)
+    # Export filtered groups and return stats to present in the app
+    stats = group_obj.basic_group_statistics()
+    # Retrieve fasta sequences from the filtered groups
+    group_obj.retrieve_sequences(sqldb, db, dest=dest, shared_namespace=nm)
+
+    return group_obj, stats
 
 
 def export_filtered_groups(inflation_list, group_prefix, gene_t, sp_t, sqldb,
-                           db, tmp_dir, dest, nm=None):
+                           db, tmp_dir, dest, nm=None, processes=1):
 
     print_col("Exporting filtered groups to protein sequence files", GREEN, 1)
 
@@ -373,6 +574,7 @@ def export_filtered_groups(inflation_list, group_prefix, gene_t, sp_t, sqldb,
         if nm.stop:
             raise KillByUser("")
 
+    jobs = []
     for val in inflation_list:
         # Create a directory that will store the results for the current
         # inflation value
@@ -383,22 +585,124 @@ def export_filtered_groups(inflation_list, group_prefix, gene_t, sp_t, sqldb,
         group_file = join(dest, "Orthology_results",
                           group_prefix + "_%s.txt" % val)
 
-        # Create Group object
-        group_obj = OT.GroupLight(group_file, gene_t, sp_t)
+        jobs.append((group_file, gene_t, sp_t, sqldb, db,
+                     join(inflation_dir, "Orthologs")))
+
+    if int(processes) > 1 and len(jobs) > 1:
+        # The sequence index is created beforehand, so that the concurrent
+        # exports only read from it
+        OT.create_sequence_index(sqldb, db, nm)
+        results = map_jobs(export_inflation_groups, jobs,
+                                 int(processes), nm)
+    else:
+        results = [export_inflation_groups(*x, nm=nm) for x in jobs]
+
+    for val, (group_obj, stats) in zip(inflation_list, results):
         # Add group to the MultiGroups object
         groups_obj.add_group(group_obj)
-        # Export filtered groups and return stats to present in the app
-        stats = group_obj.basic_group_statistics()
-        # Retrieve fasta sequences from the filtered groups
-        group_obj.retrieve_sequences(sqldb, db,
-                                     dest=join(inflation_dir, "Orthologs"),
-                                     shared_namespace=nm)
         # os.remove(sqldb)
         stats_storage[val] = stats
 
     return stats_storage, groups_obj
 
 
+def orthology_stages(proteome_files, dest, db_dir, min_len, max_stop, db,
+                     evalue, cpus, usearch_outfile, usearch_bin, mcl_file,
+                     inflation_list, prefix, start_id, group_file, gene_t,
+                     sp_t, sqldb, tmp_dir, nm=None, pairs_options=None,
+                     resume=True, always_export=False):
+    """
+    Declares the stages of the orthology search pipeline in a StageManifest
+    stored in the backstage_files directory, so that a new run skips the
+    stages completed by a previous one with the same parameters.
+
+    :param proteome_files: list, paths to the proteome files. If None, the
+    proteome files are not adjusted and the existing compliantFasta
+    directory is used instead
+    :param pairs_options: dict, keyword arguments of `pairs`
+    :param resume: boolean, if False the stages completed by previous runs
+    are ignored
+    :param always_export: boolean, if True the filtered groups are exported
+    even if they were exported before, so that the return value of
+    `export_filtered_groups` is available
+    :returns: StageManifest object, whose `run` method executes the
+    pipeline
+    """
+
+    bs_dir = join(dest, "backstage_files")
+    db_file = join(db_dir, "orthoDB.db")
+    db_path = join(bs_dir, db)
+    cf_dir = join(bs_dir, "compliantFasta")
+    results_dir = join(dest, "Orthology_results")
+
+    stages = StageManifest(join(bs_dir, MANIFEST_FILE), resume=resume)
+
+    stages.add_stage("schema", install_schema, [db_dir],
+                     outputs=[db_file])
+
+    if proteome_files is not None:
+        stages.add_stage("adjust", adjust_fasta, [proteome_files, dest],
+                         {"nm": nm, "processes": cpus},
+                         inputs=sorted(proteome_files),
+                         outputs=[cf_dir])
+        stages.add_stage("filter", filter_fasta,
+                         [min_len, max_stop, db, dest],
+                         {"nm": nm, "processes": cpus}, deps=["adjust"],
+                         params=[min_len, max_stop], outputs=[db_path])
+    else:
+        stages.add_stage("filter", filter_fasta,
+                         [min_len, max_stop, db, dest],
+                         {"nm": nm, "processes": cpus},
+                         params=[min_len, max_stop], inputs=[cf_dir],
+                         outputs=[db_path])
+
+    stages.add_stage("usearch", allvsall_usearch,
+                     [db, evalue, dest, cpus, usearch_outfile],
+                     {"usearch_bin": usearch_bin, "nm": nm},
+                     deps=["filter"], params=[str(evalue)],
+                     outputs=[join(bs_dir, usearch_outfile)])
+
+    stages.add_stage("parse", blast_parser,
+                     [usearch_outfile, dest, db_dir, nm],
+                     {"processes": cpus}, deps=["schema", "usearch"],
+                     outputs=[db_file])
+
+    # The engine and mode of the pairs step are part of its parameters, so
+    # that changing them executes it again
+    pairs_options = pairs_options or {}
+    stages.add_stage("pairs", pairs, [db_dir],
+                     dict(pairs_options, nm=nm), deps=["parse"],
+                     params=[pairs_options.get("engine", "sql"),
+                             pairs_options.get("mode", "default")],
+                     outputs=[db_file])
+
+    stages.add_stage("dump_pairs", dump_pairs, [db_dir, dest], {"nm": nm},
+                     deps=["pairs"], outputs=[join(bs_dir, "mclInput")])
+
+    stages.add_stage("mcl", mcl, [inflation_list, dest],
+                     {"mcl_file": mcl_file, "nm": nm, "processes": cpus},
+                     deps=["dump_pairs"], params=inflation_list,
+                     outputs=[join(bs_dir, "mclOutput_" + x.replace(".", ""))
+                              for x in inflation_list])
+
+    stages.add_stage("mcl_groups", mcl_groups,
+                     [inflation_list, prefix, start_id, group_file, dest],
+                     {"nm": nm, "processes": cpus}, deps=["mcl"],
+                     params=[inflation_list, prefix, start_id, group_file],
+                     outputs=[join(results_dir, "{}_{}.txt".format(
+                         group_file, x)) for x in inflation_list])
+
+    stages.add_stage("filter_groups", export_filtered_groups,
+                     [inflation_list, group_file, gene_t, sp_t, sqldb,
+                      db_path, tmp_dir, dest], {"nm": nm, "processes": cpus},
+                     deps=["mcl_groups"], params=[gene_t, sp_t],
+                     outputs=[join(results_dir, "Inflation%s" % x)
+                              for x in inflation_list],
+                     always=always_export)
+
+    return stages
+
+
 def check_bin_path(bin_path, program):
 
     prog = {"usearch": "usearch",
@@ -493,6 +797,25 @@ def main():
     search_opts.add_argument("-evalue", dest="evalue", default=1E-5,
                              help="Set the e-value cut off for search "
                              "operation (default is '%(default)s')")
+    search_opts.add_argument("--pairs-mode", dest="pairs_mode",
+                             default="default",
+                             choices=make_pairs_sqlite.EXECUTION_MODES,
+                             help="Set the sqlite execution mode of the "
+                             "orthomclPairs step. 'tuned' applies tuned "
+                             "PRAGMAs to the database and 'memory' runs the "
+                             "step on an in-memory copy of the database "
+                             "(default is '%(default)s')")
+    search_opts.add_argument("--pairs-engine", dest="pairs_engine",
+                             default="sql", choices=["sql", "array"],
+                             help="Set the engine of the orthomclPairs step. "
+                             "'array' loads the similar sequences into "
+                             "arrays instead of running SQL queries, in "
+                             "which case --pairs-mode is ignored (default "
+                             "is '%(default)s')")
+    search_opts.add_argument("--pairs-timings", dest="pairs_timings",
+                             action="store_const", const=True,
+                             help="Report the time taken by each step of "
+                             "the orthomclPairs program")
     search_opts.add_argument("-inflation", dest="inflation", nargs="+",
                              default=["3"],
                              choices=[str(x) for x in xrange(1, 6)],
@@ -530,8 +853,14 @@ def main():
     # Miscellaneous options
     misc_options = parser.add_argument_group("Miscellaneous options")
     misc_options.add_argument("-np", dest="cpus", default=1, help="Number of "
-                              "CPUs to be used during search operation ("
-                              "default is '%(default)s')")
+                              "CPUs to be used during search operation, "
+                              "BLAST parsing and the processing of multiple "
+                              "inflation values (default is '%(default)s')")
+    misc_options.add_argument("--restart", dest="restart",
+                              action="store_const", const=True,
+                              help="Execute every stage of the pipeline, "
+                              "ignoring the stages completed by previous "
+                              "runs in the same output directory")
     misc_options.add_argument("-v", "--version", dest="version",
                               action="store_const", const=True,
                               help="Displays software version")
@@ -605,40 +934,28 @@ def main():
         if not os.path.exists(int_dir):
             os.makedirs(int_dir)
 
-        if arg.normal:
-            install_schema(tmp_dir)
-            adjust_fasta(proteome_files, output_dir)
-            filter_fasta(min_length, max_percent_stop, database_name,
-                         output_dir)
-            allvsall_usearch(database_name, evalue_cutoff, output_dir, cpus,
-                             usearch_out_name, usearch_bin=usearch_bin)
-            blast_parser(usearch_out_name, output_dir, tmp_dir, None)
-            pairs(tmp_dir)
-            dump_pairs(tmp_dir, output_dir)
-            mcl(inflation, output_dir, mcl_file=mcl_bin)
-            mcl_groups(inflation, prefix, start_id, groups_file, output_dir)
-            export_filtered_groups(inflation, groups_file, max_gn, min_sp,
-                                   sql_path, database_name, tmp_dir,
-                                   output_dir)
+        if arg.normal or arg.no_adjust:
+            stages = orthology_stages(
+                proteome_files if arg.normal else None, output_dir, tmp_dir,
+                min_length, max_percent_stop, database_name, evalue_cutoff,
+                cpus, usearch_out_name, usearch_bin, mcl_bin, inflation,
+                prefix, start_id, groups_file, max_gn, min_sp, sql_path,
+                tmp_dir,
+                pairs_options={"mode": arg.pairs_mode,
+                               "report_timings": arg.pairs_timings,
+                               "engine": arg.pairs_engine},
+                resume=not arg.restart)
+
+            def report_stage(stage, status):
+                if status == "skip":
+                    print_col("Skipping stage '{}', completed in a previous "
+                              "run".format(stage), YELLOW, 1)
+
+            stages.run(callback=report_stage)
 
         elif arg.adjust:
             adjust_fasta(proteome_files, output_dir)
 
-        elif arg.no_adjust:
-            install_schema(tmp_dir)
-            filter_fasta(min_length, max_percent_stop, database_name,
-                         output_dir)
-            allvsall_usearch(database_name, evalue_cutoff, output_dir, cpus,
-                             usearch_out_name, usearch_bin=usearch_bin)
-            blast_parser(usearch_out_name, output_dir, tmp_dir, None)
-            pairs(tmp_dir)
-            dump_pairs(tmp_dir, output_dir)
-            mcl(inflation, output_dir, mcl_file=mcl_bin)
-            mcl_groups(inflation, prefix, start_id, groups_file, output_dir)
-            export_filtered_groups(inflation, groups_file, max_gn, min_sp,
-                                   sql_path, database_name, tmp_dir,
-                                   output_dir)
-
         print_col("OrthoMCL pipeline execution successfully completed in %s "
                   "seconds" % (round(time.time() - start_time, 2)), GREEN, 1)
 
@@ -35,6 +35,8 @@ except ImportError:
 import os
 import sys
 import time
+import mmap
+import string
 import shutil
 import traceback
 from collections import OrderedDict, Counter
@@ -268,9 +270,91 @@ def print_col(text, color, i=0, quiet=False):
         raise SystemExit(1)
 
 
+# Translation table and deleted characters used to normalize sequence
+# strings with str.translate: lower case, no whitespace and no stop codon
+# symbols
+seq_table = string.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+seq_deletechars = string.whitespace + "*"
+
+
+class MappedFile(object):
+    """Read-only memory map of a text file.
+
+    The memory map is available in the `mm` attribute, where it can be
+    searched and sliced directly without reading the file into memory.
+    The object also behaves as a read-only file handle that iterates over
+    lines, so that it can be used in place of a file object, e.g. in
+    `Base.autofinder`.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file. The file cannot be empty.
+
+    Attributes
+    ----------
+    mm : mmap.mmap
+        Read-only memory map of the file.
+    """
+
+    def __init__(self, path):
+
+        self._fh = open(path, "rb")
+        try:
+            self.mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            self._fh.close()
+            raise
+
+    def __iter__(self):
+
+        return self
+
+    def next(self):
+
+        line = self.mm.readline()
+        if not line:
+            raise StopIteration
+
+        return line
+
+    def readline(self):
+
+        return self.mm.readline()
+
+    def seek(self, pos):
+
+        self.mm.seek(pos)
+
+    def close(self):
+
+        self.mm.close()
+        self._fh.close()
+
+
 class Base(object):
 
-    def autofinder(self, reference_file):
+    @staticmethod
+    def map_file(path):
+        """Returns a `MappedFile` for `path`, if it can be memory mapped.
+
+        Parameters
+        ----------
+        path : str
+            Path to the file.
+
+        Returns
+        -------
+        _ : MappedFile or None
+            None if the file is empty or cannot be mapped.
+        """
+
+        try:
+            return MappedFile(path)
+        except (ValueError, EnvironmentError):
+            return None
+
+    def autofinder(self, reference_file, mapped_file=None):
         """Autodetects format, missing data symbol and sequence type.
         
         Attempts to find the file format, missing data symbol and sequence
@@ -285,6 +369,9 @@ class Base(object):
         ----------
         reference_file : str
             Path to sequence file
+        mapped_file : MappedFile, optional
+            Memory map of `reference_file`. If provided, the file is read
+            from the map instead of being opened again.
         
         Returns
         -------
@@ -300,7 +387,11 @@ class Base(object):
         
         """
 
-        file_handle = open(reference_file, "r")
+        if mapped_file:
+            file_handle = mapped_file
+            file_handle.seek(0)
+        else:
+            file_handle = open(reference_file, "r")
 
         # Set to True when the format has been detected
         format_found = False
@@ -816,6 +816,64 @@ class Partitions(object):
         else:
             self.partitions_type[fl_name] = seq_type
 
+    def add_partitions(self, names, lengths, file_name=None, models=None,
+                       seq_type=None):
+        """Adds several contiguous partitions at once.
+
+        Bulk alternative to `add_partition` for the common case of
+        contiguous partitions with known lengths from a single alignment
+        (e.g., the loci of a .loci file). The partitions are added after
+        the current `counter`, in the provided order.
+
+        Parameters
+        ----------
+        names : list
+            List with the names of the partitions.
+        lengths : list
+            List with the length of each partition.
+        file_name : str, optional
+            Name of the alignment file.
+        models : dict, optional
+            Maps partition names to the model that will be set in `models`.
+            Partitions not in this dictionary get an empty model.
+        seq_type : str, optional
+            Sequence type of the partitions.
+        """
+
+        start = self.counter
+        models = models if models else {}
+
+        for name, length in zip(names, lengths):
+            self.partitions_index.append([name, 0])
+            try:
+                self.partitions_alignments[name].append(
+                    file_name if file_name else name)
+            except KeyError:
+                self.partitions_alignments[name] = [
+                    file_name if file_name else name]
+            try:
+                self.models[name] = models[name]
+            except KeyError:
+                self.models[name] = [[[]], [None], []]
+            self.partitions[name] = [[[self.counter,
+                                      self.counter + (length - 1)]], False]
+            self.counter += length
+
+        self.partition_length += self.counter - start
+
+        if file_name and self.counter > start:
+            if file_name in self.alignments_range:
+                current_range = self.alignments_range[file_name]
+                current_range[0] = min(current_range[0], start)
+                current_range[1] = max(current_range[1], self.counter - 1)
+            else:
+                self.alignments_range[file_name] = [start, self.counter - 1]
+
+            self.partitions_type[file_name] = seq_type
+        else:
+            for name in names:
+                self.partitions_type[name] = seq_type
+
     def _remove_routine(self, part_name):
         """
         Routine that removes a partition based on its name. It ca be used
@@ -311,7 +311,7 @@ class, so it's perhaps more useful to see how the
 :meth:`~.AlignmentList.__init__` works::
 
     def __init__(self, alignment_list, sql_db=None, db_cur=None, db_con=None,
-                 pbar=None):
+                 pbar=None, processes=1):
 
         if db_cur and db_con:
             self.con = db_con
@@ -668,11 +668,17 @@ import itertools
 import re
 import os
 import pickle
+import shutil
 import sys
+import tempfile
+import time
 from os.path import join, basename, splitext, exists
 from itertools import compress
+from multiprocessing.util import Finalize
 from threading import Lock
 import functools
+import hashlib
+import multiprocessing
 import sqlite3
 
 # TriFusion imports
@@ -680,7 +686,7 @@ import sqlite3
 try:
     import process
     from process.base import dna_chars, aminoacid_table, iupac, \
-        iupac_rev, iupac_conv, Base
+        iupac_rev, iupac_conv, Base, seq_table, seq_deletechars
     from process.data import Partitions
     from process.data import PartitionException
     from process.error_handling import DuplicateTaxa, KillByUser, \
@@ -689,7 +695,7 @@ try:
 except ImportError:
     import trifusion.process as process
     from trifusion.process.base import dna_chars, aminoacid_table, iupac, \
-        iupac_rev, iupac_conv, Base
+        iupac_rev, iupac_conv, Base, seq_table, seq_deletechars
     from trifusion.process.data import Partitions
     from trifusion.process.data import PartitionException
     from trifusion.process.error_handling import DuplicateTaxa, KillByUser, \
@@ -712,142 +718,227 @@ except ImportError:
 lock = Lock()
 
 
-class LookupDatabase(object):
-    """Decorator handling hash lookup table with pre-calculated values.
+class SimilarityCache(object):
+    """Persistent, content-addressed cache of pairwise similarity values.
 
-    This decorator class is used to decorate class methods that calculate
-    pairwise sequence similarity. To ensure proper functionality, the
-    decorated method should be called first with a single "connect" argument
-    and after finishing all calculations, with a single "disconnect" argument.
-    These special method callings are necessary to setup and close the
-    database storing the calculated values, respectively.
+    Stores the results of pairwise sequence similarity calculations in a
+    sqlite database, so that the same alignment is not compared again
+    within a session or across sessions that share the same database file.
+    There is one entry per alignment (see
+    `AlignmentList._get_similarity_matrices`), keyed by a SHA1 digest of
+    its character matrix (all sequences, in row order) together with the
+    matrix shape and the missing data and gap symbols, which makes the
+    keys stable across processes and interpreter versions. The value of
+    an entry holds the upper triangles of the similarity and effective
+    length matrices of all pairs of sequences of the alignment, stored as
+    a blob of the smallest unsigned integer type (uint16 or uint32) that
+    holds the counts.
+
+    Lookups and inserts are performed in batches. The total size of the
+    stored blobs is bounded by `max_bytes`, and the least recently used
+    entries are evicted when the cache is closed.
 
     Parameters
     ----------
-    func : function
-        Decorated function
-    
+    path : str
+        Path to the sqlite database file of the cache.
+    max_bytes : int
+        Maximum total size, in bytes, of the values kept in the cache.
+
     Attributes
     ----------
-    func : function
-        Decorated function
+    path : str
+        Path to the sqlite database file of the cache.
+    max_bytes : int
+        Maximum total size, in bytes, of the values kept in the cache.
     con : None or sqlite.Connection
-        Connection object of the sqlite database
-    c : None or sqlite.Cursor
-        Cursor object of the sqlite database
-    
+        Connection object of the sqlite database. Only set between the
+        `connect` and `close` calls.
+    hits : int
+        Number of keys found in the cache.
+    misses : int
+        Number of keys not found in the cache.
+
     Notes
     -----
-    The `con` and `c` attributes are initialized when the decorated function
-    is called with the single "connect" argument
-    (e.g. decorated_func("connect")). When the decorated function is called
-    with the single "disconnect" argument (e.g. decorated_func("disconnect")),
-    the database changes are committed, the sqlite Connection is closed and
-    the Cursor is reset.
+    The `connect` method must be called before the first lookup, and
+    `close` after finishing all calculations, which commits the changes,
+    evicts the least recently used entries and closes the connection.
+    When the cache is not connected, lookups always miss and inserts are
+    ignored.
     """
 
-    def __init__(self, func):
+    batch_size = 500
+    """Maximum number of keys queried in a single lookup, which must stay
+    below the sqlite limit of host parameters"""
+
+    version = 2
+    """Version of the cache table, stored as the `user_version` of the
+    database. Tables of other versions are dropped on `connect`"""
+
+    def __init__(self, path, max_bytes=256 * 1024 ** 2):
 
-        self.func = func
+        self.path = path
+        self.max_bytes = max_bytes
         self.con = None
-        self.c = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(seq):
+        """Returns the SHA1 digest of a string or buffer (e.g. an alignment
+        matrix)."""
+
+        return hashlib.sha1(seq).digest()
+
+    @staticmethod
+    def make_key(digests, *symbols):
+        """Creates a cache key from data digests and symbols.
 
-    def __call__(self, *args):
-        """Wraps the call of `func`.
-        
-        When the decorated method is called, this code is wrapped around
-        its execution. It accepts an arbitrary number of positional arguments
-        but is is currently designed to decorate the `_get_similarity`
-        method of the `AlignmentList` class. There are three expected calling
-        modes:
-        
-            1. decorated_func("connect") : Initializes the Connection and
-            Cursor objects of the database
-            2. decorated_func(seq1, seq2, locus_lenght) : The typical main
-            execution of the method, providing the sequence1 and sequence2
-            strings along with the integer with their lenght
-            3. decorated_func("disconnect") : Commits changes to database
-            and closes Connection and Cursor objects.
-        
-        The path of this sqlite database is automatically obtained from
-        the `AlignmentList` attribute `sql_path`. We use the path to the
-        same directory, but with a different name for the database, "pw.db".
-        
         Parameters
         ----------
-        args : list
-            List of positional arguments for decorated method
-        
-        Notes
-        -----
-        When the decorated method is called normally (i.e., not with a
-        "connect" or "disconnect" argument"), it first creates an hash
-        of the argument list (excluding `self`). This hash is used to query
-        the database to check if a value for that combination of sequence
-        strings and sequence length has already been calculated. If yes,
-        the result is immediately  returned without executing the decorated
-        method. If no, the method is executed to perform calculations. The
-        result of this calculation is then stored in the database and the
-        result is returned.
+        digests : list
+            Digests of the compared data, as returned by `digest`. For the
+            similarity matrices of an alignment, this is the digest of its
+            whole character matrix, so that the key identifies the
+            alignment rather than a pair of sequences.
+        symbols : str
+            Additional strings that change the result of the calculation
+            (e.g. the matrix shape and the missing data and gap symbols).
+
+        Returns
+        -------
+        _ : str
+            Hexadecimal digest used as cache key.
+        """
+
+        h = hashlib.sha1("\x00".join(symbols))
+        for d in digests:
+            h.update(d)
+
+        return h.hexdigest()
+
+    def connect(self):
+        """Opens the cache database, creating its table if necessary."""
+
+        self.con = sqlite3.connect(self.path)
+        self.con.execute("PRAGMA synchronous = OFF")
+
+        # Values of previous versions are stored in another format
+        if self.con.execute(
+                "PRAGMA user_version").fetchone()[0] != self.version:
+            self.con.execute("DROP TABLE IF EXISTS similarity")
+            self.con.execute("PRAGMA user_version = {}".format(self.version))
+
+        self.con.execute("CREATE TABLE IF NOT EXISTS similarity ("
+                         "key TEXT PRIMARY KEY, "
+                         "val BLOB, "
+                         "dtype TEXT, "
+                         "size INTEGER, "
+                         "last_used REAL)")
+        self.con.execute("CREATE INDEX IF NOT EXISTS similarity_lru ON "
+                         "similarity(last_used)")
+
+    def get_many(self, keys):
+        """Retrieves cached values for a list of keys.
+
+        Parameters
+        ----------
+        keys : list
+            List of cache keys.
 
+        Returns
+        -------
+        vals : dict
+            Maps the keys found in the cache to their arrays of counts.
         """
 
-        c_args = args[1:3]
+        vals = {}
+
+        if not self.con:
+            self.misses += len(keys)
+            return vals
+
+        keys = list(set(keys))
+        for i in xrange(0, len(keys), self.batch_size):
+            batch = keys[i:i + self.batch_size]
+            for k, v, dtype in self.con.execute(
+                    "SELECT key, val, dtype FROM similarity WHERE key IN "
+                    "({})".format(", ".join(["?"] * len(batch))), batch):
+                vals[k] = np.frombuffer(v, dtype=dtype)
 
-        # Initialize database connection.
-        if c_args[0] == "connect":
+        if vals:
+            now = time.time()
+            self.con.executemany(
+                "UPDATE similarity SET last_used=? WHERE key=?",
+                ((now, k) for k in vals))
 
-            # Get path to database based on the AlignmentList db
-            tmp_dir = os.path.dirname(args[0].sql_path)
+        self.hits += len(vals)
+        self.misses += len(keys) - len(vals)
 
-            self.con = sqlite3.connect(join(tmp_dir, "pw.db"))
-            self.c = self.con.cursor()
-            self.c.execute("PRAGMA synchronous = OFF")
+        return vals
 
-            # Create table, if it does not yet exist
-            if not self.c.execute("SELECT name FROM sqlite_master WHERE type="
-                                  "'table' AND name='pw_table'").fetchall():
-                self.c.execute("CREATE TABLE pw_table (hash integer"
-                               ", seq_len integer"
-                               ", val float, "
-                               "effective_len float,"
-                               "PRIMARY KEY (hash, seq_len))")
+    def put_many(self, items):
+        """Stores values in the cache.
 
+        Parameters
+        ----------
+        items : iterable
+            Iterable of (key, values) tuples, where values is a sequence
+            of non-negative integer counts.
+        """
+
+        if not self.con:
             return
 
-        elif c_args[0] == "disconnect":
+        def rows():
+            for k, v in items:
+                v = np.asarray(v)
+                dtype = np.uint16 if not len(v) or \
+                    v.max() <= np.iinfo(np.uint16).max else np.uint32
+                blob = v.astype(dtype).tostring()
+                yield (k, sqlite3.Binary(blob), np.dtype(dtype).str,
+                       len(blob), now)
+
+        now = time.time()
+        self.con.executemany(
+            "INSERT OR REPLACE INTO similarity VALUES (?, ?, ?, ?, ?)",
+            rows())
+
+    def evict(self):
+        """Removes the least recently used entries until the size of the
+        cache is below `max_bytes`."""
+
+        if not self.con:
+            return
 
-            self.con.commit()
-            self.con.close()
-            self.c = None
+        excess = self.con.execute(
+            "SELECT TOTAL(size) FROM similarity").fetchone()[0] - \
+            self.max_bytes
 
+        if excess <= 0:
             return
 
-        if self.c:
+        keys = []
+        for k, size in self.con.execute(
+                "SELECT key, size FROM similarity ORDER BY last_used"):
+            keys.append((k,))
+            excess -= size
+            if excess <= 0:
+                break
 
-            h = hash(c_args)
-            self.c.execute("SELECT * FROM pw_table WHERE hash = ?"
-                           " AND seq_len = ?", (h, args[-2]))
-            vals = self.c.fetchone()
-            if vals:
-                return vals[2], vals[3]
-            else:
-                value = self.func(*args)
-                h = hash(c_args)
-                self.c.execute("INSERT INTO pw_table VALUES (?, ?, ?, ?)",
-                               (h, args[-2], value[0], value[1]))
-                return value
+        self.con.executemany("DELETE FROM similarity WHERE key=?", keys)
 
-        else:
-            return self.func(*args)
+    def close(self):
+        """Evicts old entries, commits changes and closes the database."""
 
-    def __repr__(self):
-        """ Return the function's docstring. """
-        return self.func.__doc__
+        if not self.con:
+            return
 
-    def __get__(self, obj, objtype):
-        """ Support instance methods """
-        return functools.partial(self.__call__, obj)
+        self.evict()
+        self.con.commit()
+        self.con.close()
+        self.con = None
 
 
 def check_data(func):
@@ -1142,6 +1233,374 @@ def setup_intable(func):
     return wrapper
 
 
+class ColumnStore(object):
+    """Columnar, memory-mapped copy of alignment tables.
+
+    The sqlite database stores each sequence as a single string, which is
+    very efficient to parse and write, but forces any column-wise
+    operation to slice every sequence for every column (see
+    `AlignmentList.iter_columns`). This class keeps a columnar copy of
+    each alignment as a `uint8` matrix with shape (taxa, sites), stored as
+    a `.npy` file that is memory-mapped on demand. Each matrix is built
+    once, on first request, from a single pass over the alignment rows and
+    is then reused by any number of consumers.
+
+    The store is invalidated as a whole whenever the database changes.
+    This is checked with a cheap stamp made from the total number of
+    rows changed by the connection and the `data_version` and
+    `schema_version` pragmas, so that no alignment modifier has to
+    notify the store.
+
+    Each store writes to its own temporary directory, since copies of an
+    `AlignmentList` using the same database (e.g. in background
+    processes) may clear or rebuild their matrices while others are
+    memory-mapped. Copies of a store, made with `copy`, `pickle` or
+    by forking the process, do not reuse the directory of the original
+    and create a new one when they first build a matrix.
+
+    Parameters
+    ----------
+    store_prefix : str
+        Path prefix of the directory where the `.npy` files will be
+        written. The directory is only created when the first matrix is
+        built, with a random suffix.
+
+    Attributes
+    ----------
+    store_prefix : str
+        Path prefix of the directory where the `.npy` files are written.
+    store_dir : str
+        Path to the directory where the `.npy` files are written. None
+        until the first matrix is built.
+    matrices : dict
+        Maps (table_name, aln_idx) to a tuple with the list of taxa (in
+        the order of the matrix rows) and the path to the `.npy` file.
+    stamp : tuple
+        Database stamp at the time the current matrices were built.
+    """
+
+    def __init__(self, store_prefix):
+
+        self.store_prefix = store_prefix
+        self.store_dir = None
+        self.matrices = {}
+        self.stamp = None
+        # Process that created `store_dir`, and finalizer that removes it
+        # when the store is garbage collected or that process exits
+        self._owner = None
+        self._finalizer = None
+
+    def __getstate__(self):
+
+        # Copies do not own the directory of the original store
+        state = self.__dict__.copy()
+        state.update(store_dir=None, matrices={}, stamp=None, _owner=None,
+                     _finalizer=None)
+
+        return state
+
+    def __eq__(self, other):
+
+        return isinstance(other, ColumnStore) and \
+            self.store_prefix == other.store_prefix
+
+    def __ne__(self, other):
+
+        return not self == other
+
+    def _check_owner(self):
+        """Forgets the directory and matrices inherited from another
+        process (e.g., after a fork), without removing them."""
+
+        if self._owner is not None and self._owner != os.getpid():
+            self.store_dir = None
+            self.matrices = {}
+            self.stamp = None
+            self._owner = None
+            self._finalizer = None
+
+    @staticmethod
+    def get_stamp(con):
+        """Returns a value that changes whenever the database is modified.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Connection object of the sqlite database.
+
+        Returns
+        -------
+        _ : tuple
+            Tuple with the number of changes of the connection, and the
+            `data_version` and `schema_version` pragmas.
+        """
+
+        return (con.total_changes,
+                con.execute("PRAGMA data_version").fetchone()[0],
+                con.execute("PRAGMA schema_version").fetchone()[0])
+
+    def validate(self, con):
+        """Drops all matrices if the database changed since they were built.
+
+        Parameters
+        ----------
+        con : sqlite3.Connection
+            Connection object of the sqlite database.
+        """
+
+        self._check_owner()
+
+        stamp = self.get_stamp(con)
+
+        if stamp != self.stamp:
+            self.clear()
+            self.stamp = stamp
+
+    def get(self, table_name, aln_idx):
+        """Returns the matrix of an alignment, if it has been built.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            Alignment index in the database.
+
+        Returns
+        -------
+        taxa : list
+            List of taxa names, in the order of the matrix rows. None if
+            the matrix is not available.
+        matrix : numpy.memmap
+            Read-only `uint8` matrix with shape (taxa, sites). None if the
+            matrix is not available.
+        """
+
+        self._check_owner()
+
+        try:
+            taxa, path = self.matrices[(table_name, aln_idx)]
+        except KeyError:
+            return None, None
+
+        if not exists(path):
+            del self.matrices[(table_name, aln_idx)]
+            return None, None
+
+        return taxa, np.load(path, mmap_mode="r")
+
+    def build(self, cur, table_name, aln_idx):
+        """Builds the matrix of an alignment from its database rows.
+
+        Sequences are encoded as their byte values. As in
+        `AlignmentList.iter_columns`, if the sequences do not have the same
+        length, only the columns shared by all sequences are kept. The
+        matrix is written to a temporary file that is then renamed, so
+        that a matrix that is already memory-mapped is never truncated.
+
+        Parameters
+        ----------
+        cur : sqlite3.Cursor
+            Cursor object of the sqlite database.
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            Alignment index in the database.
+
+        Returns
+        -------
+        taxa : list
+            List of taxa names, in the order of the matrix rows.
+        matrix : numpy.memmap
+            Read-only `uint8` matrix with shape (taxa, sites).
+        """
+
+        ntaxa, nsites = cur.execute(
+            "SELECT count(*), min(length(seq)) FROM [{}] "
+            "WHERE aln_idx=?".format(table_name), (aln_idx,)).fetchone()
+
+        self._check_owner()
+
+        if self.store_dir is None or not exists(self.store_dir):
+            parent_dir, prefix = os.path.split(self.store_prefix)
+            parent_dir = parent_dir or os.curdir
+            if not exists(parent_dir):
+                os.makedirs(parent_dir)
+            self.store_dir = tempfile.mkdtemp(prefix=prefix + "_",
+                                              dir=parent_dir)
+            self._owner = os.getpid()
+            self._finalizer = Finalize(
+                self, shutil.rmtree, args=(self.store_dir,),
+                kwargs={"ignore_errors": True}, exitpriority=0)
+
+        path = join(self.store_dir, "{}_{}.npy".format(
+            re.sub(r"[^\w]", "_", table_name), aln_idx))
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=self.store_dir)
+        os.close(fd)
+
+        matrix = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.uint8, shape=(ntaxa, nsites or 0))
+
+        taxa = []
+        for i, (taxon, seq) in enumerate(cur.execute(
+                "SELECT taxon, seq FROM [{}] "
+                "WHERE aln_idx=?".format(table_name), (aln_idx,))):
+
+            matrix[i] = np.frombuffer(
+                seq[:nsites].encode("ascii", "replace"), dtype=np.uint8)
+
+            taxa.append(taxon)
+
+        matrix.flush()
+        del matrix
+
+        os.rename(tmp_path, path)
+
+        self.matrices[(table_name, aln_idx)] = (taxa, path)
+
+        return taxa, np.load(path, mmap_mode="r")
+
+    def clear(self):
+        """Removes all matrices from the store, and its directory if it
+        was created by this process."""
+
+        self._check_owner()
+
+        self.matrices = {}
+
+        if self.store_dir is not None:
+            self._finalizer()
+            self.store_dir = None
+            self._owner = None
+            self._finalizer = None
+
+
+def count_column_characters(block):
+    """Counts the occurrences of each character in each alignment column.
+
+    All columns are counted at once with a single `numpy.bincount` call,
+    by offsetting the character codes of each column by 256.
+
+    Parameters
+    ----------
+    block : numpy.array
+        `uint8` matrix with shape (taxa, columns), as yielded by
+        `AlignmentList.iter_column_blocks`.
+
+    Returns
+    -------
+    counts : numpy.array
+        Matrix with shape (columns, 256), where `counts[i, ord(x)]` is the
+        number of occurrences of character `x` in column `i`.
+    """
+
+    ncols = block.shape[1]
+    offsets = np.arange(ncols, dtype=np.intp) * 256
+
+    return np.bincount((block + offsets).ravel(),
+                       minlength=ncols * 256).reshape(ncols, 256)
+
+
+def pairwise_similarity(matrix, excluded, block_size=4096):
+    """Counts pairwise similarities between all sequences of an alignment.
+
+    For every pair of rows, counts the columns where both characters are
+    identical and the columns where neither character is in `excluded`
+    (the effective length). Both counts are computed for all pairs at once
+    as products of one-hot encoded matrices, and columns are processed in
+    blocks of `block_size` to bound memory usage.
+
+    Parameters
+    ----------
+    matrix : numpy.array
+        `uint8` matrix with shape (taxa, columns), as stored in the
+        `ColumnStore`.
+    excluded : list
+        Characters (e.g. missing data and gap symbols) that are ignored
+        in the comparisons.
+    block_size : int
+        Maximum number of columns processed at once.
+
+    Returns
+    -------
+    sim : numpy.array
+        float64 matrix with shape (taxa, taxa) with the number of
+        identical, non excluded, columns of each pair of sequences.
+    ef_len : numpy.array
+        float64 matrix with shape (taxa, taxa) with the effective length
+        of each pair of sequences.
+    """
+
+    ntaxa = matrix.shape[0]
+    sim = np.zeros((ntaxa, ntaxa))
+    ef_len = np.zeros((ntaxa, ntaxa))
+    excluded = [ord(x) for x in excluded]
+
+    for p in xrange(0, matrix.shape[1], block_size):
+
+        block = np.asarray(matrix[:, p:p + block_size])
+
+        valid = ~np.in1d(block, excluded).reshape(block.shape)
+        x = valid.astype(np.float64)
+        ef_len += x.dot(x.T)
+
+        for char in np.unique(block[valid]):
+            x = (block == char).astype(np.float64)
+            sim += x.dot(x.T)
+
+    return sim, ef_len
+
+
+def parse_alignment_file(args):
+    """Parses an alignment file into a private, in-memory database.
+
+    This function is meant to be executed by the worker processes of
+    `AlignmentList.add_alignment_files`, which cannot write to the main
+    database. The alignment is parsed as usual, but into an in-memory
+    database, and the parsed rows are returned so that they can be
+    inserted in the main database by a single writer.
+
+    Parameters
+    ----------
+    args : tuple
+        Tuple with the path to the alignment file and the temporary
+        directory.
+
+    Returns
+    -------
+    aln_obj : Alignment
+        Parsed `Alignment` object, without database connection.
+    rows : list
+        List of (txId, taxon, seq) tuples with the alignment data. Empty if
+        the alignment could not be parsed.
+    """
+
+    aln_path, temp_dir = args
+
+    con = sqlite3.connect(":memory:")
+    cur = con.cursor()
+    cur.execute("CREATE TABLE alignment_data("
+                "txId INT, "
+                "taxon TEXT, "
+                "seq TEXT, "
+                "aln_idx INT)")
+
+    aln_obj = Alignment(aln_path, sql_cursor=cur, db_idx=0, sql_con=con,
+                        temp_dir=temp_dir)
+
+    if aln_obj.e:
+        rows = []
+    else:
+        rows = cur.execute(
+            "SELECT txId, taxon, seq FROM alignment_data").fetchall()
+
+    con.close()
+    aln_obj.cur = aln_obj.con = None
+
+    return aln_obj, rows
+
+
 class AlignmentException(Exception):
     """ Generic Alignment object exception. """
     pass
@@ -1260,6 +1719,10 @@ class Alignment(Base):
         created for the alignment data.
     input_format : str
         Format of the input alignment file.
+    insert_batch_size : int
+        Number of sequences buffered by the parsers before they are
+        written to the database (see `_insert_data`). This is a class
+        attribute and can be tuned for all `Alignment` objects.
     
     Notes
     -----
@@ -1286,6 +1749,8 @@ class Alignment(Base):
     AlignmentList.retrieve_alignment
     """
 
+    insert_batch_size = 1000
+
     def __init__(self, input_alignment, input_format=None, partitions=None,
                  locus_length=None, sequence_code=None,
                  taxa_idx=None, sql_cursor=None, sql_con=None,
@@ -1393,32 +1858,52 @@ class Alignment(Base):
 
         self.temp_dir = temp_dir if temp_dir else "."
 
+        self._insert_buffer = []
+        """
+        Stores the (txId, taxon, seq, aln_idx) rows of the parsers that
+        have not yet been written to the database.
+        """
+
+        self._mapped = None
+        """
+        Memory map of the alignment file, shared by the format detection
+        and the parsers while the alignment is being read.
+        """
+
         if not ignore_db_check:
 
-            # Get alignment format and code. Sequence code is a tuple of
-            # (DNA, N) or (Protein, X)
-            finder_content = self.autofinder(input_alignment)
-            # Handles the case where the input format is invalid and
-            # finder_content is an Exception
-            if isinstance(finder_content, Exception) is False:
-                self.input_format, self.sequence_code = self.autofinder(
-                    input_alignment)
-
-                # In case the input format is specified, overwrite the
-                # attribute
-                if input_format:
-                    self.input_format = input_format
-                    """
-                    Format of the alignment file.
-                    """
-
-                # parsing the alignment
-                self.read_alignment()
-            else:
-                # Setting the sequence code attribute for seq type checking
-                # in AlignmentList
-                self.sequence_code = None
-                self.e = finder_content
+            self._mapped = self.map_file(input_alignment)
+
+            try:
+                # Get alignment format and code. Sequence code is a tuple of
+                # (DNA, N) or (Protein, X)
+                finder_content = self.autofinder(input_alignment,
+                                                 self._mapped)
+                # Handles the case where the input format is invalid and
+                # finder_content is an Exception
+                if isinstance(finder_content, Exception) is False:
+                    self.input_format, self.sequence_code = finder_content
+
+                    # In case the input format is specified, overwrite the
+                    # attribute
+                    if input_format:
+                        self.input_format = input_format
+                        """
+                        Format of the alignment file.
+                        """
+
+                    # parsing the alignment
+                    self.read_alignment()
+                else:
+                    # Setting the sequence code attribute for seq type
+                    # checking in AlignmentList
+                    self.sequence_code = None
+                    self.e = finder_content
+
+            finally:
+                if self._mapped:
+                    self._mapped.close()
+                    self._mapped = None
 
         # In case there is a table for the provided input_alignment
         else:
@@ -1916,36 +2401,59 @@ class Alignment(Base):
         self.shelved_taxa = [x for x in lst if x in self.taxa_idx]
 
     def _insert_data(self, txId, taxon, seq):
-        """
+        """Buffers a sequence to be inserted in the database.
+
+        Parsers call this method for each sequence. The rows are kept in
+        the `_insert_buffer` attribute and written in batches of
+        `insert_batch_size` by `_flush_data`. `read_alignment` flushes the
+        remaining rows after parsing.
 
         Parameters
         ----------
-        txId
-        taxon
-        seq
+        txId : int
+            Taxon index.
+        taxon : str
+            Taxon name.
+        seq : str
+            Sequence string.
+        """
 
-        Returns
-        -------
+        try:
+            taxon = unicode(taxon)
+        except UnicodeDecodeError:
+            reload(sys)
+            sys.setdefaultencoding("utf8")
+            taxon = unicode(taxon)
 
+        self._insert_buffer.append((txId, taxon, seq, self.db_idx))
+
+        if len(self._insert_buffer) >= self.insert_batch_size:
+            self._flush_data()
+
+    def _flush_data(self):
+        """Writes the buffered sequences to the database.
+
+        All rows in `_insert_buffer` are inserted with a single
+        `executemany` call, which is committed as a single transaction.
         """
+
+        if not self._insert_buffer:
+            return
+
         try:
 
             lock.acquire(True)
 
-            try:
-                taxon = unicode(taxon)
-            except UnicodeDecodeError:
-                reload(sys)
-                sys.setdefaultencoding("utf8")
-                taxon = unicode(taxon)
-
-            self.cur.execute(
+            self.cur.executemany(
                 "INSERT INTO alignment_data VALUES (?, ?, ?, ?)",
-                (txId, taxon, seq, self.db_idx))
+                self._insert_buffer)
+            self.cur.connection.commit()
 
         finally:
             lock.release()
 
+        self._insert_buffer = []
+
     def _read_interleave_phylip(self, ntaxa):
         """ Alignment parser for interleave phylip format.
 
@@ -2167,102 +2675,84 @@ class Alignment(Base):
         """Alignment parser for phylip format.
 
         Parses a phylip alignment file and stored taxa and sequence data in
-        the database.
+        the database. The lines are read from the memory map of the file,
+        and each sequence is normalized with a single `str.translate`
+        call.
 
         See Also
         --------
         read_alignment
         """
 
-        fh = open(self.path)
+        mm = self._mapped.mm
+        size = len(mm)
 
         # Variable storing the lenght of each sequence
         size_list = []
 
         # Get the number of taxa and sequence length from the file header
-        header = fh.readline().split()
+        pos = mm.find("\n", 0) + 1 or size
+        header = mm[:pos].split()
         self.locus_length = int(header[1])
         self._partitions.set_length(self.locus_length)
         taxa_num = int(header[0])
 
-        # These three following attributes allow the support for
-        # interleave phylip files
-        # Flags whether the current line should be parsed for taxon name
-        taxa_gather = True
         # Counter that makes the correspondence between the current line
         # and the appropriate taxon
         c = 0
 
-        for line in fh:
+        while pos < size:
+
+            end = mm.find("\n", pos)
+            if end == -1:
+                end = size
+
+            line = mm[pos:end]
+            pos = end + 1
 
             # Ignore empty lines
             if line.strip() == "":
                 continue
 
-            # The counter is reset when surpassing the number of
-            # expected taxa.
+            # When surpassing the number of expected taxa, all lines with
+            # taxon names have already been processed.
             if c + 1 > taxa_num:
-                c = 0
-                taxa_gather = False
-
-            try:
 
-                # Here, assume that all lines with taxon names have
-                # already been processed, since he taxa_pos variable
-                # already has the same number as the expected taxa in the
-                #  phylip header
-                if not taxa_gather:
-
-                    # Oh boy, this seems like an interleave phylip file.
-                    # Redirect parsing to appropriate method
-                    # self.cur.execute("DELETE FROM [{}]".format(
-                    #     self.db_idx))
-                    size_list = self._read_interleave_phylip(taxa_num)
-                    break
-
-                # To support interleave phylip, while the taxa_pos
-                # variable has not reached the expected number of taxa
-                # provided in header[0], treat the line as the first
-                # lines of the phylip where the first field is the taxon
-                # name
-                elif taxa_gather:
-
-                    taxa = line.split()[0].replace(" ", "")
-                    taxa = self.rm_illegal(taxa)
+                # Oh boy, this seems like an interleave phylip file.
+                # Redirect parsing to appropriate method
+                size_list = self._read_interleave_phylip(taxa_num)
+                break
 
-                    try:
-                        # Joint multiple batches of sequence
-                        # Remove any possible whitespace by splitting
-                        # according to whitespace. This also ensures that
-                        # sequence is always a list when added to
-                        # sequence_data
-                        sequence = line.strip().lower().split()[1:]
-                    except IndexError:
-                        sequence = [""]
+            # To support interleave phylip, while the counter has not
+            # reached the expected number of taxa provided in header[0],
+            # treat the line as the first lines of the phylip where the
+            # first field is the taxon name
+            fields = line.split(None, 1)
 
-                    self._taxa_idx[taxa] = c
+            taxa = self.rm_illegal(fields[0])
 
-                    seq = "".join(sequence)
+            # Joint multiple batches of sequence, removing any whitespace
+            try:
+                seq = fields[1].translate(seq_table, seq_deletechars)
+            except IndexError:
+                seq = ""
 
-                    # Evaluate missing data symbol if undefined
-                    self._eval_missing_symbol(seq)
+            self._taxa_idx[taxa] = c
 
-                    self._insert_data(c, taxa, seq)
+            # Evaluate missing data symbol if undefined
+            self._eval_missing_symbol(seq)
 
-                    size_list.append(len(seq))
+            self._insert_data(c, taxa, seq)
 
-                    # Add counter for interleave processing
-                    c += 1
+            size_list.append(len(seq))
 
-            except IndexError:
-                pass
+            # Add counter for interleave processing
+            c += 1
 
         # Updating _partitions object
         self._partitions.add_partition(self.name, self.locus_length,
                                        file_name=self.path,
                                        seq_type=self.sequence_code[0])
-        
-        fh.close()
 
         # Checks the size consistency of the alignment
         if len(set(size_list)) > 1:
@@ -2272,52 +2762,49 @@ class Alignment(Base):
         """Alignment parser for fasta format.
 
         Parses a fasta alignment file and stores taxa and sequence data in
-        the database.
+        the database. The record boundaries are found directly in the
+        memory map of the file, and each sequence is normalized with a
+        single `str.translate` call over its slice of the map.
 
         See Also
         --------
         read_alignment
         """
 
-        fh = open(self.path)
+        mm = self._mapped.mm
+        size = len(mm)
 
         # Variable storing the lenght of each sequence
         size_list = []
 
-        sequence = []
-        taxa = None
         idx = 0
-        for line in fh:
-            if line.strip().startswith(">"):
-
-                if sequence:
-                    seq = "".join(sequence)
-
-                    # Evaluate missing data symbol if undefined
-                    self._eval_missing_symbol(seq)
 
-                    self._insert_data(idx, taxa, seq)
+        # Get the start of the first record. Records start with a ">"
+        # character at the beginning of a line
+        if mm[:1] == ">":
+            start = 0
+        else:
+            start = mm.find("\n>", 0)
+            start = start + 1 if start != -1 else -1
 
-                    self._taxa_idx[taxa] = idx
+        while start != -1:
 
-                    if not self.locus_length:
-                        self.locus_length = len(seq)
+            header_end = mm.find("\n", start)
+            if header_end == -1:
+                header_end = size
 
-                    size_list.append(len(seq))
+            next_start = mm.find("\n>", header_end)
+            seq_end = next_start if next_start != -1 else size
 
-                    # sequence_data.append((taxa, "".join(sequence)))
-                    sequence = []
-                    idx += 1
+            taxa = self.rm_illegal(mm[start + 1:header_end].strip())
+            seq = mm[header_end:seq_end].translate(seq_table,
+                                                   seq_deletechars)
 
-                taxa = line[1:].strip()
-                taxa = self.rm_illegal(taxa)
-
-            elif line.strip() != "" and taxa:
-                sequence.append(line.strip().lower().
-                                replace(" ", "").replace("*", ""))
+            start = next_start + 1 if next_start != -1 else -1
 
-        if sequence:
-            seq = "".join(sequence)
+            # Records without sequence are ignored
+            if not seq:
+                continue
 
             # Evaluate missing data symbol if undefined
             self._eval_missing_symbol(seq)
@@ -2329,7 +2816,9 @@ class Alignment(Base):
             if not self.locus_length:
                 self.locus_length = len(seq)
 
-        size_list.append(len(seq))
+            size_list.append(len(seq))
+
+            idx += 1
 
         self._partitions.set_length(self.locus_length)
 
@@ -2338,8 +2827,6 @@ class Alignment(Base):
                                        file_name=self.path,
                                        seq_type=self.sequence_code[0])
 
-        fh.close()
-
         # Checks the size consistency of the alignment
         if len(set(size_list)) > 1:
             self.e = AlignmentUnequalLength()
@@ -2347,6 +2834,13 @@ class Alignment(Base):
     def _read_loci(self):
         """Alignment parser for pyRAD and ipyrad loci format.
 
+        The file is read in a single pass. Taxa are indexed as they are
+        found, and missing data for the loci where a taxon is absent is
+        only written when that taxon appears again (or at the end of the
+        file), as a single padding sequence spanning all the loci it
+        missed. Each locus is a partition, and all partitions are added
+        at the end with `Partitions.add_partitions`.
+
         See Also
         --------
         read_alignment
@@ -2361,36 +2855,49 @@ class Alignment(Base):
         # Variable storing the length of each sequence
         size_list = []
 
-        taxa_list = self.get_loci_taxa(self.path)
-        self._taxa_idx = dict((x, p) for p, x in enumerate(taxa_list))
+        self._taxa_idx = {}
+
+        # Maps the taxon index to the length of its sequence that has
+        # already been written to the database
+        taxa_end = {}
 
-        # Create empty dict
+        # Stores the sequence data of the current locus
+        locus_data = []
+
+        # Stores the sequence data of the previous loci that is yet to be
+        # inserted in the database
         sequence_data = []
 
-        # Add a counter to name each locus
-        locus_c = 1
-        # This variable is used in comparison with taxa_list to check which
-        # taxa are missing from the current partition. Missing taxa
-        # are filled with missing data.
-        present_taxa = []
+        # Length of each locus, in the order of the file
+        locus_lengths = []
 
         # Set default missing data symbol as "n"
         if not self.sequence_code[1]:
             self.sequence_code[1] = "n"
 
+        missing = self.sequence_code[1]
+
         for line in fh:
+
+            line = line.strip()
+
             # Parse a line with sequence data
-            if not line.strip().startswith("//") and line.strip() != "":
-                fields = line.strip().split()
+            if line and not line.startswith("//"):
+                fields = line.split()
                 taxon = fields[0].lstrip(">")
-                present_taxa.append(taxon)
                 cur_seq = fields[1].lower()
-                sequence_data.append(
-                    (self._taxa_idx[taxon], taxon, cur_seq, self.db_idx))
+
+                try:
+                    idx = self._taxa_idx[taxon]
+                except KeyError:
+                    idx = self._taxa_idx[taxon] = len(self._taxa_idx)
+                    taxa_end[idx] = 0
+
+                locus_data.append((idx, taxon, cur_seq))
                 size_list.append(len(cur_seq))
 
             # End of a partition in the loci file
-            elif line.strip().startswith("//"):
+            elif line.startswith("//"):
 
                 # Checks the size consistency of the previous _partitions
                 if len(set(size_list)) > 1:
@@ -2399,41 +2906,57 @@ class Alignment(Base):
                 # Reset list of sequence size for next partition
                 size_list = []
 
+                for idx, taxon, cur_seq in locus_data:
+                    # Add missing data for the loci missed by this taxon
+                    # since its last sequence
+                    if taxa_end[idx] < self.locus_length:
+                        sequence_data.append(
+                            (idx, taxon,
+                             missing * (self.locus_length - taxa_end[idx]),
+                             self.db_idx))
+
+                    sequence_data.append((idx, taxon, cur_seq, self.db_idx))
+                    taxa_end[idx] = self.locus_length + len(cur_seq)
+
+                locus_data = []
+
                 # Get length of previous partition based on the last
                 # sequence
                 locus_len = len(fields[1])
+                locus_lengths.append(locus_len)
                 self.locus_length += locus_len
 
-                # Add partition
-                self._partitions.add_partition("locus_{}".format(locus_c),
-                                               locus_len,
-                                               file_name=self.path,
-                                               seq_type=self.sequence_code[0])
-                
-                # Adding missing data
-                for tx in self._taxa_idx:
-                    if tx not in present_taxa:
-                        sequence_data.append(
-                            (self._taxa_idx[tx],
-                             tx,
-                             self.sequence_code[1] * locus_len,
-                             self.db_idx))
+                # Insert the buffered loci in the database
+                if len(sequence_data) >= self.insert_batch_size:
+                    self.cur.executemany(
+                        "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
+                            temp_table), sequence_data)
 
-                locus_c += 1
+                    # Reset sequence data for next partitions
+                    sequence_data = []
 
-                present_taxa = []
+        fh.close()
 
-                # Insert previous partition in the database
-                self.cur.executemany(
-                    "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                        temp_table), sequence_data)
+        # Add missing data for the last loci missed by each taxon
+        for taxon, idx in self._taxa_idx.items():
+            if taxa_end[idx] < self.locus_length:
+                sequence_data.append(
+                    (idx, taxon,
+                     missing * (self.locus_length - taxa_end[idx]),
+                     self.db_idx))
 
-                # Reset sequence data for next partition
-                sequence_data = []
+        self.cur.executemany(
+            "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
+            sequence_data)
 
-        self._partitions.set_length(self.locus_length)
+        # Add partitions
+        self._partitions.add_partitions(
+            ["locus_{}".format(x) for x in xrange(1, len(locus_lengths) + 1)],
+            locus_lengths,
+            file_name=self.path,
+            seq_type=self.sequence_code[0])
 
-        fh.close()
+        self._partitions.set_length(self.locus_length)
 
         # Add temp table to master table
         self.cur.execute(
@@ -2692,7 +3215,21 @@ class Alignment(Base):
             "stockholm": self._read_stockholm
         }
 
-        parsing_methods[self.input_format]()
+        # Memory map the alignment file, unless it was already mapped
+        # during the format detection
+        close_map = self._mapped is None
+        if close_map:
+            self._mapped = self.map_file(self.path)
+
+        try:
+            parsing_methods[self.input_format]()
+        finally:
+            if close_map and self._mapped:
+                self._mapped.close()
+                self._mapped = None
+
+        # Write any sequences still buffered by the parser
+        self._flush_data()
 
         # If the missing data symbol could not be evaluated during alignment
         # parsing, set the defaults
@@ -2894,6 +3431,9 @@ class AlignmentList(Base):
         object (`db_cur`) to connect to an existing database.
     pbar : ProgressBar, optional
         A ProgressBar object used to log the progress of TriSeq execution.
+    processes : int, optional
+        Number of worker processes used to parse the alignment files (see
+        `add_alignment_files`).
 
     Attributes
     ----------
@@ -2948,10 +3488,15 @@ class AlignmentList(Base):
         instance.
     partitions : trifusion.process.data.Partitions
         Partitions object that refers to the total `AlignmentList`.
+    column_store : ColumnStore
+        Columnar copy of the alignment tables, built on demand by
+        `iter_column_blocks`.
+    similarity_cache : SimilarityCache
+        Persistent cache of pairwise sequence similarity values.
     """
 
     def __init__(self, alignment_list, sql_db=None, db_cur=None, db_con=None,
-                 pbar=None):
+                 pbar=None, processes=1):
 
         # Create connection and cursor for sqlite database
         # If `db_cur` and `db_con` are both provided, setup the database
@@ -2987,7 +3532,7 @@ class AlignmentList(Base):
             self.con = sqlite3.connect(self.sql_path, check_same_thread=False,
                                        timeout=0.0)
             self.cur = self.con.cursor()
-            self.cur.execute("PRAGMA synchronous = OFF")
+            self._set_pragmas()
 
         if not self._table_exists(self.master_table):
             # Add master table for sequence data
@@ -3119,10 +3664,25 @@ class AlignmentList(Base):
         # Set _partitions object
         self.partitions = Partitions()
 
+        self.column_store = ColumnStore(
+            splitext(self.sql_path or "trifusion")[0] + "_columns")
+        """
+        Memory-mapped columnar copy of the alignment tables. Matrices are
+        only built when requested by `iter_column_blocks`.
+        """
+
+        self.similarity_cache = SimilarityCache(
+            join(os.path.dirname(self.sql_path or ""), "similarity.db"))
+        """
+        Persistent cache of pairwise sequence similarity values, stored
+        in the same directory as the sqlite database.
+        """
+
         # if type(alignment_list[0]) is str:
         if alignment_list:
 
-            self.add_alignment_files(alignment_list, pbar=pbar)
+            self.add_alignment_files(alignment_list, pbar=pbar,
+                                     processes=processes)
 
     def __iter__(self):
         """Iterator behavior for `AlignmentList`
@@ -3136,7 +3696,33 @@ class AlignmentList(Base):
         """
         return iter(self.alignments.values())
 
-    def iter_alignments(self, table_name=None, include_txid=False):
+    def _set_pragmas(self):
+        """Tunes the sqlite connection for bulk loading.
+
+        The database is a temporary working copy of the alignment files,
+        so durability can be traded for speed: synchronous writes are
+        disabled, the write-ahead log is used instead of the rollback
+        journal and temporary tables and indices are kept in memory.
+        """
+
+        self.cur.execute("PRAGMA synchronous = OFF")
+        self.cur.execute("PRAGMA journal_mode = WAL")
+        self.cur.execute("PRAGMA temp_store = MEMORY")
+
+    def _get_active_table(self, table_name=None):
+        """Returns the table from where alignment data should be fetched.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the database table. Defaults to the master table.
+
+        Returns
+        -------
+        table_name : str
+            `table_name` if that table exists and is not empty. Otherwise,
+            the name of the master table.
+        """
 
         table_name = table_name if table_name else self.master_table
 
@@ -3144,11 +3730,17 @@ class AlignmentList(Base):
         # fallback to the master table
         try:
             if not self.cur.execute(
-                    "SELECT * FROM {}".format(table_name)).fetchone():
+                    "SELECT * FROM [{}]".format(table_name)).fetchone():
                 table_name = self.master_table
         except sqlite3.OperationalError:
             table_name = self.master_table
 
+        return table_name
+
+    def iter_alignments(self, table_name=None, include_txid=False):
+
+        table_name = self._get_active_table(table_name)
+
         try:
 
             lock.acquire(True)
@@ -3173,16 +3765,7 @@ class AlignmentList(Base):
     def iter_columns(self, table_name=None, aln_idx=None, include_taxa=False,
                      group_by=None):
 
-        table_name = table_name if table_name else self.master_table
-
-        # Check if table exists and is not empty. In any of these conditions,
-        # fallback to the master table
-        try:
-            if not self.cur.execute(
-                    "SELECT * FROM [{}]".format(table_name)).fetchone():
-                table_name = self.master_table
-        except sqlite3.OperationalError as e:
-            table_name = self.master_table
+        table_name = self._get_active_table(table_name)
 
         try:
 
@@ -3239,6 +3822,111 @@ class AlignmentList(Base):
         finally:
             lock.release()
 
+    def iter_column_blocks(self, table_name=None, aln_idx=None,
+                           include_taxa=False, block_size=4096):
+        """Iterates over blocks of alignment columns as `uint8` matrices.
+
+        Columnar alternative to `iter_columns`. Instead of yielding one
+        tuple per column, this generator yields blocks of up to
+        `block_size` contiguous columns from each active alignment as a
+        `uint8` matrix with shape (taxa, columns), where each character is
+        encoded by its byte value (e.g. ``ord("a")``). The matrices are
+        read from the memory-mapped `column_store`, which is built from
+        the database on first use. Shelved alignments and taxa are
+        excluded.
+
+        Parameters
+        ----------
+        table_name : str, optional
+            Name of the database table. Falls back to the master table
+            if it does not exist or is empty.
+        aln_idx : int, optional
+            If provided, only the alignment with this index is iterated.
+        include_taxa : bool
+            If True, the list of taxa corresponding to the rows of each
+            block is also yielded.
+        block_size : int
+            Maximum number of columns in each block.
+
+        Yields
+        ------
+        taxa : list
+            List of taxa names for the block rows. Only yielded when
+            `include_taxa` is True.
+        block : numpy.array
+            `uint8` matrix with shape (taxa, columns).
+        aln_idx : int
+            Alignment index in the database.
+        """
+
+        table_name = self._get_active_table(table_name)
+
+        if aln_idx:
+            idx_list = [aln_idx]
+        else:
+            idx_list = [x for x in self.alignment_idx
+                        if x not in self.shelved_idx]
+
+        for idx in idx_list:
+
+            taxa, matrix = self._get_column_matrix(table_name, idx,
+                                                   self.shelved_taxa)
+
+            for p in xrange(0, matrix.shape[1], block_size):
+
+                block = matrix[:, p:p + block_size]
+
+                if include_taxa:
+                    yield taxa, block, idx
+                else:
+                    yield block, idx
+
+    def _get_column_matrix(self, table_name, aln_idx, shelved_taxa=None):
+        """Gets the matrix of an alignment from the `column_store`.
+
+        The matrix is built from the database if it does not yet exist in
+        the `column_store`.
+
+        Parameters
+        ----------
+        table_name : str
+            Name of the database table.
+        aln_idx : int
+            Alignment index in the database.
+        shelved_taxa : list, optional
+            Taxa whose rows are removed from the matrix.
+
+        Returns
+        -------
+        taxa : list
+            List of taxa names, in the order of the matrix rows.
+        matrix : numpy.array
+            `uint8` matrix with shape (taxa, sites). It is a read-only
+            memory map, unless rows were removed.
+        """
+
+        try:
+            lock.acquire(True)
+
+            self.column_store.validate(self.con)
+            taxa, matrix = self.column_store.get(table_name, aln_idx)
+
+            if matrix is None:
+                taxa, matrix = self.column_store.build(
+                    self.cur, table_name, aln_idx)
+
+        finally:
+            lock.release()
+
+        # Remove shelved taxa, if any
+        if shelved_taxa and any(x in shelved_taxa for x in taxa):
+            mask = np.array([x not in shelved_taxa for x in taxa],
+                            dtype=bool)
+            taxa = list(compress(taxa, mask))
+            matrix = matrix[mask]
+
+        return taxa, matrix
+
     def _create_aux_table(self, cur=None):
         """Creates an auxiliary table in the database
 
@@ -3537,6 +4225,8 @@ class AlignmentList(Base):
         self.con = sqlite3.connect(self.sql_path, check_same_thread=False,
                                    timeout=0.0)
         self.cur = self.con.cursor()
+        self._set_pragmas()
+        self.column_store.clear()
 
         for aln in self.all_alignments.values():
             aln.cur = self.cur
@@ -3558,6 +4248,7 @@ class AlignmentList(Base):
 
         self.cur = cur
         self.con = con
+        self.column_store.clear()
 
         for aln in self.all_alignments.values():
             aln.cur = cur
@@ -3621,6 +4312,9 @@ class AlignmentList(Base):
 
         self.cur.execute("DELETE FROM [{}]".format(self.master_table))
         self.cur.execute("DELETE FROM aux")
+        # Parsed rows are committed in batches, so the removal must be
+        # committed as well
+        self.con.commit()
 
         # Remove temporary json auxiliary files from Alignment objects
         for aln in self.all_alignments.values():
@@ -3652,6 +4346,7 @@ class AlignmentList(Base):
         self.summary_gene_table = pd.DataFrame(columns=columns)
         self.temporary_tables = []
         self.partitions = Partitions()
+        self.column_store.clear()
 
     def _reset_summary_stats(self):
         """Resets the `summary_stats` attribute."""
@@ -3879,7 +4574,19 @@ class AlignmentList(Base):
         # NOTE: The use_counter argument is set to False here so that when
         # the locus_range is provided, the counter does not interfere with the
         # ranges.
-        if not aln_parts.is_single():
+        if not aln_parts.is_single() and \
+                all(not v[1] and len(v[0]) == 1 for v in
+                    aln_parts.partitions.values()):
+            # Simple partitions without codon positions (e.g. the loci of
+            # a .loci file) are added all at once
+            self.partitions.add_partitions(
+                aln_parts.partitions.keys(),
+                [v[0][0][1] - v[0][0][0] + 1 for v in
+                 aln_parts.partitions.values()],
+                file_name=alignment_obj.path,
+                models=aln_parts.models,
+                seq_type=alignment_obj.sequence_code[0])
+        elif not aln_parts.is_single():
             for k, v in aln_parts:
                 self.partitions.add_partition(
                     k, locus_range=v[0], codon=v[1],
@@ -3955,7 +4662,7 @@ class AlignmentList(Base):
         self.taxa_names = self._get_taxa_list()
 
     def add_alignment_files(self, file_name_list, pbar=None,
-                            ns=None):
+                            ns=None, processes=1):
         """Adds a list of alignment files to the current `AlignmentList`.
 
         Adds a list of alignment paths to the current `AlignmentList`. Each
@@ -3964,6 +4671,13 @@ class AlignmentList(Base):
         correct and compliant with the other members of the `AlignmentList`
         object.
 
+        When `processes` is higher than 1, the alignment files are parsed
+        by a pool of worker processes (see `parse_alignment_file`). The
+        parsed alignments are received in the original order of
+        `file_name_list`, and their data is bulk inserted in the database
+        by this process, which remains the only writer. The remaining
+        checks are the same as for the sequential mode.
+
         Parameters
         ----------
         file_name_list : list
@@ -3973,6 +4687,8 @@ class AlignmentList(Base):
             in TriFusion.
         pbar : ProgressBar
             A ProgressBar object used to log the progress of TriSeq execution.
+        processes : int
+            Number of worker processes used to parse the alignment files.
         """
 
         # Check for duplicates among current file list
@@ -3991,58 +4707,108 @@ class AlignmentList(Base):
         if pbar:
             pbar.max_value = len(file_name_list)
 
-        for p, aln_path in enumerate(file_name_list):
+        temp_dir = os.path.dirname(self.sql_path)
 
-            # Progress bar update for command line version
-            if pbar:
-                pbar.update(p + 1)
+        if processes > 1 and len(file_name_list) > 1:
+            pool = multiprocessing.Pool(min(processes, len(file_name_list)))
+            # imap returns the results in the same order of file_name_list
+            parsed = pool.imap(parse_alignment_file,
+                               [(x, temp_dir) for x in file_name_list])
+        else:
+            pool = None
+            parsed = itertools.repeat(None)
 
-            if ns:
-                ns.progress += 1
-                ns.m = "Processing file {}".format(
-                    basename(aln_path))
+        try:
+            for p, (aln_path, res) in enumerate(
+                    itertools.izip(file_name_list, parsed)):
 
-                if ns.stop:
-                    raise KillByUser("Child thread killed by user")
+                # Progress bar update for command line version
+                if pbar:
+                    pbar.update(p + 1)
 
-            aln_obj = Alignment(aln_path, sql_cursor=self.cur,
-                                db_idx=self._idx, sql_con=self.con,
-                                temp_dir=os.path.dirname(self.sql_path))
+                if ns:
+                    ns.progress += 1
+                    ns.m = "Processing file {}".format(
+                        basename(aln_path))
 
-            if aln_obj.e:
-                aln_obj.remove_alignment()
+                    if ns.stop:
+                        raise KillByUser("Child thread killed by user")
 
-            if isinstance(aln_obj.e, InputError):
-                self.bad_alignments.append(aln_obj.path)
-            elif isinstance(aln_obj.e, AlignmentUnequalLength):
-                self.non_alignments.append(aln_obj.path)
-            elif isinstance(aln_obj.e, EmptyAlignment):
-                self.bad_alignments.append(aln_obj.path)
-            else:
+                if res:
+                    aln_obj, rows = res
+                    aln_obj.cur = self.cur
+                    aln_obj.con = self.con
+                    aln_obj.db_idx = self._idx
 
-                # Get seq code
-                if aln_obj.sequence_code[0] not in self.sequence_code:
-                    self.sequence_code.append(aln_obj.sequence_code[0])
-                # Check for multiple sequence types. If True,
-                # raise Exception
-                # elif self.sequence_code[0] != aln_obj.sequence_code[0]:
-                #     raise MultipleSequenceTypes("Multiple sequence "
-                #         "types detected: {} and {}".format(
-                #             self.sequence_code[0],
-                #             aln_obj.sequence_code[0]))
-
-                self.taxa_names.extend([x for x in aln_obj._taxa_idx.keys()
-                                        if x not in self.taxa_names])
-                self.set_partition_from_alignment(aln_obj,
-                                                  use_private_attr=True)
-
-                aln_obj.store_aux_data()
-
-                self.all_alignments[aln_obj.path] = aln_obj
-                self.alignments[aln_obj.path] = aln_obj
-                self.path_list.append(aln_obj.path)
-                self.alignment_idx[self._idx] = aln_obj
-                self._idx += 1
+                    try:
+                        lock.acquire(True)
+                        self.cur.executemany(
+                            "INSERT INTO alignment_data VALUES (?, ?, ?, ?)",
+                            ((txid, tx, seq, self._idx)
+                             for txid, tx, seq in rows))
+                    finally:
+                        lock.release()
+
+                else:
+                    aln_obj = Alignment(aln_path, sql_cursor=self.cur,
+                                        db_idx=self._idx, sql_con=self.con,
+                                        temp_dir=temp_dir)
+
+                    if aln_obj.e:
+                        aln_obj.remove_alignment()
+
+                self._add_parsed_alignment(aln_obj)
+
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+    def _add_parsed_alignment(self, aln_obj):
+        """Adds a parsed `Alignment` object to the current `AlignmentList`.
+
+        The `Alignment` object is classified according to its parsing
+        error (if any) and, if valid, its taxa and partitions are added
+        to the `AlignmentList` attributes.
+
+        Parameters
+        ----------
+        aln_obj : Alignment
+            Parsed `Alignment` object, with its data already in the
+            database under the current `_idx`.
+        """
+
+        if isinstance(aln_obj.e, InputError):
+            self.bad_alignments.append(aln_obj.path)
+        elif isinstance(aln_obj.e, AlignmentUnequalLength):
+            self.non_alignments.append(aln_obj.path)
+        elif isinstance(aln_obj.e, EmptyAlignment):
+            self.bad_alignments.append(aln_obj.path)
+        else:
+
+            # Get seq code
+            if aln_obj.sequence_code[0] not in self.sequence_code:
+                self.sequence_code.append(aln_obj.sequence_code[0])
+            # Check for multiple sequence types. If True,
+            # raise Exception
+            # elif self.sequence_code[0] != aln_obj.sequence_code[0]:
+            #     raise MultipleSequenceTypes("Multiple sequence "
+            #         "types detected: {} and {}".format(
+            #             self.sequence_code[0],
+            #             aln_obj.sequence_code[0]))
+
+            self.taxa_names.extend([x for x in aln_obj._taxa_idx.keys()
+                                    if x not in self.taxa_names])
+            self.set_partition_from_alignment(aln_obj,
+                                              use_private_attr=True)
+
+            aln_obj.store_aux_data()
+
+            self.all_alignments[aln_obj.path] = aln_obj
+            self.alignments[aln_obj.path] = aln_obj
+            self.path_list.append(aln_obj.path)
+            self.alignment_idx[self._idx] = aln_obj
+            self._idx += 1
 
     def retrieve_alignment(self, name):
         """Return `Alignment` object with a given `name`.
@@ -4119,135 +4885,92 @@ class AlignmentList(Base):
 
         Notes
         -----
-        Since sqlite queries are quite expensive, the previous approach
-        of querying the sequence for each taxa AND alignment table was
-        dropped. In this approach, sqlite will do all the heavy lifting.
-        First, a temporary table with the same definition as all alignment
-        tables is populated with data from all taxa and alignments. It is
-        important that and index is created on the new txId column, which
-        will redifine the txId of individual alignments according to the
-        global `taxa_names` attribute. In the first procedure, there
-        will be only one query per alignment. When the temporary table is
-        complete, some sql operations are used to group sequences from each
-        taxon for all alignments and then concatenated them, all in a single
-        query. This query returns the concatenated sequences, corrected txId
-        and taxon information, ready to populate the final concatenation
-        table. This approach is an order o magnitude faster than the
-        previous one where thousands of queries could be performed.
-        """
-
-        def fill_missing_taxa(aln, cur):
-            """Inserts missing sequences from current alignment in database
-
-            Given an :class:`.Alignment` object, this will check for the
-            taxa that are present in the overall
-            :attr:`.AlignmentList.taxa_names` attribute, but not in the
-            individual alignment. For each of those taxa, insert missing
-            data sequences in the database.
-
-            Parameters
-            ----------
-            aln : trifusion.process.sequence.Alignment
-                :class:`.Alignment` object.
-            cur : sqlite3.Cursor
-                Cursor object of the sqlite database.
-            """
-
-            # Get list of missing taxa in the provided alignment
-            missing_tx = set(self.taxa_names) - set(aln_obj.taxa_idx.keys())
-            # missing_tx = []
-
-            for tx in missing_tx:
-                # Insert missing data in database
-                cur.execute(
-                    "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                        temp_table),
-                    (taxa_idx[tx],
-                     tx,
-                     aln_obj.sequence_code[1] * aln_obj.locus_length,
-                     1))
-
-        # Create table temporary table and create an index
-        temp_table = ".concatenation"
-        self._create_table(temp_table, index=["concidex", "txId"])
+        The concatenated sequence of each taxon is built directly from
+        `table_in` and written once to `table_out`, so the input data is
+        never copied into an intermediate table. A temporary index on the
+        taxon column is created on `table_in`, which allows the sequences
+        of a single taxon across all active alignments to be fetched with
+        one query. The sequences are then joined in the order of the
+        active alignments, and missing data filler is generated on the fly
+        for the alignments where the taxon is absent. Only the data of a
+        single taxon is kept in memory at any given time.
+
+        Since `table_in` and `table_out` can be the same table, the
+        concatenation is first written to a temporary table, which then
+        replaces `table_out`.
+        """
+
+        table_in = self._get_active_table(table_in)
+        table_out = table_out if table_out else self.master_table
 
         # Variables that will store the taxa_list and _taxa_idx that will be
         # provided when instantiating the Alignment object
         taxa_idx = dict((tx, idx) for idx, tx in enumerate(self.taxa_names))
 
-        # Create new cursor to insert data into database while the main
-        # cursor returns the query
-        conc_cur = self.con.cursor()
+        # Active alignments, in the order their sequences are concatenated
+        active_alns = [(idx, aln) for idx, aln in self.alignment_idx.items()
+                       if idx not in self.shelved_idx]
+        active_set = set(idx for idx, _ in active_alns)
 
-        # Defining empty alignment object
-        aln_obj = None
+        # Missing data filler for each active alignment
+        fillers = [aln.sequence_code[1] * aln.locus_length
+                   for _, aln in active_alns]
 
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
+        # Index on the taxon column of the input table so that each taxon
+        # can be retrieved without a full table scan. Dropped at the end.
+        tx_index = "concat_taxon_idx"
+        self.cur.execute("DROP INDEX IF EXISTS {}".format(tx_index))
+        self.cur.execute("CREATE INDEX {} ON [{}](taxon)".format(
+            tx_index, table_in))
 
-        prev_idx = ""
-        for taxon, seq, aln_idx in self.iter_alignments(table_in):
+        temp_table = ".concatenation"
+        if self._table_exists(temp_table):
+            self.cur.execute("DROP TABLE [{}]".format(temp_table))
+        self._create_table(temp_table)
 
-            # This happens when the alignment changes during the iteration.
-            if aln_idx != prev_idx:
+        # Create new cursor to insert data into database while the main
+        # cursor returns the query
+        conc_cur = self.con.cursor()
 
-                # Update progress
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Preparing concatenation data")
-                c += 1
+        self._set_pipes(ns, pbar, total=len(self.taxa_names))
 
-                # If prev_idx is already defined, it means this is the second
-                # alignment during the iteration. In that case, fill the table
-                # with missing data from the previous alignment.
-                if prev_idx:
-                    fill_missing_taxa(aln_obj, conc_cur)
+        locus_length = 0
 
-                prev_idx = aln_idx
-                aln_obj = self.alignment_idx[prev_idx]
+        try:
+            lock.acquire(True)
 
-            # Add data to temporary table
-            conc_cur.execute("INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                    temp_table), (taxa_idx[taxon], taxon, seq, 1))
+            for p, tx in enumerate(self.taxa_names):
 
-        # Perform the fill missing taxa routine for the last alignment
-        # Or when there is only one active alignment.
-        if aln_idx:
-            aln_obj = self.alignment_idx[aln_idx]
-            fill_missing_taxa(aln_obj, conc_cur)
+                self._update_pipes(ns, pbar, value=p + 1,
+                                   msg="Concatenating taxon {}".format(tx))
 
-        # Setup final table that will have the concatenation
-        table_out = table_out if table_out else self.master_table
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}]".format(table_out))
-        self._create_table(table_out, index=["conc_idx", "aln_idx"])
+                tx_seqs = dict(
+                    (aln_idx, seq) for seq, aln_idx in self.cur.execute(
+                        "SELECT seq, aln_idx FROM [{}] "
+                        "WHERE taxon=?".format(table_in), (tx,))
+                    if aln_idx in active_set)
 
-        # Reset progress information for next loop
-        self._reset_pipes(ns)
-        self._set_pipes(ns, pbar, total=len(self.taxa_names))
+                seq = "".join([tx_seqs.get(idx, filler) for (idx, _), filler
+                               in zip(active_alns, fillers)])
 
-        # Here is where sqlite will do the heavy lifting of grouping sequences
-        # from the same taxon across all alignments and then concatenating
-        # them. It is important that the column that will be grouped has
-        # an index (for performance and memory reasons). While seqs are
-        # grouped by txId, the GROUP_CONCAT() method is used to return
-        # concatenated strings.
-        for p, (idx, tx, seq, aln_idx) in enumerate(conc_cur.execute(
-                "SELECT txId, taxon, GROUP_CONCAT(seq, ''), aln_idx "
-                "FROM [{}] "
-                "GROUP BY txId".format(temp_table))):
+                conc_cur.execute(
+                    "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
+                        temp_table), (taxa_idx[tx], tx, seq, 1))
 
-            self._update_pipes(ns, pbar, value=p + 1,
-                               msg="Concatenating taxon {}".format(tx))
+                locus_length = len(seq)
 
-            self.cur.execute("INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                table_out), (idx, tx, seq, aln_idx))
+        finally:
+            lock.release()
 
-        # Variable that will store the length of the concatenated alignment
-        # and provided it when initializing the Alignment object
-        locus_length = len(seq)
+        self.cur.execute("DROP INDEX IF EXISTS {}".format(tx_index))
 
-        # DROP the temporary table
-        self.cur.execute("DROP TABLE [{}]".format(temp_table))
+        # Replace the final table with the concatenation
+        if self._table_exists(table_out):
+            self.cur.execute("DROP TABLE [{}]".format(table_out))
+        self.cur.execute("ALTER TABLE [{}] RENAME TO [{}]".format(
+            temp_table, table_out))
+        self.cur.execute("CREATE INDEX conc_idx ON [{}](aln_idx)".format(
+            table_out))
 
         self._correct_partitions()
 
@@ -4256,7 +4979,7 @@ class AlignmentList(Base):
         if len(self.sequence_code) > 1:
             seq_type = ["mixed"]
         else:
-            seq_type = [aln_obj.sequence_code[0]]
+            seq_type = [active_alns[-1][1].sequence_code[0]]
 
         aln = Alignment(table_out, sql_cursor=self.cur, sql_con=self.con,
                         taxa_idx=taxa_idx,
@@ -4457,262 +5180,163 @@ class AlignmentList(Base):
         Alignment.filter_codon_positions
         """
 
-        def index(length, pos):
-            """
-            index generator
-            """
-            for _ in range(0, length, 3):
-                for j in pos:
-                    if j:
-                        yield 1
-                    else:
-                        yield 0
-
-        # Create temporary table
-        temp_table = ".codonfilter"
-        self._create_table(temp_table)
-
-        # Set progress pipes
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
-
-        # Reset _partitions
-        self.partitions = Partitions()
-
-        # Create out table if does not exist
-        if not self._table_exists(table_out):
-            self._create_table(table_out)
-
-        # Set temporary cursor to perform database changes while querying
-        temp_cur = self.con.cursor()
-
-        # Defining empty alignment object
-        aln_obj = None
-
-        prev_idx = ""
-        for txId, taxon, seq, aln_idx in self.iter_alignments(
-                table_in, include_txid=True):
-
-            # This happens when the alignment changes during the iteration.
-            if aln_idx != prev_idx:
-
-                # Update the partition size of the last alignment
-                if prev_idx:
-                    aln_obj.locus_length = len(final_seq)
-                    self.set_partition_from_alignment(aln_obj)
-
-                aln_obj = self.alignment_idx[aln_idx]
-
-                # Update progress
-                self._update_pipes(ns, pbar, value=c,
-                                   msg="Filtering file {}".format(
-                                       aln_obj.name))
-                c += 1
-
-                prev_idx = aln_idx
-
-            # Use itertools.compress to remove positions of the string
-            # based on position list
-            final_seq = "".join(list(itertools.compress(
-                seq, index(aln_obj.locus_length, position_list))))
-
-            # Add data to
-            temp_cur.execute(
-                "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
-                (txId, taxon, final_seq, aln_idx))
+        self.filter_columns(codon_positions=position_list, table_in=table_in,
+                            table_out=table_out, ns=ns, pbar=pbar)
 
-        # Perform partition correction on the last loop element
-        if aln_obj:
-            aln_obj.locus_length = len(final_seq)
-            self.set_partition_from_alignment(aln_obj)
-        
-        # If a previous table_out exist, replace with this new one
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}];".format(table_out))
+    def filter_columns(self, codon_positions=None, gap_threshold=None,
+                       missing_threshold=None, code_terminals=True,
+                       table_in=None, table_out=None, ns=None, pbar=None):
+        """Applies the codon and missing data column filters in one pass.
 
-        # Replace table_out with collapsed table
-        self.cur.execute("ALTER TABLE [{}] RENAME TO [{}]".format(
-            temp_table, table_out))
+        Fused filter stage used by `filter_codon_positions` and
+        `filter_missing_data`. The sequences of each active alignment are
+        read once into a `uint8` matrix, and the following steps are
+        applied, in this order, before each sequence is written once to
+        `table_out`:
 
-        self._reset_pipes(ns)
+            1. Removal of the codon positions not selected in
+               `codon_positions`.
+            2. Coding of terminal gaps as missing data, if
+               `code_terminals` is True and a missing data filter is
+               specified.
+            3. Removal of the columns with a proportion of gaps above
+               `gap_threshold` or a proportion of gaps and missing data
+               above `missing_threshold`.
 
-    def _filter_terminals(self, table_in, table_out, ns=None):
-        """
+        The partitions are updated with the final length of each alignment.
 
         Parameters
         ----------
-        table_in
-        table_out
-        ns
-
-        Returns
-        -------
-
+        codon_positions : list, optional
+            List of three bool elements that correspond to each codon
+            position (e.g. [True, True, False] excludes the third codon
+            position). If not provided, codon positions are not filtered.
+        gap_threshold : int, optional
+            Integer between 0 and 100 defining the percentage above which
+            a column with that gap percentage is removed. The missing data
+            filter is only applied if both `gap_threshold` and
+            `missing_threshold` are provided.
+        missing_threshold : int, optional
+            Integer between 0 and 100 defining the percentage above which
+            a column with that gap+missing percentage is removed.
+        code_terminals : bool
+            If True, the gaps at the start and end of each sequence are
+            coded as missing data before the missing data filter.
+        table_in : string
+            Name of database table containing the alignment data that is
+            used for this operation.
+        table_out : string
+            Name of database table where the final alignment will be
+            inserted.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+        pbar : ProgressBar
+            A ProgressBar object used to log the progress of TriSeq execution.
         """
 
-        # Set progress pipes
-        self._set_pipes(ns, None, total=len(self.alignments))
-
-        # Create temporary table
-        temp_table = ".filterterminals"
-        self._create_table(temp_table)
+        missing_filter = gap_threshold is not None and \
+            missing_threshold is not None
 
-        # Create temporary cursor to edit database while querying
-        temp_cur = self.con.cursor()
+        if codon_positions is not None:
+            codon_positions = np.array(codon_positions, dtype=bool)
 
-        prev_idx = ""
-        c = 1
-        for txId, taxon, seq, aln_idx in self.iter_alignments(
-                table_in, include_txid=True):
+        gap_code = ord(self.gap_symbol)
 
-            # This happens when the alignment changes during the iteration
-            if aln_idx != prev_idx:
+        def filter_rows(aln_obj, rows):
+            """Filters and inserts the rows of a single alignment."""
 
-                # Update progress
-                self._update_pipes(ns, None, value=c,
-                                   msg="Filtering terminals")
-                c += 1
+            missing_code = ord(aln_obj.sequence_code[1])
 
-                prev_idx = aln_idx
+            nsites = min(len(seq) for _, _, seq in rows)
+            matrix = np.array([np.frombuffer(
+                seq[:nsites].encode("ascii", "replace"), dtype=np.uint8)
+                for _, _, seq in rows], dtype=np.uint8).reshape(
+                len(rows), nsites)
 
-                aln = self.alignment_idx[aln_idx]
+            if codon_positions is not None:
+                matrix = matrix[:, np.resize(codon_positions, nsites)]
 
-            # Condition where the sequence only has gaps
-            if not seq.strip("-"):
-                seq = aln.sequence_code[1] * len(seq)
-                temp_cur.execute(
-                    "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(
-                        temp_table), (txId, taxon, seq, aln_idx))
+            if missing_filter:
 
-                continue
+                if code_terminals:
+                    gaps = matrix == gap_code
+                    terminals = np.logical_and.accumulate(gaps, axis=1) | \
+                        np.logical_and.accumulate(
+                            gaps[:, ::-1], axis=1)[:, ::-1]
+                    matrix[terminals] = missing_code
 
-            seq = list(seq)
-            counter, reverse_counter = 0, -1
+                taxa_number = float(len(aln_obj.taxa_idx))
 
-            while seq[counter] == "-":
-                seq[counter] = aln.sequence_code[1]
-                counter += 1
+                gap_proportion = ((matrix == gap_code).sum(axis=0) /
+                                  taxa_number) * 100.
+                missing_proportion = ((matrix == missing_code).sum(axis=0) /
+                                      taxa_number) * 100.
+                total_missing_proportion = gap_proportion + missing_proportion
 
-            while seq[reverse_counter] == "-":
-                seq[reverse_counter] = aln.sequence_code[1]
-                reverse_counter -= 1
+                matrix = matrix[:, (gap_proportion <= gap_threshold) &
+                                (total_missing_proportion <=
+                                 missing_threshold)]
 
-            temp_cur.execute(
+            temp_cur.executemany(
                 "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
-                (txId, taxon, "".join(seq), aln_idx))
+                ((txId, taxon, seq.tostring(), aln_obj_idx)
+                 for (txId, taxon, _), seq in zip(rows, matrix)))
 
-        # Check if input and output tables are the same. If they are,
-        # drop the old table and replace with this new one
-        if self._table_exists(table_out):
-            self.cur.execute("DROP TABLE [{}]".format(table_out))
-
-        self.cur.execute("ALTER TABLE [{}] "
-                         "RENAME TO [{}]".format(temp_table, table_out))
-
-    def _filter_columns(self, gap_threshold, missing_threshold, table_in,
-                        table_out, ns=None, pbar=None):
-
-        # Create pipes
-        self._set_pipes(ns, pbar, total=self.size)
+            # Update partition size
+            aln_obj.locus_length = matrix.shape[1]
+            self.set_partition_from_alignment(aln_obj)
 
         # Create temporary table
         temp_table = ".filtercolumns"
+        if self._table_exists(temp_table):
+            self.cur.execute("DROP TABLE [{}]".format(temp_table))
         self._create_table(temp_table)
 
-        # Stores the binary lists that will be used to compress the final
-        # sequences
-        filtered_res = {}
+        # Set progress pipes
+        self._set_pipes(ns, pbar, total=len(self.alignments))
+        c = 1
+
+        # Reset _partitions
+        self.partitions = Partitions()
 
-        # Create temporary cursor to edit database while querying
+        # Set temporary cursor to perform database changes while querying
         temp_cur = self.con.cursor()
 
+        # Rows of the alignment that is currently being read
+        aln_rows = []
         aln_obj = None
+        aln_obj_idx = None
 
-        prev_idx = ""
-        for p, (column, aln_idx) in enumerate(self.iter_columns(table_in)):
-
-            # This happes when the alignment changes during the iteration
-            if aln_idx != prev_idx:
+        for txId, taxon, seq, aln_idx in self.iter_alignments(
+                table_in, include_txid=True):
 
-                # Add the binary list from the previous alignment
-                if prev_idx:
-                    filtered_res[prev_idx] = filtered_cols
-                
-                aln_obj = self.alignment_idx[aln_idx]
-                taxa_number = len(aln_obj.taxa_idx)
+            # This happens when the alignment changes during the iteration.
+            if aln_idx != aln_obj_idx:
 
-                # Reset binary list for next alignment
-                filtered_cols = []
+                if aln_rows:
+                    filter_rows(aln_obj, aln_rows)
 
-                prev_idx = aln_idx
+                aln_obj = self.alignment_idx[aln_idx]
+                aln_obj_idx = aln_idx
+                aln_rows = []
 
                 # Update progress
-                self._update_pipes(ns, pbar, value=p + 1, 
-                                   msg="Filtering columns")
-
-            cadd = column.count
-            
-            # Calculating metrics
-            gap_proportion = (float(cadd("-")) /
-                              taxa_number) * float(100)
-            missing_proportion = (float(cadd(aln_obj.sequence_code[1])) /
-                                  taxa_number) * float(100)
-            total_missing_proportion = gap_proportion + missing_proportion
-
-            if gap_proportion <= gap_threshold and \
-                    total_missing_proportion <= missing_threshold:
-
-                filtered_cols.append(1)
-
-            else:
-                filtered_cols.append(0)
-
-        # Add binary list from last alignment
-        if aln_obj:
-            filtered_res[aln_idx] = filtered_cols
-
-        self._set_pipes(ns, pbar, total=len(self.alignments))
-        c = 1
-
-        aln_obj = None
-
-        # Now we compress the sequences with the binary lists from the
-        # previous iteration
-        prev_idx = ""
-        for p, (txId, taxon, seq, aln_idx) in enumerate(
-                self.iter_alignments(table_in, include_txid=True)):
-
-            if prev_idx != aln_idx:
-
-                if prev_idx:
-                    # Update partition size
-                    aln_obj.locus_length = len(final_seq)
-                    self.set_partition_from_alignment(aln_obj)
-
                 self._update_pipes(ns, pbar, value=c,
-                                   msg="Compressing sequences")
+                                   msg="Filtering file {}".format(
+                                       aln_obj.name))
                 c += 1
 
-                aln_obj = self.alignment_idx[aln_idx]
-
-                prev_idx = aln_idx
-
-            final_seq = "".join(compress(seq, filtered_res[aln_idx]))
+            aln_rows.append((txId, taxon, seq))
 
-            temp_cur.execute(
-                "INSERT INTO [{}] VALUES (?, ?, ?, ?)".format(temp_table),
-                (txId, taxon, final_seq, aln_idx))
+        # Filter the last alignment
+        if aln_rows:
+            filter_rows(aln_obj, aln_rows)
 
-        if aln_obj:
-            aln_obj.locus_length = len(final_seq)
-            self.set_partition_from_alignment(aln_obj)
-            
         # Update size
         self.size = sum((x.locus_length for x in self.alignments.values()))
 
-        # Check if input and output tables are the same. If they are,
-        # it means that the output table already exists and is being
-        # updated
+        # If a previous table_out exist, replace with this new one
         if self._table_exists(table_out):
             self.cur.execute("DROP TABLE [{}];".format(table_out))
 
@@ -4761,15 +5385,16 @@ class AlignmentList(Base):
         if use_main_table:
             table_in = table_out = self.master_table
 
-        # Reset _partitions
-        self.partitions = Partitions()
-
-        self._filter_terminals(table_in, table_out, ns)
+        # Terminal gaps are only coded as missing data when the filter is
+        # applied in place. Otherwise, the columns are evaluated and
+        # compressed with the data from `table_in` as is.
+        code_terminals = table_in is not None and table_in == table_out
 
-        self._filter_columns(gap_threshold, missing_threshold,
-                             table_in, table_out, ns)
-
-        self._reset_pipes(ns)
+        self.filter_columns(gap_threshold=gap_threshold,
+                            missing_threshold=missing_threshold,
+                            code_terminals=code_terminals,
+                            table_in=table_in, table_out=table_out, ns=ns,
+                            pbar=pbar)
 
     def filter_segregating_sites(self, min_val, max_val, table_in=None,
                                  ns=None, pbar=None):
@@ -7448,23 +8073,16 @@ class AlignmentList(Base):
             self.summary_stats["avg_var"].append(cur_var)
             self.summary_stats["avg_inf"].append(cur_inf)
 
-            if not any(self.summary_gene_table["genes"] == aln.name):
-                # Get row information for current gene in dict format
-                row_info = (aln.name,
-                            aln.locus_length,
-                            len(aln.taxa_idx),
-                            cur_var,
-                            cur_inf,
-                            cur_gap,
-                            cur_missing)
-                # Create DataFrame from dict
-                row_dt = pd.DataFrame(
-                    [row_info], index=[c],
-                    columns=self.summary_gene_table.columns)
-                # Add row DF to main DF
-                self.summary_gene_table = pd.concat(
-                    [self.summary_gene_table,
-                     row_dt])
+            if aln.name not in table_genes:
+                # Get row information for current gene
+                gene_rows.append((aln.name,
+                                  aln.locus_length,
+                                  len(aln.taxa_idx),
+                                  cur_var,
+                                  cur_inf,
+                                  cur_gap,
+                                  cur_missing))
+                gene_idx.append(c)
 
         # Update active alignments if they changed since last update
         if active_alignments and \
@@ -7492,9 +8110,21 @@ class AlignmentList(Base):
         # Get number of taxa
         self.summary_stats["taxa"] = len(self.taxa_names)
 
-        # Get statistics that require iteration over alignments
+        # Rows of the genes that are not yet in summary_gene_table. These
+        # are added in a single step at the end.
+        table_genes = set(self.summary_gene_table["genes"])
+        gene_rows = []
+        gene_idx = []
+
+        gap_code = ord(self.gap_symbol)
+
+        # Get statistics that require iteration over alignments. Each
+        # block of columns is reduced to a (columns, 256) matrix with the
+        # count of each character per column, from which all statistics
+        # are obtained at once.
         prev_idx = ""
-        for col, aln_idx in self.iter_columns():
+        aln_idx = None
+        for block, aln_idx in self.iter_column_blocks():
 
             self._check_killswitch(ns)
 
@@ -7509,46 +8139,48 @@ class AlignmentList(Base):
                 # Get current alignment
                 aln = self.alignment_idx[aln_idx]
                 self.summary_stats["seq_len"] += aln.locus_length
+                missing_code = ord(aln.sequence_code[1])
 
                 cur_gap, cur_missing = 0, 0
                 cur_var, cur_inf = 0, 0
 
                 prev_idx = aln_idx
 
-                if ns:
-                    if ns.stop:
-                        raise KillByUser("")
-
-            col = Counter(col)
+            counts = count_column_characters(block)
 
             # Get missing data and gaps
-            if aln.sequence_code[1] in col:
-                self.summary_stats["missing"] += 1
-                cur_missing += 1
-            if self.gap_symbol in col:
-                self.summary_stats["gaps"] += 1
-                cur_gap += 1
+            n_missing = int(np.count_nonzero(counts[:, missing_code]))
+            n_gap = int(np.count_nonzero(counts[:, gap_code]))
+            self.summary_stats["missing"] += n_missing
+            self.summary_stats["gaps"] += n_gap
+            cur_missing += n_missing
+            cur_gap += n_gap
 
             # Get variability information
             # Filter missing data
-            for i in [aln.sequence_code[1], self.gap_symbol]:
-                del col[i]
-
-            # If it's only missing data, ignore
-            if col:
-                # Get variable sites
-                if len(col) > 1:
-                    self.summary_stats["variable"] += 1
-                    cur_var += 1
-
-                # If any of the remaining sites is present in more than two
-                # taxa score the site as informative
-                if len([x for x in col.values() if x >= 2]) >= 2:
-                    self.summary_stats["informative"] += 1
-                    cur_inf += 1
+            counts[:, [missing_code, gap_code]] = 0
+
+            # Get variable sites. Columns with only missing data have no
+            # remaining characters and are ignored
+            n_var = int(np.count_nonzero((counts > 0).sum(axis=1) > 1))
+            self.summary_stats["variable"] += n_var
+            cur_var += n_var
+
+            # If any of the remaining sites is present in more than two
+            # taxa score the site as informative
+            n_inf = int(np.count_nonzero((counts >= 2).sum(axis=1) >= 2))
+            self.summary_stats["informative"] += n_inf
+            cur_inf += n_inf
+
         if aln_idx:
             add_data()
 
+        if gene_rows:
+            self.summary_gene_table = pd.concat(
+                [self.summary_gene_table,
+                 pd.DataFrame(gene_rows, index=gene_idx,
+                              columns=self.summary_gene_table.columns)])
+
         # Get average values
         for k in ["avg_gaps", "avg_missing", "avg_var", "avg_inf"]:
             self.summary_stats[k] = round(np.mean(self.summary_stats[k]))
@@ -8256,50 +8888,96 @@ class AlignmentList(Base):
                 "ax_names": ["Taxa", ax_ylabel],
                 "table_header": ["Taxon"] + legend}
 
-    @LookupDatabase
-    def _get_similarity(self, seq1=None, seq2=None, aln_len=None, aln=None):
-        """Gets the similarity between two strings and the effective length.
+    def _get_similarity_matrices(self, aln, ns=None):
+        """Gets the pairwise similarity matrices of an alignment.
 
-        Compares two sequences and calculates the number of similarities.
-        This comparison ignores columns with missing data, so the final
-        sequence length that is actually compared has to be adjusted.
+        Computes the number of similarities and the effective length (the
+        length without missing data and gaps) between all pairs of
+        sequences of an alignment with `pairwise_similarity`. The result is
+        stored in `similarity_cache`, keyed by the content of the alignment,
+        so that it is only calculated once for the same alignment data.
 
         Parameters
         ----------
-        seq1, seq2 : str
-            Sequence strings.
-        aln_len : int
-            Original lenght of `seq1` and `seq2`.
+        aln : trifusion.process.sequence.Alignment
+            `Alignment` object.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
 
         Returns
         -------
-        sim : float
-            Number of pairwise similarities.
-        ef_len : float
-            Effective sequence length, without missing data.
-
-        Notes
-        -----
-        To avoid performing the calculations between identical string pairs,
-        this method is decorated with a class that stores the calculation
-        result of new string pairs in a database, and fetches that result
-        when the same string pair appears later on.
+        taxa : list
+            List of taxa names, in the order of the matrix rows.
+        sim : numpy.array
+            Matrix with the number of pairwise similarities.
+        ef_len : numpy.array
+            Matrix with the pairwise effective sequence length.
         """
 
-        seq1 = np.array(list(seq1))
-        seq2 = np.array(list(seq2))
+        self._check_killswitch(ns)
+
+        taxa, matrix = self._get_column_matrix(aln.master_table, aln.db_idx,
+                                               aln.shelved_taxa)
+        matrix = np.ascontiguousarray(matrix)
+
+        ntaxa = matrix.shape[0]
+        excluded = [aln.sequence_code[1], self.gap_symbol]
+        tri = np.triu_indices(ntaxa, 1)
+
+        key = SimilarityCache.make_key(
+            [SimilarityCache.digest(matrix)], str(matrix.shape), *excluded)
+
+        vals = self.similarity_cache.get_many([key])
+
+        if key in vals:
+            sim_tri, ef_tri = np.split(vals[key], 2)
+            sim = np.zeros((ntaxa, ntaxa))
+            ef_len = np.zeros((ntaxa, ntaxa))
+            sim[tri] = sim_tri
+            ef_len[tri] = ef_tri
+        else:
+            sim, ef_len = pairwise_similarity(matrix, excluded)
+            self.similarity_cache.put_many(
+                [(key, np.concatenate([sim[tri], ef_len[tri]]))])
+
+        return taxa, sim, ef_len
+
+    def _get_taxa_similarity(self, aln, taxa_pos, ns=None):
+        """Gets the pairwise similarity of the taxa pairs of an alignment.
+
+        Parameters
+        ----------
+        aln : trifusion.process.sequence.Alignment
+            `Alignment` object.
+        taxa_pos : dict
+            Maps taxa names to their position in the output. Taxa of the
+            alignment that are absent from `taxa_pos` are ignored.
+        ns : multiprocesssing.Manager.Namespace
+            A Namespace object used to communicate with the main thread
+            in TriFusion.
+
+        Returns
+        -------
+        pos1, pos2 : numpy.array
+            Positions in `taxa_pos` of the taxa of each pair, where
+            `pos1` is always lower than `pos2`.
+        sim : numpy.array
+            Number of similarities of each pair.
+        ef_len : numpy.array
+            Effective sequence length of each pair.
+        """
 
-        ef_len_ = (seq1 != aln.sequence_code[1]) & \
-            (seq1 != self.gap_symbol) & \
-            (seq2 != aln.sequence_code[1]) & \
-            (seq2 != self.gap_symbol)
+        taxa, sim, ef_len = self._get_similarity_matrices(aln, ns)
 
-        sim_ = (seq1 == seq2) & ef_len_
+        rows = np.array([i for i, tx in enumerate(taxa) if tx in taxa_pos],
+                        dtype=int)
+        pos = np.array([taxa_pos[taxa[i]] for i in rows], dtype=int)
 
-        sim = np.count_nonzero(sim_)
-        ef_len = np.count_nonzero(ef_len_)
+        i1, i2 = np.triu_indices(len(rows), 1)
 
-        return float(sim), float(ef_len)
+        return np.minimum(pos[i1], pos[i2]), np.maximum(pos[i1], pos[i2]), \
+            sim[rows[i1], rows[i2]], ef_len[rows[i1], rows[i2]]
 
     @check_data
     def sequence_similarity(self, ns=None):
@@ -8319,7 +8997,7 @@ class AlignmentList(Base):
             "ax_names": 2 element list with axis labels [x, y]
         """
 
-        self._get_similarity("connect")
+        self.similarity_cache.connect()
 
         data = []
 
@@ -8331,23 +9009,16 @@ class AlignmentList(Base):
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            aln_similarities = []
-
-            for seq1, seq2 in itertools.combinations(aln.iter_sequences(), 2):
-
-                self._check_killswitch(ns)
-
-                sim, total_len = self._get_similarity(seq1, seq2,
-                                                      aln.locus_length,
-                                                      aln)
+            _, sim, total_len = self._get_similarity_matrices(aln, ns)
 
-                if total_len:
-                    aln_similarities.append(sim / total_len)
+            tri = np.triu_indices(sim.shape[0], 1)
+            sim, total_len = sim[tri], total_len[tri]
+            valid = total_len > 0
 
-            if aln_similarities:
-                data.append(np.mean(aln_similarities) * 100)
+            if valid.any():
+                data.append(np.mean(sim[valid] / total_len[valid]) * 100)
 
-        self._get_similarity("disconnect")
+        self.similarity_cache.close()
 
         return {"data": data,
                 "ax_names": ["Similarity (%)", "Frequency"]}
@@ -8375,11 +9046,11 @@ class AlignmentList(Base):
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        self._get_similarity("connect")
+        self.similarity_cache.connect()
 
         # Create matrix for parwise comparisons
-        data = [np.empty((len(self.taxa_names), 0)).tolist() for _ in
-                range(len(self.taxa_names))]
+        data = np.zeros((len(self.taxa_names), len(self.taxa_names)))
+        counts = np.zeros(data.shape)
 
         taxa_pos = OrderedDict((x, y) for y, x in enumerate(self.taxa_names))
 
@@ -8388,25 +9059,17 @@ class AlignmentList(Base):
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            for tx1, tx2 in itertools.combinations(taxa_pos.keys(), 2):
-
-                self._check_killswitch(ns)
-
-                try:
-                    seq1, seq2 = aln.get_sequence(tx1), aln.get_sequence(tx2)
-                except KeyError:
-                    continue
+            pos1, pos2, sim, l = self._get_taxa_similarity(aln, taxa_pos, ns)
+            valid = l > 0
 
-                sim, l = self._get_similarity(seq1, seq2, aln.locus_length,
-                                              aln)
-                if l:
-                    data[taxa_pos[tx1]][taxa_pos[tx2]].append(sim / l)
+            data[pos1[valid], pos2[valid]] += sim[valid] / l[valid]
+            counts[pos1[valid], pos2[valid]] += 1
 
-        data = np.array([[np.mean(y) if y else 0. for y in x] for x in data])
+        data = np.where(counts > 0, data / np.maximum(counts, 1), 0.)
         mask = np.tri(data.shape[0], k=0)
         data = np.ma.array(data, mask=mask)
 
-        self._get_similarity("disconnect")
+        self.similarity_cache.close()
 
         return {"data": data,
                 "color_label": "Pairwise sequence similarity",
@@ -8455,29 +9118,24 @@ class AlignmentList(Base):
         
         self._set_pipes(ns, None, total=aln_obj.locus_length, ignore_sa=True)
 
+        _, matrix = self._get_column_matrix(aln_obj.master_table,
+                                            aln_obj.db_idx,
+                                            aln_obj.shelved_taxa)
+        excluded = [aln_obj.sequence_code[1], self.gap_symbol]
+        tri = np.triu_indices(matrix.shape[0], 1)
+
         for i in range(0, aln_obj.locus_length, step):
 
             self._update_pipes(ns, None, value=i)
+            self._check_killswitch(ns)
 
-            window_similarities = []
-
-            seqs = np.array([[y for y in x[i:i + step]] for x in
-                             aln_obj.iter_sequences()])
-
-            for seq1, seq2 in itertools.combinations(seqs, 2):
-
-                self._check_killswitch(ns)
-
-                s, t = self._get_similarity("".join(seq1), "".join(seq2),
-                                            step, aln_obj)
-                if t:
-                    sim = s / t
-                else:
-                    sim = 0
+            s, t = pairwise_similarity(matrix[:, i:i + step], excluded)
+            s, t = s[tri], t[tri]
 
-                window_similarities.append(sim * 100)
+            window_similarities = np.where(
+                t > 0, s / np.maximum(t, 1), 0.) * 100
 
-            if window_similarities:
+            if window_similarities.size:
                 data.append(np.mean(window_similarities))
 
         return {"data": data,
@@ -8586,11 +9244,11 @@ class AlignmentList(Base):
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        self._get_similarity("connect")
+        self.similarity_cache.connect()
 
         # Create matrix for parwise comparisons
-        data = [np.empty((len(self.taxa_names), 0)).tolist() for _ in
-                range(len(self.taxa_names))]
+        data = np.zeros((len(self.taxa_names), len(self.taxa_names)))
+        counts = np.zeros(data.shape)
 
         taxa_pos = OrderedDict((x, y) for y, x in enumerate(self.taxa_names))
 
@@ -8599,29 +9257,16 @@ class AlignmentList(Base):
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            for tx1, tx2 in itertools.combinations(taxa_pos.keys(), 2):
-
-                self._check_killswitch(ns)
-
-                try:
-                    seq1, seq2 = aln.get_sequence(tx1), aln.get_sequence(tx2)
-                except KeyError:
-                    continue
-
-                s, t = self._get_similarity(seq1, seq2, aln.locus_length,
-                                            aln)
-                if t:
-                    aln_diff = t - s
-                else:
-                    aln_diff = 0
+            pos1, pos2, s, t = self._get_taxa_similarity(aln, taxa_pos, ns)
 
-                data[taxa_pos[tx1]][taxa_pos[tx2]].append(aln_diff)
+            data[pos1, pos2] += t - s
+            counts[pos1, pos2] += 1
 
-        data = np.array([[np.mean(y) if y else 0. for y in x] for x in data])
+        data = np.where(counts > 0, data / np.maximum(counts, 1), 0.)
         mask = np.tri(data.shape[0], k=0)
         data = np.ma.array(data, mask=mask)
 
-        self._get_similarity("disconnect")
+        self.similarity_cache.close()
 
         return {"data": data,
                 "labels": list(taxa_pos),
@@ -9294,37 +9939,31 @@ class AlignmentList(Base):
         self._set_pipes(ns, None, total=len(self.alignments))
         c = 1
 
-        self._get_similarity("connect")
+        self.similarity_cache.connect()
 
-        data = OrderedDict((tx, []) for tx in self.taxa_names)
+        taxa_pos = OrderedDict((x, y) for y, x in enumerate(self.taxa_names))
+        sums = np.zeros(len(taxa_pos))
+        counts = np.zeros(len(taxa_pos))
 
         for aln in self.alignments.values():
 
             self._update_pipes(ns, None, value=c)
             c += 1
 
-            for tx1, tx2 in itertools.combinations(data.keys(), 2):
-
-                self._check_killswitch(ns)
-
-                try:
-                    seq1, seq2 = aln.get_sequence(tx1), aln.get_sequence(tx2)
-                except KeyError:
-                    continue
-
-                s, t_len = self._get_similarity(seq1, seq2, aln.locus_length,
-                                                aln)
+            pos1, pos2, s, t_len = self._get_taxa_similarity(aln, taxa_pos,
+                                                             ns)
 
-                if t_len:
-                    s_data = (t_len - s) / t_len
-                else:
-                    s_data = 0
+            s_data = np.where(t_len > 0,
+                              (t_len - s) / np.maximum(t_len, 1), 0.)
 
-                data[tx1].append(s_data)
-                data[tx2].append(s_data)
+            for pos in (pos1, pos2):
+                sums += np.bincount(pos, weights=s_data,
+                                    minlength=len(taxa_pos))
+                counts += np.bincount(pos, minlength=len(taxa_pos))
 
-        for tx, vals in data.items():
-            data[tx] = np.mean(vals)
+        # Taxa without any pair have a NaN mean, as before
+        with np.errstate(invalid="ignore"):
+            data = OrderedDict(zip(taxa_pos, sums / counts))
 
         # Prepara data for plotting
         data_points = []
@@ -9341,7 +9980,7 @@ class AlignmentList(Base):
         # Get outlier taxa
         outlier_labels = list(data_labels[self._mad_based_outlier(data_points)])
 
-        self._get_similarity("disconnect")
+        self.similarity_cache.close()
 
         return {"data": data_points,
                 "title": "Sequence variation outlier taxa detection",
@@ -82,6 +82,23 @@ class LoadAlignmentsTest(unittest.TestCase):
 
         self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db)
 
+    def test_load_fas_processes(self):
+
+        self.aln_obj = AlignmentList(dna_data_fas, sql_db=sql_db)
+        data = [(x, self.aln_obj.alignment_idx[x].name, y, z) for y, z, x in
+                self.aln_obj.iter_alignments()]
+        taxa = self.aln_obj.taxa_names
+        self.aln_obj.clear_alignments()
+
+        self.aln_obj.add_alignment_files(dna_data_fas + bad_no_header,
+                                         processes=2)
+        data_mp = [(x, self.aln_obj.alignment_idx[x].name, y, z) for y, z, x
+                   in self.aln_obj.iter_alignments()]
+
+        self.assertEqual([data, taxa, bad_no_header],
+                         [data_mp, self.aln_obj.taxa_names,
+                          self.aln_obj.bad_alignments])
+
     def test_load_single_fas(self):
 
         single_aln = Alignment(dna_data_fas[0], sql_cursor=self.aln_obj.cur)
@@ -125,6 +142,22 @@ class LoadAlignmentsTest(unittest.TestCase):
 
         self.aln_obj = AlignmentList(dna_data_loci, sql_db=sql_db)
 
+    def test_load_small_insert_batch(self):
+
+        files = dna_data_fas + dna_data_loci
+
+        self.aln_obj = AlignmentList(files, sql_db=sql_db)
+        data = list(self.aln_obj.iter_alignments())
+        self.aln_obj.clear_alignments()
+
+        Alignment.insert_batch_size = 3
+        try:
+            self.aln_obj.add_alignment_files(files)
+        finally:
+            Alignment.insert_batch_size = 1000
+
+        self.assertEqual(data, list(self.aln_obj.iter_alignments()))
+
     def test_load_single_loci(self):
 
         single_aln = Alignment(dna_data_loci[0], sql_cursor=self.aln_obj.cur,
@@ -422,6 +455,22 @@ class AlignmentManipulationTest(unittest.TestCase):
 
         self.assertEqual(len(self.aln_obj.alignments), 1)
 
+    def test_concatenation_with_shelved_alignment(self):
+
+        fl = [x for x in self.aln_obj.alignments][1:]
+        self.aln_obj.update_active_alignments(fl)
+        total_len = sum([x.locus_length for x in
+                         self.aln_obj.alignments.values()])
+
+        self.aln_obj.concatenate()
+
+        aln = self.aln_obj.alignments.values()[0]
+        seqs = [seq for _, seq, _ in self.aln_obj.iter_alignments()]
+
+        self.assertEqual([aln.locus_length, len(seqs)],
+                         [total_len, len(self.aln_obj.taxa_names)])
+        self.assertTrue(all(len(x) == total_len for x in seqs))
+
 
 class LoadBadAlignmentsTest(unittest.TestCase):
 
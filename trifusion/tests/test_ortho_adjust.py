@@ -0,0 +1,78 @@
+#!/usr/bin/python2
+
+import os
+import json
+import shutil
+import unittest
+from os.path import join
+
+try:
+    import orthomcl_pipeline as ortho_pipe
+    from ortho.error_handling import NoUniqueField
+except ImportError:
+    import trifusion.orthomcl_pipeline as ortho_pipe
+    from trifusion.ortho.error_handling import NoUniqueField
+
+temp_dir = ".temp"
+
+
+class AdjustFastaTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(join(temp_dir, "in"))
+        os.makedirs(join(temp_dir, "out", "backstage_files"))
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def write(self, name, headers):
+
+        path = join(temp_dir, "in", name)
+        with open(path, "w") as fh:
+            for h in headers:
+                fh.write(">{}\nMKV\nLLA\n".format(h))
+
+        return path
+
+    def test_unique_field(self):
+
+        f = self.write("a.fas", ["sp|P1|G_HUMAN", "sp|P2|G_HUMAN",
+                                 "sp|P3|H_HUMAN"])
+        self.assertEqual(ortho_pipe.check_unique_field(f), 1)
+
+    def test_unique_field_missing(self):
+
+        # The third field is unique where present, but missing in a header
+        f = self.write("a.fas", ["x|a|1", "x|a|2", "x|a"])
+        self.assertRaises(NoUniqueField, ortho_pipe.check_unique_field, f)
+
+    def test_no_unique_field(self):
+
+        f = self.write("a.fas", ["x|1", "y|1", "x|2", "y|2"])
+        self.assertRaises(NoUniqueField, ortho_pipe.check_unique_field, f)
+
+    def test_adjust_fasta(self):
+
+        files = [self.write("Homo sapiens.fas", ["sp|P1|G", "sp|P2|G"]),
+                 self.write("Mus.fas", ["m1", "m2"]),
+                 self.write("Bad.fas", ["x|1", "x|1"])]
+        dest = join(temp_dir, "out")
+
+        ortho_pipe.adjust_fasta(files, dest)
+
+        cf_dir = join(dest, "backstage_files", "compliantFasta")
+        self.assertEqual(sorted(os.listdir(cf_dir)),
+                         ["Homo_sapiens.fasta", "Mus.fasta"])
+        self.assertEqual(open(join(cf_dir, "Mus.fasta")).read(),
+                         ">Mus|m1\nMKV\nLLA\n>Mus|m2\nMKV\nLLA\n")
+
+        with open(join(dest, "backstage_files", "header_mapping.json")) as fh:
+            self.assertEqual(json.load(fh), {
+                "Homo_sapiens|P1": ">sp|P1|G", "Homo_sapiens|P2": ">sp|P2|G",
+                "Mus|m1": ">m1", "Mus|m2": ">m2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
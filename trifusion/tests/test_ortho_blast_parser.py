@@ -0,0 +1,298 @@
+#!/usr/bin/python2
+
+import os
+import random
+import shutil
+import sqlite3
+import unittest
+from os.path import join
+
+try:
+    from ortho import orthomclInstallSchema as install_sqlite
+    from ortho import orthomclBlastParser as BP
+except ImportError:
+    from trifusion.ortho import orthomclInstallSchema as install_sqlite
+    from trifusion.ortho import orthomclBlastParser as BP
+
+temp_dir = ".temp"
+
+EVALUES = ["0", "0.0", "1e-180", "2.5e-05", "2.50e-5", "3.14e-10", "7e-3",
+           "1.234e-45", "9.99e-100"]
+
+
+def write_fasta_dir(dest, ntaxa, ngenes, seed):
+    """Writes a compliantFasta directory and returns the gene headers"""
+
+    rng = random.Random(seed)
+    os.makedirs(dest)
+    headers = []
+
+    for tx in range(ntaxa):
+        with open(join(dest, "t{}.fasta".format(tx)), "w") as fh:
+            for g in range(ngenes):
+                header = "t{}|{}".format(tx, g)
+                seq = "M" * rng.randint(50, 300)
+                fh.write(">{}\n{}\n{}\n".format(header, seq[:60], seq[60:]))
+                headers.append(header)
+
+    return headers
+
+
+def blast_lines(headers, nqueries, seed):
+    """Tabular blast hits, grouped by query, with several HSPs for some
+    query/subject pairs"""
+
+    rng = random.Random(seed)
+    lines = []
+
+    for query in rng.sample(headers, nqueries):
+        for subject in rng.sample(headers, rng.randint(1, 6)):
+            evalue = rng.choice(EVALUES)
+            for _ in range(rng.randint(1, 3)):
+                start, end = sorted(rng.sample(range(1, 50), 2))
+                lines.append("\t".join(str(x) for x in [
+                    query, subject, round(rng.uniform(30, 100), 1),
+                    end - start + 1, 0, 0, start, end, end, start, evalue,
+                    100]))
+
+    return lines
+
+
+class BlastParserTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.fasta_dir = join(temp_dir, "compliantFasta")
+        self.headers = write_fasta_dir(self.fasta_dir, 3, 30, 1)
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def write_blast(self, lines, name="AllVsAll.out", newline=True):
+
+        path = join(temp_dir, name)
+        with open(path, "w") as fh:
+            fh.write("\n".join(lines) + ("\n" if newline else ""))
+
+        return path
+
+    def parse(self, blast_file, name, **kwargs):
+
+        db_dir = join(temp_dir, name)
+        os.makedirs(db_dir)
+        install_sqlite.execute(db_dir)
+
+        BP.orthomcl_blast_parser(blast_file, self.fasta_dir, db_dir, None,
+                                 **kwargs)
+
+        con = sqlite3.connect(join(db_dir, "orthoDB.db"))
+        rows = con.execute("SELECT * FROM SimilarSequences ORDER BY "
+                           "query_id, subject_id").fetchall()
+        con.close()
+
+        return rows
+
+    def check_shards(self, blast_file, nshards):
+
+        with open(blast_file, "rb") as fh:
+            data = fh.read()
+
+        shards = BP.shard_blast_file(blast_file, nshards)
+
+        # The shards cover the whole file, in order
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], len(data))
+        for (_, end), (start, _) in zip(shards, shards[1:]):
+            self.assertEqual(end, start)
+
+        # Each query has its hits in a single shard
+        queries = [set(x.split()[0] for x in data[start:end].splitlines())
+                   for start, end in shards]
+        for x, y in zip(queries, queries[1:]):
+            self.assertFalse(x & y)
+
+        return shards
+
+    def test_shard_boundaries(self):
+
+        blast_file = self.write_blast(blast_lines(self.headers, 40, 2))
+
+        for nshards in [1, 2, 3, 7, 20, 1000]:
+            shards = self.check_shards(blast_file, nshards)
+            self.assertTrue(len(shards) <= nshards)
+
+        self.assertTrue(len(self.check_shards(blast_file, 7)) > 1)
+
+    def test_shard_single_query(self):
+
+        blast_file = self.write_blast(blast_lines(self.headers, 1, 3))
+
+        self.assertEqual(len(self.check_shards(blast_file, 5)), 1)
+
+    def test_shard_without_trailing_newline(self):
+
+        lines = blast_lines(self.headers, 20, 4)
+        blast_file = self.write_blast(lines, newline=False)
+
+        for nshards in [2, 3, 7]:
+            self.check_shards(blast_file, nshards)
+
+        # The last hit is parsed by both modes
+        rows = self.parse(blast_file, "seq")
+        self.assertEqual(self.parse(blast_file, "multi", processes=3), rows)
+        self.assertIn(tuple(lines[-1].split()[:2]),
+                      [x[:2] for x in rows])
+
+    def test_multiprocess_rows(self):
+
+        blast_file = self.write_blast(blast_lines(self.headers, 60, 5))
+
+        rows = self.parse(blast_file, "seq", processes=1)
+        self.assertTrue(rows)
+        self.assertEqual(self.parse(blast_file, "multi", processes=3), rows)
+
+    def test_duplicate_subject_rows(self):
+
+        # The second hit list of t0|0 against t1|0 is not contiguous with
+        # the first, and yields a second row for the same pair
+        hit = "{}\t{}\t90.0\t40\t0\t0\t1\t40\t1\t40\t{}\t100"
+        lines = [hit.format("t0|0", "t1|0", "1e-50"),
+                 hit.format("t0|0", "t1|1", "2e-30"),
+                 hit.format("t0|0", "t1|0", "3e-10"),
+                 hit.format("t0|1", "t1|0", "0")]
+        blast_file = self.write_blast(lines)
+
+        # Rows inserted one by one, as in the previous parser
+        db_dir = join(temp_dir, "rows")
+        os.makedirs(db_dir)
+        install_sqlite.execute(db_dir)
+        con = sqlite3.connect(join(db_dir, "orthoDB.db"))
+        with con:
+            for row in BP.iter_subject_rows(
+                    lines, BP.get_genes(self.fasta_dir)):
+                con.execute("INSERT OR IGNORE INTO SimilarSequences "
+                            "VALUES(?, ?, ?, ?, ?, ?, ?, ?)", row)
+        reference = con.execute("SELECT * FROM SimilarSequences ORDER BY "
+                                "query_id, subject_id").fetchall()
+        con.close()
+
+        self.assertEqual(len(reference), 3)
+        self.assertEqual(reference[0][4:6], (1., -50))
+
+        batch_size = BP.BATCH_SIZE
+        try:
+            for i, size in enumerate([1, 2, batch_size]):
+                BP.BATCH_SIZE = size
+                self.assertEqual(self.parse(blast_file, str(i)), reference)
+        finally:
+            BP.BATCH_SIZE = batch_size
+
+
+class GeneIndexTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.fasta_dir = join(temp_dir, "compliantFasta")
+        self.headers = write_fasta_dir(self.fasta_dir, 3, 30, 1)
+        self.index_file = join(temp_dir, "gene_index")
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def save_decoy(self):
+        """Saves an index with a single gene and the signature of the
+        current fasta files, which get_genes returns if it is reused"""
+
+        decoy = BP.GeneIndex()
+        decoy.add("decoy", decoy.add_taxon("decoy"), 1)
+        files = BP.get_fasta_files(self.fasta_dir)
+        BP.save_gene_index(self.index_file, BP.get_files_signature(
+            self.fasta_dir, files), decoy)
+
+    def test_round_trip(self):
+
+        genes = BP.get_genes(self.fasta_dir)
+        BP.get_genes(self.fasta_dir, self.index_file)
+
+        files = BP.get_fasta_files(self.fasta_dir)
+        loaded = BP.load_gene_index(self.index_file, BP.get_files_signature(
+            self.fasta_dir, files))
+
+        self.assertEqual(len(loaded), len(genes))
+        self.assertEqual(len(loaded), len(self.headers))
+        for header in self.headers:
+            self.assertEqual(loaded[header], genes[header])
+            self.assertEqual(loaded[header][BP.VAR_TAXON],
+                             header.split("|")[0])
+
+    def test_reuse(self):
+
+        self.save_decoy()
+        self.assertEqual(len(BP.get_genes(self.fasta_dir, self.index_file)),
+                         1)
+
+    def test_rebuild_size(self):
+
+        self.save_decoy()
+        with open(join(self.fasta_dir, "t0.fasta"), "a") as fh:
+            fh.write(">t0|new\nMKV\n")
+
+        genes = BP.get_genes(self.fasta_dir, self.index_file)
+        self.assertEqual(len(genes), len(self.headers) + 1)
+        self.assertEqual(genes["t0|new"], (3, "t0"))
+
+        # The new index is saved and reused
+        self.assertEqual(len(BP.get_genes(self.fasta_dir, self.index_file)),
+                         len(self.headers) + 1)
+
+    def test_rebuild_mtime(self):
+
+        self.save_decoy()
+        st = os.stat(join(self.fasta_dir, "t1.fasta"))
+        os.utime(join(self.fasta_dir, "t1.fasta"),
+                 (st.st_atime, st.st_mtime - 100))
+
+        self.assertEqual(len(BP.get_genes(self.fasta_dir, self.index_file)),
+                         len(self.headers))
+
+    def test_rebuild_new_file(self):
+
+        self.save_decoy()
+        with open(join(self.fasta_dir, "t9.fasta"), "w") as fh:
+            fh.write(">t9|0\nMKVL\n")
+
+        genes = BP.get_genes(self.fasta_dir, self.index_file)
+        self.assertEqual(len(genes), len(self.headers) + 1)
+        self.assertEqual(genes["t9|0"], (4, "t9"))
+
+
+class EvalueTest(unittest.TestCase):
+
+    def test_parse_evalue(self):
+
+        for evalue, res in [("0", (0, 0)),
+                            ("0.0", (0, 1)),
+                            ("1e-180", (1, -180)),
+                            ("1E-180", (1, -180)),
+                            ("2.5e-05", (2.5, -5)),
+                            ("2.50e-5", (2.5, -5)),
+                            ("3.14e-10", (3.14, -10)),
+                            ("1.234e-45", (1.23, -45)),
+                            ("9.999e-10", (1, -9)),
+                            ("0.00012", (1.2, -4)),
+                            ("123", (1.23, 2)),
+                            ("1e+5", (1, 5))]:
+            self.assertEqual(list(BP.format_evalue(evalue)), list(res))
+            self.assertEqual(list(BP.parse_evalue(evalue)), list(res))
+
+        # Any other e-value is parsed as by format_evalue
+        for evalue in EVALUES + ["1.2345e-7", "99.95", ".5e-3", "00.0100e-2",
+                                 "4.000e-8", "6.66666"]:
+            self.assertEqual(list(BP.parse_evalue(evalue)),
+                             list(BP.format_evalue(evalue)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import unittest
+from os.path import join
+
+try:
+    from ortho.orthomclFilterFasta import orthomcl_filter_fasta
+except ImportError:
+    from trifusion.ortho.orthomclFilterFasta import orthomcl_filter_fasta
+
+temp_dir = ".temp"
+
+
+class FilterFastaTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(join(temp_dir, "in"))
+        os.makedirs(join(temp_dir, "out", "backstage_files"))
+
+        with open(join(temp_dir, "in", "a.fasta"), "w") as fh:
+            # Good sequence split across lines
+            fh.write(">a|1\nMKVLLA\nMKVLLA\r\n")
+            # Too short
+            fh.write(">a|2\nMKV\n")
+            # 2 stops in 10 residues
+            fh.write(">a|3\nMKVL**MKVL\n")
+            # Good, without a trailing newline
+            fh.write(">a|4\nMKVLLAMKVL")
+
+        with open(join(temp_dir, "in", "b.fasta"), "w") as fh:
+            fh.write(">b|1\nMKVLLAMKV*\n")
+
+        # Hidden files are ignored
+        with open(join(temp_dir, "in", ".c.fasta"), "w") as fh:
+            fh.write(">c|1\nMKVLLAMKVL\n")
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def read(self, name):
+
+        with open(join(temp_dir, "out", "backstage_files", name)) as fh:
+            return sorted(fh.read().split(">")[1:])
+
+    def filter(self, processes):
+
+        return orthomcl_filter_fasta(join(temp_dir, "in"), 5, 15,
+                                     "goodProteins.fasta",
+                                     join(temp_dir, "out"),
+                                     processes=processes)
+
+    def check(self, processes):
+
+        report = self.filter(processes)
+
+        self.assertEqual(report, [["a.fasta", 50.]])
+        self.assertEqual(self.read("goodProteins.fasta"),
+                         ["a|1\nMKVLLAMKVLLA\n", "a|4\nMKVLLAMKVL\n",
+                          "b|1\nMKVLLAMKV\n"])
+        self.assertEqual(self.read("poorProteins.txt"),
+                         ["a|2\nMKV\n", "a|3\nMKVLMKVL\n"])
+
+    def test_filter(self):
+
+        self.check(1)
+
+    def test_filter_pool(self):
+
+        self.check(2)
+
+
+if __name__ == "__main__":
+    unittest.main()
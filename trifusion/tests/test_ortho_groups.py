@@ -0,0 +1,253 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import sqlite3
+import unittest
+from os.path import join
+
+try:
+    from ortho import OrthomclToolbox as OT
+except ImportError:
+    from trifusion.ortho import OrthomclToolbox as OT
+
+temp_dir = ".temp"
+
+
+class RetrieveSequencesTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(temp_dir)
+
+        self.protein_db = join(temp_dir, "goodProteins")
+        self.sqldb = join(temp_dir, "group.db")
+
+        with open(self.protein_db, "w") as fh:
+            fh.write(">A|1\nMKV\nLLA\n>B|1\nMKK\n>A|2\nMAA\r\n>C|1\nMCC")
+
+        groups_file = join(temp_dir, "groups.txt")
+        with open(groups_file, "w") as fh:
+            fh.write("g1: A|1 B|1 C|1\n")
+            # Fails the gene copy filter
+            fh.write("g2: A|1 A|2 B|1\n")
+            # Has a sequence missing from the protein database
+            fh.write("g3: A|2 B|1 D|1\n")
+
+        self.group = OT.GroupLight(groups_file, 1, 2)
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def read(self, *path):
+
+        with open(join(temp_dir, *path)) as fh:
+            return fh.read()
+
+    def test_retrieve_clusters(self):
+
+        self.group.retrieve_sequences(self.sqldb, self.protein_db,
+                                      join(temp_dir, "out"))
+
+        self.assertEqual(sorted(os.listdir(join(temp_dir, "out"))),
+                         ["g1.fas", "g3.fas", "header_correspondance"])
+        self.assertEqual(self.read("out", "g1.fas"),
+                         ">A\nMKVLLA\n>B\nMKK\n>C\nMCC\n")
+        self.assertEqual(self.read("out", "g3.fas"), ">A\nMAA\n>B\nMKK\n")
+        self.assertEqual(
+            self.read("out", "header_correspondance", "g1_headerMap.csv"),
+            "A|1; A\nB|1; B\nC|1; C\n")
+
+    def test_retrieve_outfile(self):
+
+        self.group.retrieve_sequences(self.sqldb, self.protein_db, temp_dir,
+                                      outfile="query.fas")
+
+        self.assertEqual(self.read("query.fas"),
+                         ">A|1\nMKVLLA\n>B|1\nMKK\n>C|1\nMCC\n"
+                         ">A|2\nMAA\n>B|1\nMKK\n")
+
+    def test_index_reuse(self):
+
+        table = OT.create_sequence_index(self.sqldb, self.protein_db)
+
+        # The index is not built again for the same protein database
+        con = sqlite3.connect(self.sqldb)
+        con.execute("DELETE FROM [{}] WHERE seq_id = 'C|1'".format(table))
+        con.commit()
+        OT.create_sequence_index(self.sqldb, self.protein_db)
+        self.assertFalse(con.execute("SELECT * FROM [{}] WHERE seq_id = "
+                                     "'C|1'".format(table)).fetchall())
+
+        # But it is when the protein database changes
+        with open(self.protein_db, "a") as fh:
+            fh.write("\n>D|1\nMDD\n")
+        OT.create_sequence_index(self.sqldb, self.protein_db)
+        self.assertEqual(con.execute("SELECT COUNT(*) FROM [{}]".format(
+            table)).fetchone()[0], 5)
+        con.close()
+
+        self.group.retrieve_sequences(self.sqldb, self.protein_db,
+                                      join(temp_dir, "out"))
+        self.assertEqual(self.read("out", "g3.fas"),
+                         ">A\nMAA\n>B\nMKK\n>D\nMDD\n")
+
+
+class GroupStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(temp_dir)
+
+        groups_file = join(temp_dir, "groups.txt")
+        with open(groups_file, "w") as fh:
+            fh.write("g1: A|1 B|1 C|1\n")
+            fh.write("g2: A|2 A|3 B|2\n")
+            fh.write("g3: A|4 B|3 C|2 D|1\n")
+            fh.write("g4: D|2 D|3 D|4\n")
+
+        self.group = OT.GroupLight(groups_file, 1, 3)
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def test_statistics(self):
+
+        self.assertEqual(sorted(self.group.species_list),
+                         ["A", "B", "C", "D"])
+        self.assertEqual(self.group.max_extra_copy, 3)
+        self.assertEqual(self.group.basic_group_statistics(),
+                         (4, 13, 2, 2, 2))
+
+    def test_exclude_taxa(self):
+
+        self.group.exclude_taxa(["D"], True)
+
+        # g4 has no sequences left
+        self.assertEqual(self.group.all_clusters, 3)
+        self.assertEqual(sorted(self.group.species_list), ["A", "B", "C"])
+        self.assertEqual(list(self.group._get_compliance()),
+                         [True, False, True, False])
+
+        self.group.update_filters(2, 2, True)
+        self.assertEqual(self.group.basic_group_statistics(False),
+                         (4, 13, 3, 3, 3))
+
+    def test_filter_summary(self):
+
+        # The counts read from the cumulative histogram match those of the
+        # compliance of each cluster
+        for excluded in [[], ["D"], ["A", "B"]]:
+            self.group.exclude_taxa(excluded)
+            for gn, sp in [(1, 1), (1, 3), (2, 2), (3, 4), (5, 5), (None, 2),
+                           (2, None), (0, 2), (1, 0.5)]:
+                self.group.update_filters(gn, sp, True)
+                n_taxa, copies = self.group._cluster_stats()
+                gene_ok, sp_ok = self.group._filter_masks(n_taxa, copies)
+                self.assertEqual(self.group.all_compliant,
+                                 sum(gene_ok & sp_ok & (n_taxa > 0)))
+                self.assertEqual(self.group.all_compliant,
+                                 sum(self.group._get_compliance()) if
+                                 gn and sp else 0)
+                if gn != 0:
+                    self.assertEqual(self.group.num_gene_compliant,
+                                     sum(gene_ok & (n_taxa > 0)))
+                    self.assertEqual(self.group.num_species_compliant,
+                                     sum(sp_ok & (n_taxa > 0)))
+
+    def test_bar_plots(self):
+
+        data = self.group.bar_genecopy_distribution()
+        self.assertEqual((data["labels"], data["data"]),
+                         (["1", "2", "3"], [[2, 1, 1]]))
+
+        data = self.group.bar_species_distribution(True)
+        self.assertEqual((data["labels"], data["data"]),
+                         (["3", "4"], [[1, 1]]))
+
+        data = self.group.bar_species_coverage()
+        self.assertEqual(sorted(zip(data["labels"], *data["data"])),
+                         [("A", 3, 1), ("B", 3, 1), ("C", 2, 2),
+                          ("D", 2, 2)])
+
+        data = self.group.bar_genecopy_per_species()
+        self.assertEqual((data["labels"], data["data"]),
+                         (["D", "A"], [[3, 2]]))
+        self.assertEqual(self.group.bar_genecopy_per_species(True),
+                         {"data": None})
+
+
+class MultiGroupsLightTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(join(temp_dir, "store"))
+
+        self.files = []
+        for i, lines in enumerate([["g1: A|1 B|1 C|1", "g2: A|2 A|3 B|2"],
+                                   ["g1: A|1 B|1", "g2: A|2 C|1 C|2"]]):
+            self.files.append(join(temp_dir, "groups{}.txt".format(i)))
+            with open(self.files[-1], "w") as fh:
+                fh.write("\n".join(lines) + "\n")
+
+        self.groups = OT.MultiGroupsLight(join(temp_dir, "store"),
+                                          self.files)
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def test_store(self):
+
+        store = join(temp_dir, "store")
+
+        # The group store, and a counts and three summary numpy files per
+        # group
+        self.assertEqual(len(os.listdir(store)), 9)
+
+        self.groups.update_filters(1, 2, [])
+        self.assertEqual(
+            [self.groups.groups_stats[os.path.abspath(x)]["stats"]
+             for x in self.files], [(2, 6, 1, 2, 1), (2, 5, 1, 2, 1)])
+
+        group = self.groups.get_group(os.path.abspath(self.files[0]))
+        self.assertEqual(group.all_compliant, 1)
+        # The counts matrix and the filter summary are loaded from their
+        # files when needed
+        self.assertTrue(group._species_counts is None)
+        self.assertTrue(group._summary is None)
+        self.assertEqual(group.species_counts.shape, (2, 3))
+
+        # Filters are updated from the histogram alone
+        group.update_filters(2, 2, True)
+        self.assertEqual(group._summary[1:3], [None, None])
+        self.assertEqual(group.all_compliant, 2)
+        self.assertEqual(len(group._filter_summary()[0]), 2)
+
+        # The summary files are only written when the excluded taxa change
+        gpath = self.groups.groups[os.path.abspath(self.files[1])]
+        os.utime(gpath + "_hist.npy", (1000, 1000))
+        self.groups.update_filters(1, 3, [])
+        self.assertEqual(os.path.getmtime(gpath + "_hist.npy"), 1000)
+
+        self.groups.update_filters(1, 2, ["C"])
+        self.assertNotEqual(os.path.getmtime(gpath + "_hist.npy"), 1000)
+        self.assertEqual(
+            self.groups.groups_stats[os.path.abspath(self.files[1])]["stats"],
+            (2, 5, 2, 1, 1))
+        self.assertEqual(
+            self.groups.get_group(os.path.abspath(self.files[1])).excluded_taxa,
+            ["C"])
+
+        self.groups.remove_group(os.path.abspath(self.files[0]))
+        self.assertEqual(len(os.listdir(store)), 5)
+        self.groups.clear_groups()
+        self.assertEqual(os.listdir(store), ["groups_store.db"])
+        con = sqlite3.connect(join(store, "groups_store.db"))
+        self.assertEqual(con.execute("SELECT * FROM groups").fetchall(), [])
+        con.close()
+
+if __name__ == "__main__":
+    unittest.main()
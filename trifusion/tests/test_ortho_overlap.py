@@ -0,0 +1,73 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import unittest
+from os.path import join
+
+import numpy as np
+
+try:
+    from ortho import OrthomclToolbox as OT
+    from ortho.group_overlap import OverlapEngine
+except ImportError:
+    from trifusion.ortho import OrthomclToolbox as OT
+    from trifusion.ortho.group_overlap import OverlapEngine
+
+temp_dir = ".temp"
+
+
+class GroupOverlapTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(temp_dir)
+
+        self.files = []
+        for i, lines in enumerate([
+                ["c1: x|1 x|2 y|1", "c2: y|2 z|1", "c3: z|2"],
+                ["d1: x|2 x|1 y|1", "d2: y|2", "d3: z|1 z|2", "d4: w|1"],
+                ["e1: x|1 x|2 y|1", "e2: y|2 z|1", "e3: z|2"]]):
+            self.files.append(join(temp_dir, "groups{}.txt".format(i)))
+            with open(self.files[-1], "w") as fh:
+                fh.write("\n".join(lines) + "\n")
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def test_compare(self):
+
+        engine = OverlapEngine()
+        for f in self.files:
+            engine.add_group_file(f, f)
+
+        self.assertEqual(engine.nseqs, 7)
+        self.assertEqual(list(engine.clusterings[self.files[1]].cluster(0)),
+                         [0, 1, 2])
+
+        # The pairs of shared sequences clustered together are those of
+        # c1/d1 (3), out of the 4 pairs of each clustering
+        self.assertEqual(engine.compare(*self.files[:2]),
+                         {"clusters": (3, 4), "shared": 1, "unique": (2, 3),
+                          "overlapping": (3, 3), "jaccard": .6})
+
+        res = engine.compare(self.files[0], self.files[2])
+        self.assertEqual((res["shared"], res["jaccard"]), (3, 1.))
+
+        np.testing.assert_allclose(
+            engine.overlap_matrix(stat="shared"),
+            [[3, 1, 3], [1, 4, 1], [3, 1, 3]])
+
+    def test_multigroups(self):
+
+        groups = OT.MultiGroups(self.files[:2])
+        light_groups = OT.MultiGroupsLight(temp_dir, self.files[:2])
+
+        for res in [groups.group_overlap(), light_groups.group_overlap()]:
+            self.assertEqual(len(res), 1)
+            self.assertEqual(res.values()[0]["shared"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
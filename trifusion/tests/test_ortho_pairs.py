@@ -0,0 +1,129 @@
+#!/usr/bin/python2
+
+import os
+import random
+import shutil
+import sqlite3
+import unittest
+from os.path import join
+
+try:
+    from ortho import orthomclInstallSchema as install_sqlite
+    from ortho import orthomclPairs as make_pairs_sqlite
+    from ortho import orthomclPairsArray as make_pairs_array
+    from ortho import orthomclDumpPairsFiles as dump_pairs_sqlite
+    from process.error_handling import KillByUser
+except ImportError:
+    from trifusion.ortho import orthomclInstallSchema as install_sqlite
+    from trifusion.ortho import orthomclPairs as make_pairs_sqlite
+    from trifusion.ortho import orthomclPairsArray as make_pairs_array
+    from trifusion.ortho import orthomclDumpPairsFiles as dump_pairs_sqlite
+    from trifusion.process.error_handling import KillByUser
+
+temp_dir = ".temp"
+
+# Execution modes of the SQL engine, compared with the array engine
+SQL_MODES = ["default", "tuned", "memory"]
+
+
+def similar_sequences(nfamilies, ntaxa, seed):
+    """Rows of all-vs-all hits within gene families, including e-values of
+    0 and families present in a single taxon"""
+
+    rng = random.Random(seed)
+    rows = []
+
+    for fam in range(nfamilies):
+        genes = [("tx{}|f{}_{}".format(tx, fam, copy), "tx{}".format(tx))
+                 for tx in range(ntaxa)
+                 for copy in range(rng.choice([0, 1, 1, 2, 3]))]
+
+        for query, query_tx in genes:
+            for subject, subject_tx in genes:
+                if query != subject or rng.random() < .5:
+                    mant = rng.choice([0, round(rng.uniform(1, 9.99), 2)])
+                    exp = 0 if mant == 0 else -rng.randint(1, 60)
+                    rows.append((query, subject, query_tx, subject_tx, mant,
+                                 exp, round(rng.uniform(30, 100), 1),
+                                 round(rng.uniform(30, 100), 1)))
+
+    return rows
+
+
+class OrthoPairsEnginesTest(unittest.TestCase):
+
+    def load(self, rows):
+
+        for engine in SQL_MODES + ["array"]:
+            db_dir = join(temp_dir, engine)
+            os.makedirs(join(db_dir, "backstage_files"))
+
+            install_sqlite.execute(db_dir)
+            con = sqlite3.connect(join(db_dir, "orthoDB.db"))
+            with con:
+                con.executemany("INSERT INTO SimilarSequences VALUES "
+                                "(?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            con.close()
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def pair_files(self):
+
+        for mode in SQL_MODES:
+            make_pairs_sqlite.execute(join(temp_dir, mode), mode=mode)
+        make_pairs_array.execute(join(temp_dir, "array"))
+
+        res = {}
+        for engine in SQL_MODES + ["array"]:
+            db_dir = join(temp_dir, engine)
+            dump_pairs_sqlite.execute(db_dir, db_dir)
+            res[engine] = [open(join(db_dir, "backstage_files", x)).read()
+                           for x in ["orthologs.txt", "inparalogs.txt",
+                                     "coorthologs.txt", "mclInput"]]
+
+        for engine in SQL_MODES[1:] + ["array"]:
+            self.assertEqual(res[engine], res["default"])
+
+        return res["default"]
+
+    def test_array_engine_pair_files(self):
+
+        self.load(similar_sequences(300, 5, 1))
+        res = self.pair_files()
+
+        # The test data must produce pairs of every type
+        self.assertTrue(all(res))
+
+    def test_array_engine_without_orthologs(self):
+
+        # With a single taxon, no in-paralog pair contains an ortholog
+        self.load(similar_sequences(100, 1, 2))
+        orthologs, inparalogs, _, mcl_input = self.pair_files()
+
+        self.assertFalse(orthologs)
+        self.assertTrue(inparalogs)
+        self.assertNotIn("inf", inparalogs + mcl_input)
+
+    def test_tuned_mode_interrupted(self):
+
+        class Namespace(object):
+            stop = True
+
+        self.load(similar_sequences(10, 3, 3))
+        db_dir = join(temp_dir, "tuned")
+
+        self.assertRaises(KillByUser, make_pairs_sqlite.execute, db_dir,
+                          Namespace(), "tuned")
+
+        # The journal mode is restored and the connection closed
+        self.assertFalse(os.path.exists(join(db_dir, "orthoDB.db-wal")))
+        con = sqlite3.connect(join(db_dir, "orthoDB.db"))
+        self.assertEqual(con.execute("PRAGMA journal_mode").fetchone()[0],
+                         "delete")
+        con.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
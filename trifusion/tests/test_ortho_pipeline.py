@@ -0,0 +1,129 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import time
+import unittest
+from os.path import join
+
+try:
+    import orthomcl_pipeline as pipeline
+    from process.error_handling import KillByUser
+except ImportError:
+    from trifusion import orthomcl_pipeline as pipeline
+    from trifusion.process.error_handling import KillByUser
+
+temp_dir = ".temp"
+
+
+class Namespace(object):
+    """Namespace that records the values of subp and sets the kill switch
+    once `stop_after` commands are running"""
+
+    def __init__(self, stop_after=None):
+
+        self.stop = False
+        self.stop_after = stop_after
+        self.subp_values = []
+
+    @property
+    def subp(self):
+        return self.subp_values[-1] if self.subp_values else None
+
+    @subp.setter
+    def subp(self, value):
+
+        self.subp_values.append(value)
+        if value and self.stop_after and len(value) >= self.stop_after:
+            self.stop = True
+
+
+def delayed_square(x, delay):
+
+    time.sleep(delay)
+    return x * x
+
+
+def is_running(pid):
+
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    return True
+
+
+class RunCommandsTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(temp_dir)
+        self.log = join(temp_dir, "log")
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def command(self, delay):
+
+        return ["sh", "-c", "echo start >> {0}; sleep {1}; "
+                            "echo end >> {0}".format(self.log, delay)]
+
+    def test_max_processes(self):
+
+        nm = Namespace()
+        pipeline.run_commands([self.command(.3) for _ in range(5)], 2, nm)
+
+        # Number of commands running at the same time
+        running = [0]
+        with open(self.log) as fh:
+            for line in fh:
+                running.append(running[-1] + (1 if line.strip() == "start"
+                                              else -1))
+        self.assertEqual(len(running), 11)
+        self.assertEqual(max(running), 2)
+
+        # nm.subp lists the pids of the running commands
+        pids = nm.subp_values[:-1]
+        self.assertTrue(all(0 < len(x) <= 2 for x in pids))
+        self.assertEqual(len(set(y for x in pids for y in x)), 5)
+        self.assertEqual(nm.subp, None)
+
+    def test_kill_switch(self):
+
+        nm = Namespace(stop_after=2)
+
+        self.assertRaises(KillByUser, pipeline.run_commands,
+                          [["sleep", "30"] for _ in range(4)], 2, nm)
+
+        # No more commands were started, and the running ones were killed
+        started = set(y for x in nm.subp_values if x for y in x)
+        self.assertEqual(len(started), 2)
+        self.assertFalse(any(is_running(x) for x in started))
+        self.assertEqual(nm.subp, None)
+
+
+class MapJobsTest(unittest.TestCase):
+
+    def test_order(self):
+
+        nm = Namespace()
+        # The first jobs finish last
+        args = [(x, .05 * (5 - x)) for x in range(6)]
+
+        self.assertEqual(pipeline.map_jobs(delayed_square, args, 3, nm),
+                         [x * x for x in range(6)])
+        self.assertEqual((nm.total, nm.counter), (6, 6))
+
+    def test_kill_switch(self):
+
+        nm = Namespace()
+        nm.stop = True
+
+        self.assertRaises(KillByUser, pipeline.map_jobs, delayed_square,
+                          [(x, 5) for x in range(3)], 3, nm)
+
+
+if __name__ == "__main__":
+    unittest.main()
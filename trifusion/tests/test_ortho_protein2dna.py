@@ -0,0 +1,54 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import unittest
+from os.path import join
+
+try:
+    from ortho import protein2dna
+except ImportError:
+    from trifusion.ortho import protein2dna
+
+temp_dir = ".temp"
+
+
+class TranslateTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(temp_dir)
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def test_translate(self):
+
+        # Stop, missing data and ambiguous codons are left out, gaps are
+        # removed and the incomplete last codon is ignored
+        self.assertEqual(protein2dna.translate("ATGaaaTAGnnnRCTgc-tTTTG"),
+                         "MKAF")
+        self.assertEqual(protein2dna.translate(""), "")
+        self.assertEqual(protein2dna.translate("AT"), "")
+
+        for codon, aa in protein2dna.dna_map.items():
+            self.assertEqual(protein2dna.translate(codon.lower()), aa)
+
+    def test_create_db(self):
+
+        cds_file = join(temp_dir, "cds.fas")
+        with open(cds_file, "w") as fh:
+            fh.write(">c1 gene1\nATGAAA\nTTT\n>c2\n>c3 gene3\nTGGNNN\nTGT")
+
+        id_dic = protein2dna.create_db([cds_file], temp_dir)
+
+        # The last record is also translated
+        self.assertEqual(id_dic, {"c1;;gene1": "ATGAAATTT",
+                                  "c3;;gene3": "TGGNNNTGT"})
+        with open(join(temp_dir, "transcripts.fas")) as fh:
+            self.assertEqual(fh.read(), ">c1;;gene1\nMKF\n>c3;;gene3\nWC\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/python2
+
+import os
+import shutil
+import unittest
+from os.path import join
+
+try:
+    from ortho.stage_manifest import StageManifest
+    import orthomcl_pipeline
+except ImportError:
+    from trifusion.ortho.stage_manifest import StageManifest
+    from trifusion import orthomcl_pipeline
+
+temp_dir = ".temp"
+
+
+class StageManifestTest(unittest.TestCase):
+
+    def setUp(self):
+
+        os.makedirs(temp_dir)
+        self.manifest = join(temp_dir, "stage_manifest.json")
+        self.db = join(temp_dir, "db")
+        self.calls = []
+
+    def tearDown(self):
+
+        shutil.rmtree(temp_dir)
+
+    def write(self, name, path, mode="w"):
+
+        self.calls.append(name)
+        with open(path, mode) as fh:
+            fh.write(name)
+
+    def get_stages(self, value=1, resume=True):
+        """Four stages: `parse` creates a database, `pairs` updates it,
+        `dump` writes a file from it and `mcl` writes a file from the dump,
+        depending on a parameter"""
+
+        stages = StageManifest(self.manifest, resume=resume)
+        stages.add_stage("parse", self.write, ["parse", self.db],
+                         outputs=[self.db])
+        stages.add_stage("pairs", self.write, ["pairs", self.db, "a"],
+                         deps=["parse"], outputs=[self.db])
+        stages.add_stage("dump", self.write, ["dump", join(temp_dir, "dump")],
+                         deps=["pairs"], outputs=[join(temp_dir, "dump")])
+        stages.add_stage("mcl", self.write, ["mcl", join(temp_dir, "mcl")],
+                         deps=["dump"], params=value,
+                         outputs=[join(temp_dir, "mcl")])
+
+        return stages
+
+    def test_first_run(self):
+
+        self.get_stages().run()
+        self.assertEqual(self.calls, ["parse", "pairs", "dump", "mcl"])
+
+    def test_skip_completed(self):
+
+        self.get_stages().run()
+        self.calls = []
+
+        skipped = []
+        self.get_stages().run(
+            callback=lambda x, y: skipped.append(x) if y == "skip" else None)
+
+        self.assertEqual([self.calls, skipped], [[], ["mcl"]])
+
+    def test_changed_param_runs_downstream_only(self):
+
+        self.get_stages().run()
+        # The database is no longer needed when only mcl must run
+        os.remove(self.db)
+        self.calls = []
+
+        self.get_stages(value=2).run()
+        self.assertEqual(self.calls, ["mcl"])
+
+    def test_interrupted_in_place_stage(self):
+
+        def fail(*args):
+            raise KeyboardInterrupt
+
+        stages = self.get_stages()
+        stages.stages["pairs"]["func"] = fail
+        self.assertRaises(KeyboardInterrupt, stages.run)
+        self.calls = []
+
+        # The database was modified by the interrupted stage, so it must
+        # be created again
+        self.get_stages().run()
+        self.assertEqual(self.calls, ["parse", "pairs", "dump", "mcl"])
+
+    def test_missing_output(self):
+
+        self.get_stages().run()
+        os.remove(join(temp_dir, "mcl"))
+        self.calls = []
+
+        self.get_stages().run()
+        self.assertEqual(self.calls, ["mcl"])
+
+    def test_restart(self):
+
+        self.get_stages().run()
+        self.calls = []
+
+        self.get_stages(resume=False).run()
+        self.assertEqual(self.calls, ["parse", "pairs", "dump", "mcl"])
+
+    def test_pairs_options(self):
+
+        def keys(pairs_options):
+            stages = orthomcl_pipeline.orthology_stages(
+                None, temp_dir, temp_dir, 10, 20, "goodProteins_db", 1e-5, 1,
+                "AllVsAll.out", "usearch", "mcl", ["1.5"], "MyGroup", 0,
+                "groups", 1, 1, "group.db", temp_dir,
+                pairs_options=pairs_options)
+            return [stages.stage_key(x) for x in ["parse", "pairs", "mcl"]]
+
+        default = keys(None)
+        self.assertEqual(keys({"engine": "sql", "report_timings": True}),
+                         default)
+
+        # Changing the pairs engine invalidates the pairs stage and the
+        # following ones
+        array = keys({"engine": "array"})
+        self.assertEqual(array[0], default[0])
+        self.assertNotEqual(array[1], default[1])
+        self.assertNotEqual(array[2], default[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
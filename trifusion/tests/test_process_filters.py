@@ -91,6 +91,27 @@ class AlignmentMissingFiltersTest(unittest.TestCase):
 
         self.assertEqual(s, [0, 19])
 
+    def test_fused_codon_missing_filter(self):
+
+        self.aln_obj.add_alignment_files(
+            ["trifusion/tests/data/missing_data.phy",
+             "trifusion/tests/data/missing_data2.phy"]
+        )
+
+        self.aln_obj.filter_codon_positions([True, True, False],
+                                            table_in="seq", table_out="seq")
+        self.aln_obj.filter_missing_data(25, 50, table_in="seq",
+                                         table_out="seq")
+        seq_res = sorted(self.aln_obj.iter_alignments("seq"))
+
+        self.aln_obj.filter_columns(codon_positions=[True, True, False],
+                                    gap_threshold=25, missing_threshold=50,
+                                    table_in="fused", table_out="fused")
+        fused_res = sorted(self.aln_obj.iter_alignments("fused"))
+
+        self.assertEqual([fused_res, [x.locus_length for x in self.aln_obj]],
+                         [seq_res, [30, 31]])
+
     def test_no_data_aln_default_filters(self):
 
         self.aln_obj.add_alignment_files(
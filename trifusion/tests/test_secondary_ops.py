@@ -3,6 +3,7 @@
 import os
 import shutil
 import unittest
+from copy import deepcopy
 from data_files import *
 
 from trifusion.process.sequence import AlignmentList
@@ -245,6 +246,62 @@ class SeconaryOpsTest(unittest.TestCase):
 
         self.assertEqual(s, 2)
 
+    def test_iter_column_blocks(self):
+
+        self.aln_obj = AlignmentList([variable_data[1]], sql_db=sql_db)
+
+        s = 0
+        for block, aln_idx in self.aln_obj.iter_column_blocks(block_size=7):
+            s += (block != block[0]).any(axis=0).sum()
+
+        self.assertEqual(s, 3)
+
+    def test_iter_column_blocks_with_active_tx(self):
+
+        self.aln_obj = AlignmentList([variable_data[1]], sql_db=sql_db)
+
+        self.aln_obj.update_taxa_names(
+            self.aln_obj.taxa_names[1:])
+
+        s = 0
+        for block, aln_idx in self.aln_obj.iter_column_blocks():
+            s += (block != block[0]).any(axis=0).sum()
+
+        self.assertEqual(s, 2)
+
+    def test_iter_column_blocks_as_columns(self):
+
+        self.aln_obj.add_alignment_files(dna_data_fas)
+
+        cols = [(tuple(x), y) for x, y in self.aln_obj.iter_columns()]
+
+        block_cols = []
+        for block, aln_idx in self.aln_obj.iter_column_blocks(block_size=50):
+            block_cols.extend((tuple(x.tostring()), aln_idx)
+                              for x in block.T)
+
+        self.assertEqual(sorted(cols), sorted(block_cols))
+
+    def test_column_store_copies(self):
+
+        self.aln_obj.add_alignment_files(dna_data_fas)
+        list(self.aln_obj.iter_column_blocks())
+        store = self.aln_obj.column_store
+        files = sorted(os.listdir(store.store_dir))
+
+        # A copy using the same database builds its matrices in another
+        # directory, and clearing it leaves those of the original
+        aln_copy = deepcopy(self.aln_obj)
+        aln_copy.set_database_connections(self.aln_obj.cur, self.aln_obj.con)
+        list(aln_copy.iter_column_blocks())
+        copy_dir = aln_copy.column_store.store_dir
+        self.assertNotEqual(copy_dir, store.store_dir)
+        self.assertEqual(sorted(os.listdir(copy_dir)), files)
+
+        aln_copy.column_store.clear()
+        self.assertFalse(os.path.exists(copy_dir))
+        self.assertEqual(sorted(os.listdir(store.store_dir)), files)
+
 # class MultipleSeconaryOpsTest(unittest.TestCase):
 #
 #     def test_sequential_secondary_operations_concat(self):
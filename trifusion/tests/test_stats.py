@@ -1,17 +1,22 @@
 #!/usr/bin/python2
 
 import os
+import itertools
+import time
 import unittest
+import numpy as np
 from data_files import *
 from os.path import join
 import shutil
 
 try:
-    from process.sequence import AlignmentList
+    from process.sequence import AlignmentList, pairwise_similarity, \
+        SimilarityCache
     from process.error_handling import *
     from process.data import Partitions
 except ImportError:
-    from trifusion.process.sequence import AlignmentList
+    from trifusion.process.sequence import AlignmentList, \
+        pairwise_similarity, SimilarityCache
     from trifusion.process.error_handling import *
     from trifusion.process.data import Partitions
 
@@ -71,6 +76,20 @@ class SeconaryOpsTest(unittest.TestCase):
                            [1, 24, 85, '0 (0.0%)', 0.0, '1 (0.05%)', 1.0,
                             '1 (1.18%)', 1.0, '0 (0.0%)', 0.0]]])
 
+    def test_summary_gene_table(self):
+
+        self.aln_obj.get_summary_stats()
+        self.aln_obj.get_summary_stats()
+
+        gene_table = self.aln_obj.summary_gene_table
+
+        self.assertEqual([len(gene_table),
+                          sorted(gene_table["genes"]),
+                          sum(gene_table["nsites"]),
+                          sum(gene_table["var"]),
+                          sum(gene_table["missing"])],
+                         [7, self.aln_obj.aln_names(), 595, 7, 5])
+
     def test_single_aln_outlier_mdata(self):
 
         self.aln_obj.update_active_alignments([dna_data_fas[0]])
@@ -244,6 +263,60 @@ class SeconaryOpsTest(unittest.TestCase):
 
         self.assertTrue(self.aln_obj.sequence_similarity_per_species())
 
+    def test_pairwise_similarity_kernel(self):
+
+        seqs = ["aacgt-n", "aacctnn", "t-cgtaa"]
+        matrix = np.array([[ord(x) for x in seq] for seq in seqs],
+                          dtype=np.uint8)
+
+        sim, ef_len = pairwise_similarity(matrix, ["n", "-"], block_size=3)
+
+        res = []
+        for seq1, seq2 in itertools.combinations(seqs, 2):
+            valid = [x not in "n-" and y not in "n-"
+                     for x, y in zip(seq1, seq2)]
+            res.append([sum(v and x == y for v, x, y in
+                            zip(valid, seq1, seq2)), sum(valid)])
+
+        self.assertEqual([[sim[i, j], ef_len[i, j]] for i, j in
+                          itertools.combinations(range(len(seqs)), 2)], res)
+
+    def test_sequence_similarity_cache(self):
+
+        cache = self.aln_obj.similarity_cache
+
+        res1 = self.aln_obj.sequence_similarity()
+        hits, misses = cache.hits, cache.misses
+
+        # All lookups of the second run are served from the cache
+        res2 = self.aln_obj.sequence_similarity()
+
+        self.assertEqual([res1, cache.hits, cache.misses],
+                         [res2, 2 * hits + misses, misses])
+
+    def test_similarity_cache_size(self):
+
+        cache = SimilarityCache(join(temp_dir, "cache.db"), max_bytes=100)
+        cache.connect()
+
+        # Counts are stored with the smallest unsigned integer type
+        cache.put_many([("a", [1, 2, 3, 4]), ("b", [70000, 1])])
+        vals = cache.get_many(["a", "b"])
+        self.assertEqual([vals["a"].dtype, vals["b"].dtype],
+                         [np.uint16, np.uint32])
+        self.assertEqual(vals["b"].tolist(), [70000, 1])
+
+        # The least recently used entries are evicted above max_bytes
+        time.sleep(.01)
+        cache.put_many([("c", range(50))])
+        time.sleep(.01)
+        cache.get_many(["a"])
+        cache.close()
+
+        cache.connect()
+        self.assertEqual(sorted(cache.get_many(["a", "b", "c"])), ["a"])
+        cache.close()
+
     def test_sequence_similarity_gene(self):
 
         self.assertTrue(self.aln_obj.sequence_similarity_gene(